@@ -15,8 +15,9 @@ from ..config import (
 from ..config.db_config import SubscribeDupException
 from ..platform import platform_manager
 from ..types import Target as T_Target
-from ..types import User, WeightConfig
-from ..utils.get_bot import get_bot, get_groups
+from ..types import WeightConfig
+from ..utils.get_bot import get_groups
+from .group_admin import group_admin_index
 from .jwt import load_jwt, pack_jwt
 from .token_manager import token_manager
 from .types import (
@@ -72,17 +73,7 @@ async def get_global_conf() -> GlobalConf:
 
 
 async def get_admin_groups(qq: int):
-    res = []
-    for group in await get_groups():
-        group_id = group["group_id"]
-        bot = get_bot(User(group_id, "group"))
-        if not bot:
-            continue
-        users = await bot.get_group_member_list(group_id=group_id)
-        for user in users:
-            if user["user_id"] == qq and user["role"] in ("owner", "admin"):
-                res.append({"id": group_id, "name": group["group_name"]})
-    return res
+    return await group_admin_index.get_admin_groups(qq)
 
 
 @router.get("/auth")
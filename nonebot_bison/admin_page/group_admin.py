@@ -0,0 +1,146 @@
+import asyncio
+import time
+from typing import Optional
+
+from nonebot import on_notice
+from nonebot.adapters.onebot.v11 import (
+    Bot,
+    GroupAdminNoticeEvent,
+    GroupDecreaseNoticeEvent,
+    GroupIncreaseNoticeEvent,
+)
+from nonebot.log import logger
+
+from ..plugin_config import plugin_config
+from ..types import User
+from ..utils.get_bot import get_bot, get_groups
+
+
+class GroupAdminIndex:
+    """各群管理员（含群主）的索引，用于后台登录时查询用户管理的群
+
+    首次查询时获取所有群的成员列表，同时获取的群不超过 concurrency 个；
+    索引超过 ttl 秒后，查询会等待重新获取完成再回答，
+    以免遗漏通知时已被取消的管理员仍能登录。
+    管理员变动、成员退群的通知会直接修改索引，Bot 加入新群时单独获取该群的管理员。
+    """
+
+    def __init__(self, ttl: float, concurrency: int):
+        self.ttl = ttl
+        self.concurrency = max(concurrency, 1)
+        self.refreshed_at: Optional[float] = None
+        self._group_names: dict[int, str] = {}
+        self._admin_groups: dict[int, set[int]] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def _fetch_group_admins(
+        self, semaphore: asyncio.Semaphore, group_id: int, bot: Optional[Bot] = None
+    ) -> list[int]:
+        bot = bot or get_bot(User(group_id, "group"))
+        if not bot:
+            return []
+        async with semaphore:
+            try:
+                users = await bot.get_group_member_list(group_id=group_id)
+            except Exception as err:
+                logger.warning(f"get member list of group {group_id} failed: {err!r}")
+                return []
+        return [user["user_id"] for user in users if user["role"] in ("owner", "admin")]
+
+    async def _do_refresh(self):
+        groups = await get_groups()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        group_admins = await asyncio.gather(
+            *(
+                self._fetch_group_admins(semaphore, group["group_id"])
+                for group in groups
+            )
+        )
+        admin_groups: dict[int, set[int]] = {}
+        for group, admins in zip(groups, group_admins):
+            for user_id in admins:
+                admin_groups.setdefault(user_id, set()).add(group["group_id"])
+        self._group_names = {group["group_id"]: group["group_name"] for group in groups}
+        self._admin_groups = admin_groups
+        self.refreshed_at = time.monotonic()
+
+    @staticmethod
+    def _log_refresh_error(task: asyncio.Task):
+        if not task.cancelled() and (err := task.exception()):
+            logger.warning(f"refresh group admins failed: {err!r}")
+
+    def _start_refresh(self) -> asyncio.Task:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 任务绑定在事件循环上，事件循环改变后需要重新创建
+            self._refresh_task = None
+            self._loop = loop
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._do_refresh())
+            self._refresh_task.add_done_callback(self._log_refresh_error)
+        return self._refresh_task
+
+    async def refresh(self):
+        """重新获取所有群的管理员，进行中的刷新会被复用"""
+        await asyncio.shield(self._start_refresh())
+
+    async def refresh_group(self, bot: Bot, group_id: int):
+        """重新获取单个群的管理员"""
+        try:
+            group = await bot.get_group_info(group_id=group_id)
+        except Exception as err:
+            logger.warning(f"get info of group {group_id} failed: {err!r}")
+            return
+        admins = await self._fetch_group_admins(asyncio.Semaphore(1), group_id, bot)
+        self.remove_group(group_id)
+        self._group_names[group_id] = group["group_name"]
+        for user_id in admins:
+            self._admin_groups.setdefault(user_id, set()).add(group_id)
+
+    async def get_admin_groups(self, qq: int) -> list[dict]:
+        """查询用户管理的群"""
+        if self.refreshed_at is None or time.monotonic() - self.refreshed_at > self.ttl:
+            await self.refresh()
+        return [
+            {"id": group_id, "name": self._group_names.get(group_id, "")}
+            for group_id in sorted(self._admin_groups.get(qq, set()))
+        ]
+
+    def set_admin(self, group_id: int, user_id: int, is_admin: bool):
+        groups = self._admin_groups.setdefault(user_id, set())
+        if is_admin:
+            groups.add(group_id)
+        else:
+            groups.discard(group_id)
+
+    def remove_group(self, group_id: int):
+        self._group_names.pop(group_id, None)
+        for groups in self._admin_groups.values():
+            groups.discard(group_id)
+
+
+group_admin_index = GroupAdminIndex(
+    plugin_config.bison_group_admin_ttl, plugin_config.bison_group_admin_concurrency
+)
+
+group_admin_notice = on_notice(priority=1)
+
+
+@group_admin_notice.handle()
+async def _(event: GroupAdminNoticeEvent):
+    group_admin_index.set_admin(event.group_id, event.user_id, event.sub_type == "set")
+
+
+@group_admin_notice.handle()
+async def _(bot: Bot, event: GroupDecreaseNoticeEvent):
+    if bot.self_id == str(event.user_id):
+        group_admin_index.remove_group(event.group_id)
+    else:
+        group_admin_index.set_admin(event.group_id, event.user_id, False)
+
+
+@group_admin_notice.handle()
+async def _(bot: Bot, event: GroupIncreaseNoticeEvent):
+    if bot.self_id == str(event.user_id):
+        await group_admin_index.refresh_group(bot, event.group_id)
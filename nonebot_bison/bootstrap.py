@@ -1,10 +1,22 @@
+import asyncio
+
+import nonebot
 from nonebot.log import logger
+from nonebot_plugin_apscheduler import scheduler
 from nonebot_plugin_datastore.db import get_engine, post_db_init, pre_db_init
 from sqlalchemy import inspect, text
 
 from .config.config_legacy import start_up as legacy_db_startup
 from .config.db_migration import data_migrate
+from .config.post_store import seen_post_store
+from .config.send_outbox import send_outbox
+from .pipeline import log_metrics
+from .plugin_config import plugin_config
 from .scheduler.manager import init_scheduler
+from .send import load_outbox
+from .utils import image_fetcher, render_service
+
+_background_tasks: set[asyncio.Task] = set()
 
 
 @pre_db_init
@@ -48,4 +60,59 @@ async def post():
     await data_migrate()
     # init scheduler
     await init_scheduler()
+    # 定时写入缓冲的已推送 Post id
+    scheduler.add_job(
+        seen_post_store.flush,
+        "interval",
+        seconds=10,
+        id="bison_flush_seen_posts",
+        replace_existing=True,
+    )
+    # 重新发送上次退出时未发送完成的消息，并定时写入发送队列的变化
+    await load_outbox()
+    scheduler.add_job(
+        send_outbox.flush,
+        "interval",
+        seconds=2,
+        id="bison_flush_send_outbox",
+        replace_existing=True,
+    )
+    # 定时在 debug 日志中输出渲染与发送的运行指标
+    scheduler.add_job(
+        log_metrics,
+        "interval",
+        seconds=60,
+        id="bison_log_metrics",
+        replace_existing=True,
+    )
+    if (
+        plugin_config.bison_render_pool_size
+        and not plugin_config.bison_skip_browser_check
+    ):
+        # 预热在后台进行，不阻塞启动
+        _background_tasks.add(task := asyncio.create_task(warm_up_render_service()))
+        task.add_done_callback(_background_tasks.discard)
     logger.info("nonebot-bison bootstrap done")
+
+
+async def warm_up_render_service():
+    try:
+        await render_service.warm_up()
+    except Exception as err:
+        logger.warning(f"warm up render service failed: {err!r}")
+
+
+@nonebot.get_driver().on_shutdown
+async def flush_send_outbox():
+    await send_outbox.flush()
+
+
+# 发送队列写入后才会记录对应的 Post id，需要在其后写入
+@nonebot.get_driver().on_shutdown
+async def flush_seen_posts():
+    await seen_post_store.flush()
+
+
+@nonebot.get_driver().on_shutdown
+async def close_image_fetcher():
+    await image_fetcher.close()
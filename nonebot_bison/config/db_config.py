@@ -1,8 +1,10 @@
 import asyncio
 from collections import defaultdict
+from dataclasses import dataclass
 from datetime import datetime, time
-from typing import Awaitable, Callable, Optional, Sequence
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional, Sequence
 
+from nonebot.log import logger
 from nonebot_plugin_datastore import create_session
 from sqlalchemy import delete, func, select
 from sqlalchemy.exc import IntegrityError
@@ -13,8 +15,19 @@ from ..types import Target as T_Target
 from ..types import TimeWeightConfig
 from ..types import User as T_User
 from ..types import UserSubInfo, WeightConfig
-from .db_model import ScheduleTimeWeight, Subscribe, Target, User
+from .db_model import (
+    DEFAULT_SCHEDULE_WEIGHT,
+    ScheduleTimeWeight,
+    Subscribe,
+    Target,
+    User,
+)
+from .subscribe_index import SubscribeIndex
 from .utils import NoSuchTargetException
+from .weight_table import TimeWeightTable
+
+if TYPE_CHECKING:
+    from .subs_io.nbesf_model import SubReceipt
 
 
 def _get_time():
@@ -23,14 +36,51 @@ def _get_time():
     return cur_time
 
 
+def _target_weight_config(target: Target) -> WeightConfig:
+    return WeightConfig(
+        default=target.default_schedule_weight,
+        time_config=[
+            TimeWeightConfig(
+                start_time=time_conf.start_time,
+                end_time=time_conf.end_time,
+                weight=time_conf.weight,
+            )
+            for time_conf in target.time_weight
+        ],
+    )
+
+
 class SubscribeDupException(Exception):
     ...
 
 
+@dataclass
+class BulkAddResult:
+    """批量添加订阅的结果统计"""
+
+    added: int = 0
+    duplicated: int = 0
+    failed: int = 0
+    new_targets: int = 0
+
+    def update(self, other: "BulkAddResult"):
+        self.added += other.added
+        self.duplicated += other.duplicated
+        self.failed += other.failed
+        self.new_targets += other.new_targets
+
+    @property
+    def total(self) -> int:
+        return self.added + self.duplicated + self.failed
+
+
 class DBConfig:
     def __init__(self):
         self.add_target_hook: list[Callable[[str, T_Target], Awaitable]] = []
         self.delete_target_hook: list[Callable[[str, T_Target], Awaitable]] = []
+        self.weight_change_hook: list[Callable[[str, T_Target, int], Awaitable]] = []
+        self.weight_table = TimeWeightTable()
+        self.subscribe_index = SubscribeIndex()
 
     def register_add_target_hook(self, fun: Callable[[str, T_Target], Awaitable]):
         self.add_target_hook.append(fun)
@@ -38,6 +88,11 @@ class DBConfig:
     def register_delete_target_hook(self, fun: Callable[[str, T_Target], Awaitable]):
         self.delete_target_hook.append(fun)
 
+    def register_weight_change_hook(
+        self, fun: Callable[[str, T_Target, int], Awaitable]
+    ):
+        self.weight_change_hook.append(fun)
+
     async def add_subscribe(
         self,
         user: int,
@@ -60,17 +115,22 @@ class DBConfig:
                 select(Target)
                 .where(Target.platform_name == platform_name)
                 .where(Target.target == target)
+                .options(selectinload(Target.time_weight))
             )
             db_target: Optional[Target] = await session.scalar(db_target_stmt)
             if not db_target:
                 db_target = Target(
                     target=target, platform_name=platform_name, target_name=target_name
                 )
+                weight_conf = WeightConfig(
+                    default=DEFAULT_SCHEDULE_WEIGHT, time_config=[]
+                )
                 await asyncio.gather(
                     *[hook(platform_name, target) for hook in self.add_target_hook]
                 )
             else:
                 db_target.target_name = target_name
+                weight_conf = _target_weight_config(db_target)
             subscribe = Subscribe(
                 categories=cats,
                 tags=tags,
@@ -84,6 +144,159 @@ class DBConfig:
                 if len(e.args) > 0 and "UNIQUE constraint failed" in e.args[0]:
                     raise SubscribeDupException()
                 raise e
+            if (platform_name, target) not in self.weight_table:
+                self.weight_table.set_config(platform_name, target, weight_conf)
+            self.subscribe_index.add(
+                platform_name,
+                target,
+                UserSubInfo(T_User(user, user_type), cats, tags),
+            )
+
+    async def add_subscribes(
+        self, receipts: Sequence["SubReceipt"], batch_size: int = 500
+    ) -> BulkAddResult:
+        """批量添加订阅
+
+        每 batch_size 条订阅在一个事务中写入：用户与 Target 按集合一次性查出，
+        缺少的一并插入，已存在的订阅视为重复跳过。
+        每个新的 Target 只触发一次 add_target_hook。
+        某一批写入失败时回滚该批，并逐条调用 add_subscribe 找出出错的订阅。
+        """
+        result = BulkAddResult()
+        batch_size = max(batch_size, 1)
+        for start in range(0, len(receipts), batch_size):
+            batch = receipts[start : start + batch_size]
+            try:
+                added, duplicated, new_targets = await self._add_subscribe_batch(batch)
+            except Exception as e:
+                logger.warning(f"批量添加订阅失败，改为逐条添加: {repr(e)}")
+                for receipt in batch:
+                    try:
+                        await self.add_subscribe(**receipt.dict())
+                    except SubscribeDupException:
+                        result.duplicated += 1
+                        logger.warning(f"！添加订阅条目 {repr(receipt)} 失败: 相同的订阅已存在")
+                    except Exception as e:
+                        result.failed += 1
+                        logger.error(f"！添加订阅条目 {repr(receipt)} 失败: {repr(e)}")
+                    else:
+                        result.added += 1
+                continue
+            for receipt in added:
+                self.subscribe_index.add(
+                    receipt.platform_name,
+                    T_Target(receipt.target),
+                    UserSubInfo(
+                        T_User(receipt.user, receipt.user_type),
+                        receipt.cats,
+                        receipt.tags,
+                    ),
+                )
+            await asyncio.gather(
+                *[
+                    hook(platform_name, target)
+                    for platform_name, target in new_targets
+                    for hook in self.add_target_hook
+                ]
+            )
+            result.added += len(added)
+            result.duplicated += duplicated
+            result.new_targets += len(new_targets)
+        return result
+
+    async def _add_subscribe_batch(
+        self, receipts: Sequence["SubReceipt"]
+    ) -> tuple[list["SubReceipt"], int, list[tuple[str, T_Target]]]:
+        """在一个事务中写入一批订阅，返回新增的订阅、重复的订阅数与新的 Target"""
+        async with create_session() as session:
+            uids_by_type: dict[str, set[int]] = defaultdict(set)
+            targets_by_platform: dict[str, set[str]] = defaultdict(set)
+            for receipt in receipts:
+                uids_by_type[receipt.user_type].add(receipt.user)
+                targets_by_platform[receipt.platform_name].add(receipt.target)
+
+            users: dict[tuple[str, int], User] = {}
+            for user_type, uids in uids_by_type.items():
+                for db_user in await session.scalars(
+                    select(User).where(User.type == user_type, User.uid.in_(uids))
+                ):
+                    users[(db_user.type, db_user.uid)] = db_user
+            targets: dict[tuple[str, str], Target] = {}
+            for platform_name, target_ids in targets_by_platform.items():
+                for db_target in await session.scalars(
+                    select(Target)
+                    .where(
+                        Target.platform_name == platform_name,
+                        Target.target.in_(target_ids),
+                    )
+                    .options(selectinload(Target.time_weight))
+                ):
+                    targets[(db_target.platform_name, db_target.target)] = db_target
+
+            new_targets: list[tuple[str, T_Target]] = []
+            weight_confs: dict[tuple[str, T_Target], WeightConfig] = {}
+            for receipt in receipts:
+                user_key = (receipt.user_type, receipt.user)
+                if user_key not in users:
+                    users[user_key] = User(uid=receipt.user, type=receipt.user_type)
+                    session.add(users[user_key])
+                target_key = (receipt.platform_name, receipt.target)
+                if target_key in targets:
+                    db_target = targets[target_key]
+                    db_target.target_name = receipt.target_name
+                    if target_key not in weight_confs and db_target.id is not None:
+                        weight_confs[target_key] = _target_weight_config(db_target)
+                    continue
+                targets[target_key] = Target(
+                    target=receipt.target,
+                    platform_name=receipt.platform_name,
+                    target_name=receipt.target_name,
+                )
+                session.add(targets[target_key])
+                new_targets.append(target_key)
+                weight_confs[target_key] = WeightConfig(
+                    default=DEFAULT_SCHEDULE_WEIGHT, time_config=[]
+                )
+            # 写入新的用户与 Target 以获得 id
+            await session.flush()
+
+            existing_subs = set(
+                (
+                    await session.execute(
+                        select(Subscribe.user_id, Subscribe.target_id).where(
+                            Subscribe.user_id.in_({user.id for user in users.values()}),
+                            Subscribe.target_id.in_(
+                                {target.id for target in targets.values()}
+                            ),
+                        )
+                    )
+                ).all()
+            )
+            added: list["SubReceipt"] = []
+            duplicated = 0
+            for receipt in receipts:
+                db_user = users[(receipt.user_type, receipt.user)]
+                db_target = targets[(receipt.platform_name, receipt.target)]
+                if (db_user.id, db_target.id) in existing_subs:
+                    duplicated += 1
+                    logger.warning(f"！添加订阅条目 {repr(receipt)} 失败: 相同的订阅已存在")
+                    continue
+                existing_subs.add((db_user.id, db_target.id))
+                session.add(
+                    Subscribe(
+                        categories=receipt.cats,
+                        tags=receipt.tags,
+                        user=db_user,
+                        target=db_target,
+                    )
+                )
+                added.append(receipt)
+            await session.commit()
+
+        for (platform_name, target), weight_conf in weight_confs.items():
+            if (platform_name, target) not in self.weight_table:
+                self.weight_table.set_config(platform_name, target, weight_conf)
+        return added, duplicated, new_targets
 
     async def list_subscribe(self, user: int, user_type: str) -> Sequence[Subscribe]:
         async with create_session() as session:
@@ -139,6 +352,11 @@ class DBConfig:
                     ]
                 )
             await session.commit()
+        self.subscribe_index.remove(
+            platform_name, T_Target(target), T_User(user, user_type)
+        )
+        if target_count == 0:
+            self.weight_table.remove(platform_name, T_Target(target))
 
     async def update_subscribe(
         self,
@@ -167,6 +385,11 @@ class DBConfig:
             subscribe_obj.categories = cats  # type:ignore
             subscribe_obj.target.target_name = target_name
             await sess.commit()
+        self.subscribe_index.add(
+            platform_name,
+            T_Target(target),
+            UserSubInfo(T_User(user, user_type), cats, tags),
+        )
 
     async def get_platform_target(self, platform_name: str) -> Sequence[Target]:
         async with create_session() as sess:
@@ -233,53 +456,67 @@ class DBConfig:
                 sess.add(new_conf)
 
             await sess.commit()
+        self.weight_table.set_config(platform_name, target, conf)
+        await self.refresh_current_weight()
 
-    async def get_current_weight_val(self, platform_list: list[str]) -> dict[str, int]:
-        res = {}
-        cur_time = _get_time()
+    async def load_time_weight_table(self):
+        """从数据库中加载全部 Target 的权重配置"""
         async with create_session() as sess:
             targets = (
                 await sess.scalars(
-                    select(Target)
-                    .where(Target.platform_name.in_(platform_list))
-                    .options(selectinload(Target.time_weight))
+                    select(Target).options(selectinload(Target.time_weight))
                 )
             ).all()
-            for target in targets:
-                key = f"{target.platform_name}-{target.target}"
-                weight = target.default_schedule_weight
-                for time_conf in target.time_weight:
-                    if (
-                        time_conf.start_time <= cur_time
-                        and time_conf.end_time > cur_time
-                    ):
-                        weight = time_conf.weight
-                        break
-                res[key] = weight
-        return res
+            confs = {
+                (target.platform_name, T_Target(target.target)): _target_weight_config(
+                    target
+                )
+                for target in targets
+            }
+        self.weight_table.load(confs, _get_time())
 
-    async def get_platform_target_subscribers(
-        self, platform_name: str, target: T_Target
-    ) -> list[UserSubInfo]:
+    async def refresh_current_weight(self):
+        """越过时间段边界时更新权重，并通知权重发生变化的 Target"""
+        if not self.weight_table.loaded:
+            await self.load_time_weight_table()
+        for platform_name, target, weight in self.weight_table.refresh(_get_time()):
+            await asyncio.gather(
+                *[
+                    hook(platform_name, target, weight)
+                    for hook in self.weight_change_hook
+                ]
+            )
+
+    def get_current_weight(self, platform_name: str, target: T_Target) -> int:
+        return self.weight_table.get_weight(platform_name, target)
+
+    async def load_subscribe_index(self):
+        """从数据库中加载全部订阅到内存索引"""
         async with create_session() as sess:
-            query = (
-                select(Subscribe)
-                .join(Target)
-                .where(Target.platform_name == platform_name, Target.target == target)
-                .options(selectinload(Subscribe.user))
+            query = select(Subscribe).options(
+                selectinload(Subscribe.user), selectinload(Subscribe.target)
             )
-            subsribes = (await sess.scalars(query)).all()
-            return list(
-                map(
-                    lambda subscribe: UserSubInfo(
+            subscribes = (await sess.scalars(query)).all()
+            self.subscribe_index.load(
+                (
+                    subscribe.target.platform_name,
+                    T_Target(subscribe.target.target),
+                    UserSubInfo(
                         T_User(subscribe.user.uid, subscribe.user.type),
                         subscribe.categories,
                         subscribe.tags,
                     ),
-                    subsribes,
                 )
+                for subscribe in subscribes
             )
 
+    async def get_platform_target_subscribers(
+        self, platform_name: str, target: T_Target
+    ) -> list[UserSubInfo]:
+        if not self.subscribe_index.loaded:
+            await self.load_subscribe_index()
+        return self.subscribe_index.get(platform_name, target)
+
     async def get_all_weight_config(
         self,
     ) -> dict[str, dict[str, PlatformWeightConfigResp]]:
@@ -294,15 +531,14 @@ class DBConfig:
 
         for target in targets:
             platform_name = target.platform_name
-            if platform_name not in res.keys():
-                res[platform_name][target.target] = PlatformWeightConfigResp(
-                    target=T_Target(target.target),
-                    target_name=target.target_name,
-                    platform_name=platform_name,
-                    weight=WeightConfig(
-                        default=target.default_schedule_weight, time_config=[]
-                    ),
-                )
+            res[platform_name][target.target] = PlatformWeightConfigResp(
+                target=T_Target(target.target),
+                target_name=target.target_name,
+                platform_name=platform_name,
+                weight=WeightConfig(
+                    default=target.default_schedule_weight, time_config=[]
+                ),
+            )
 
         for time_weight_config in time_weights:
             platform_name = time_weight_config.target.platform_name
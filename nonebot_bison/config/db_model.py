@@ -1,5 +1,6 @@
 import datetime
 from pathlib import Path
+from typing import Any
 
 from nonebot_plugin_datastore import get_plugin_data
 from sqlalchemy import JSON, ForeignKey, String, UniqueConstraint
@@ -10,6 +11,8 @@ from ..types import Category, Tag
 Model = get_plugin_data().Model
 get_plugin_data().set_migration_dir(Path(__file__).parent / "migrations")
 
+DEFAULT_SCHEDULE_WEIGHT = 10
+
 
 class User(Model):
     __table_args__ = (UniqueConstraint("type", "uid", name="unique-user-constraint"),)
@@ -27,10 +30,13 @@ class Target(Model):
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    platform_name: Mapped[str] = mapped_column(String(20))
+    # 唯一约束以 target 开头，只按平台查询时用不上，需要单独的索引
+    platform_name: Mapped[str] = mapped_column(String(20), index=True)
     target: Mapped[str] = mapped_column(String(1024))
     target_name: Mapped[str] = mapped_column(String(1024))
-    default_schedule_weight: Mapped[int] = mapped_column(default=10)
+    default_schedule_weight: Mapped[int] = mapped_column(
+        default=DEFAULT_SCHEDULE_WEIGHT
+    )
 
     subscribes: Mapped[list["Subscribe"]] = relationship(back_populates="target")
     time_weight: Mapped[list["ScheduleTimeWeight"]] = relationship(
@@ -40,7 +46,9 @@ class Target(Model):
 
 class ScheduleTimeWeight(Model):
     id: Mapped[int] = mapped_column(primary_key=True)
-    target_id: Mapped[int] = mapped_column(ForeignKey("nonebot_bison_target.id"))
+    target_id: Mapped[int] = mapped_column(
+        ForeignKey("nonebot_bison_target.id"), index=True
+    )
     start_time: Mapped[datetime.time]
     end_time: Mapped[datetime.time]
     weight: Mapped[int]
@@ -57,10 +65,47 @@ class Subscribe(Model):
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
+    # 唯一约束以 target_id 开头，已能用于按 target_id 查询，user_id 则需要单独的索引
     target_id: Mapped[int] = mapped_column(ForeignKey("nonebot_bison_target.id"))
-    user_id: Mapped[int] = mapped_column(ForeignKey("nonebot_bison_user.id"))
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("nonebot_bison_user.id"), index=True
+    )
     categories: Mapped[list[Category]] = mapped_column(JSON)
     tags: Mapped[list[Tag]] = mapped_column(JSON)
 
     target: Mapped[Target] = relationship(back_populates="subscribes")
     user: Mapped[User] = relationship(back_populates="subscribes")
+
+
+class SeenPost(Model):
+    """NewMessage 已见过的 Post id，重启后用于恢复去重状态"""
+
+    __table_args__ = (
+        UniqueConstraint(
+            "platform_class",
+            "target",
+            "post_id",
+            name="unique-seen-post-constraint",
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # 同一 platform_name 下可能有多个 NewMessage（如明日方舟），故以平台类名区分
+    platform_class: Mapped[str] = mapped_column(String(64))
+    target: Mapped[str] = mapped_column(String(1024))
+    post_id: Mapped[str] = mapped_column(String(255))
+
+
+class OutboxMessage(Model):
+    """发送队列中尚未发送完成的消息，重启后重新发送"""
+
+    __table_args__ = (UniqueConstraint("key", name="unique-outbox-key-constraint"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    key: Mapped[str] = mapped_column(String(32))
+    bot_id: Mapped[str] = mapped_column(String(64))
+    user: Mapped[int]
+    user_type: Mapped[str] = mapped_column(String(20))
+    message: Mapped[Any] = mapped_column(JSON)
+    retry_time: Mapped[int]
+    priority: Mapped[int]
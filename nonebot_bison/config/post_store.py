@@ -0,0 +1,129 @@
+from typing import Iterable
+
+from nonebot.log import logger
+from nonebot_plugin_datastore import create_session
+from sqlalchemy import delete, select
+
+from ..plugin_config import plugin_config
+from ..types import Target as T_Target
+from .db_model import SeenPost
+
+_Key = tuple[str, T_Target]
+
+
+class SeenPostStore:
+    """NewMessage 已见过的 Post id 的存储后端
+
+    内存中只保留每个 Target 最近的若干个 Post id，
+    后端负责在重启后恢复这些 id，使 Target 不必重新初始化。
+    此基类不做任何持久化，重启后所有 Target 会重新初始化。
+    """
+
+    async def load(self, platform_class: str, target: T_Target) -> list[str]:
+        """读取保存的 Post id，按从旧到新排列"""
+        return []
+
+    def add(self, platform_class: str, target: T_Target, post_ids: Iterable[str]):
+        """记录新见到的 Post id，可以延迟写入"""
+
+    def need_flush(self) -> bool:
+        return False
+
+    async def flush(self):
+        """写入所有延迟的记录"""
+
+
+class DBSeenPostStore(SeenPostStore):
+    """将 Post id 保存在插件数据库中
+
+    新的 id 先在内存中缓冲，攒够 flush_size 个或定时任务触发时一次性写入，
+    每个 Target 在数据库中同样只保留最近的 limit 个。
+    """
+
+    def __init__(self, limit: int, flush_size: int = 100):
+        self.limit = max(limit, 1)
+        self.flush_size = flush_size
+        self._pending: dict[_Key, list[str]] = {}
+        self._pending_count = 0
+
+    async def load(self, platform_class: str, target: T_Target) -> list[str]:
+        async with create_session() as sess:
+            res = await sess.scalars(
+                select(SeenPost.post_id)
+                .where(SeenPost.platform_class == platform_class)
+                .where(SeenPost.target == target)
+                .order_by(SeenPost.id.desc())
+                .limit(self.limit)
+            )
+            return list(reversed(res.all()))
+
+    def add(self, platform_class: str, target: T_Target, post_ids: Iterable[str]):
+        pending = self._pending.setdefault((platform_class, target), [])
+        for post_id in post_ids:
+            pending.append(post_id)
+            self._pending_count += 1
+
+    def need_flush(self) -> bool:
+        return self._pending_count >= self.flush_size
+
+    async def flush(self):
+        if not self._pending:
+            return
+        # 先换出缓冲区，写入期间新增的记录留给下一次
+        pending, self._pending = self._pending, {}
+        self._pending_count = 0
+        try:
+            async with create_session() as sess:
+                for (platform_class, target), post_ids in pending.items():
+                    await self._write_target(sess, platform_class, target, post_ids)
+                await sess.commit()
+        except Exception:
+            logger.exception("save seen posts failed")
+            # 放回缓冲区，下次再写入
+            for key, post_ids in self._pending.items():
+                pending.setdefault(key, []).extend(post_ids)
+            self._pending = pending
+            self._pending_count = sum(len(post_ids) for post_ids in pending.values())
+
+    async def _write_target(
+        self, sess, platform_class: str, target: T_Target, post_ids: list[str]
+    ):
+        exists = set(
+            await sess.scalars(
+                select(SeenPost.post_id)
+                .where(SeenPost.platform_class == platform_class)
+                .where(SeenPost.target == target)
+                .where(SeenPost.post_id.in_(post_ids))
+            )
+        )
+        sess.add_all(
+            SeenPost(platform_class=platform_class, target=target, post_id=post_id)
+            for post_id in dict.fromkeys(post_ids)
+            if post_id not in exists
+        )
+        await sess.flush()
+        # 只保留最近的 limit 条
+        oldest_kept_id = await sess.scalar(
+            select(SeenPost.id)
+            .where(SeenPost.platform_class == platform_class)
+            .where(SeenPost.target == target)
+            .order_by(SeenPost.id.desc())
+            .offset(self.limit - 1)
+            .limit(1)
+        )
+        if oldest_kept_id is not None:
+            await sess.execute(
+                delete(SeenPost)
+                .where(SeenPost.platform_class == platform_class)
+                .where(SeenPost.target == target)
+                .where(SeenPost.id < oldest_kept_id)
+            )
+
+
+def _make_seen_post_store() -> SeenPostStore:
+    if plugin_config.bison_seen_post_store == "memory":
+        return SeenPostStore()
+    return DBSeenPostStore(plugin_config.bison_seen_post_limit)
+
+
+seen_post_store = _make_seen_post_store()
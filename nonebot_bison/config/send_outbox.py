@@ -0,0 +1,183 @@
+import asyncio
+from typing import Any, Callable, Optional, Union
+from uuid import uuid4
+
+from nonebot.adapters.onebot.v11.message import Message, MessageSegment
+from nonebot.log import logger
+from nonebot_plugin_datastore import create_session
+from sqlalchemy import delete, select
+
+from ..plugin_config import plugin_config
+from .db_model import OutboxMessage
+
+
+def dump_message(msg: Union[str, Message]) -> Any:
+    if isinstance(msg, str):
+        return msg
+    return [
+        {
+            "type": seg.type,
+            "data": {
+                # 合并转发的节点中嵌套了消息
+                key: dump_message(value) if isinstance(value, Message) else value
+                for key, value in seg.data.items()
+            },
+        }
+        for seg in msg
+    ]
+
+
+def load_message(data: Any) -> Union[str, Message]:
+    if isinstance(data, str):
+        return data
+    return Message(
+        MessageSegment(
+            seg["type"],
+            {
+                key: load_message(value) if key == "content" else value
+                for key, value in seg["data"].items()
+            },
+        )
+        for seg in data
+    )
+
+
+class SendOutbox:
+    """发送队列中消息的存储后端
+
+    消息加入发送队列时记录，发送完成后确认，
+    后端负责在重启后取回尚未确认的消息以便重新发送。
+    此基类不做任何持久化，重启时队列中的消息会丢失。
+    """
+
+    def add(
+        self,
+        bot_id: str,
+        user: int,
+        user_type: str,
+        msg: Union[str, Message],
+        retry_time: int,
+        priority: int,
+    ) -> str:
+        """记录加入队列的消息，返回用于确认的 key，可以延迟写入"""
+        return uuid4().hex
+
+    def ack(self, key: str):
+        """确认消息已经发送完成，可以延迟写入"""
+
+    def need_flush(self) -> bool:
+        return False
+
+    async def flush(self):
+        """写入所有延迟的记录"""
+
+    def call_after_flush(self, callback: Callable[[], None]):
+        """此前记录的消息全部写入后调用 callback，不做持久化时立即调用"""
+        callback()
+
+    async def load(self) -> list[OutboxMessage]:
+        """读取所有未确认的消息，按加入队列的顺序排列"""
+        return []
+
+
+class DBSendOutbox(SendOutbox):
+    """将未发送完成的消息保存在插件数据库中
+
+    新消息与确认都先在内存中缓冲，攒够 flush_size 条或定时任务触发时一次性写入；
+    写入前就已发送完成的消息不会写入数据库。
+    写入依次进行，call_after_flush 注册的回调在其后开始的一次写入成功后调用。
+    """
+
+    def __init__(self, flush_size: int = 100):
+        self.flush_size = flush_size
+        self._pending: dict[str, OutboxMessage] = {}
+        self._acked: list[str] = []
+        self._after_flush: list[Callable[[], None]] = []
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            # 锁绑定在事件循环上，事件循环改变后需要重新创建
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    def add(
+        self,
+        bot_id: str,
+        user: int,
+        user_type: str,
+        msg: Union[str, Message],
+        retry_time: int,
+        priority: int,
+    ) -> str:
+        key = uuid4().hex
+        self._pending[key] = OutboxMessage(
+            key=key,
+            bot_id=bot_id,
+            user=user,
+            user_type=user_type,
+            message=dump_message(msg),
+            retry_time=retry_time,
+            priority=priority,
+        )
+        return key
+
+    def ack(self, key: str):
+        if self._pending.pop(key, None) is None:
+            self._acked.append(key)
+
+    def need_flush(self) -> bool:
+        return len(self._pending) + len(self._acked) >= self.flush_size
+
+    def call_after_flush(self, callback: Callable[[], None]):
+        self._after_flush.append(callback)
+
+    async def flush(self):
+        async with self._get_lock():
+            await self._flush()
+
+    async def _flush(self):
+        # 先换出缓冲区，写入期间新增的记录与回调留给下一次
+        pending, self._pending = self._pending, {}
+        acked, self._acked = self._acked, []
+        after_flush, self._after_flush = self._after_flush, []
+        if pending or acked:
+            try:
+                async with create_session() as sess:
+                    sess.add_all(pending.values())
+                    await sess.flush()
+                    if acked:
+                        await sess.execute(
+                            delete(OutboxMessage).where(OutboxMessage.key.in_(acked))
+                        )
+                    await sess.commit()
+            except Exception:
+                logger.exception("save send outbox failed")
+                # 放回缓冲区，下次再写入
+                self._pending = pending | self._pending
+                self._acked = acked + self._acked
+                self._after_flush = after_flush + self._after_flush
+                return
+        # 之前的写入都已完成，注册回调之前记录的消息都已在数据库中
+        for callback in after_flush:
+            try:
+                callback()
+            except Exception:
+                logger.exception("send outbox flush callback failed")
+
+    async def load(self) -> list[OutboxMessage]:
+        async with create_session() as sess:
+            res = await sess.scalars(select(OutboxMessage).order_by(OutboxMessage.id))
+            return list(res.all())
+
+
+def _make_send_outbox() -> SendOutbox:
+    if plugin_config.bison_send_outbox == "memory":
+        return SendOutbox()
+    return DBSendOutbox()
+
+
+send_outbox = _make_send_outbox()
@@ -1,3 +1,17 @@
-from .subs_io import nbesf_parser, subscribes_export, subscribes_import
+from .nbesf_stream import nbesf_stream_parser
+from .subs_io import (
+    nbesf_parser,
+    subscribes_export,
+    subscribes_export_stream,
+    subscribes_import,
+    subscribes_import_stream,
+)
 
-__all__ = ["subscribes_export", "subscribes_import", "nbesf_parser"]
+__all__ = [
+    "subscribes_export",
+    "subscribes_export_stream",
+    "subscribes_import",
+    "subscribes_import_stream",
+    "nbesf_parser",
+    "nbesf_stream_parser",
+]
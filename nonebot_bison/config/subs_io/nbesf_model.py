@@ -7,6 +7,11 @@ from ...types import Category, Tag
 # ===== nbesf 定义格式 ====== #
 NBESF_VERSION = 1
 
+# 二进制 nbesf 文件以 MAGIC 与一个字节的二进制格式版本开头，
+# 之后是 gzip 压缩的 msgpack 数据流：先是 {"version": NBESF_VERSION}，然后逐个是 SubPack
+NBESF_BINARY_MAGIC = b"NBESF"
+NBESF_BINARY_VERSION = 1
+
 
 class UserHead(BaseModel, orm_mode=True):
     """Bison快递包收货信息"""
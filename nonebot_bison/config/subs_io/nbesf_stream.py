@@ -0,0 +1,257 @@
+"""逐个 SubPack 读写 NBESF 文件，处理大量订阅时内存占用与订阅总数无关"""
+
+import gzip
+import json
+from pathlib import Path
+from typing import IO, Any, AsyncIterable, Iterator, Literal
+
+from nonebot.log import logger
+from pydantic import ValidationError
+
+from .nbesf_model import (
+    NBESF_BINARY_MAGIC,
+    NBESF_BINARY_VERSION,
+    NBESF_VERSION,
+    NBESFParseErr,
+    NBESFVerMatchErr,
+    SubPack,
+)
+
+_JSON_INDENT = 4
+_READ_SIZE = 64 * 1024
+# 读取到 groups 列表开头时产出的标记，用于区分空列表与缺少 groups
+_GROUPS_START = object()
+
+
+async def dump_json_stream(sub_packs: AsyncIterable[SubPack], f: IO[str]):
+    """
+    将 SubPack 逐个写入 json 格式的 NBESF 文件
+
+    输出与 `json.dump(SubGroup.dict(), f, indent=4, ensure_ascii=False)` 完全一致
+    """
+    indent = " " * _JSON_INDENT
+    f.write(f'{{\n{indent}"version": {json.dumps(NBESF_VERSION)},\n{indent}"groups": [')
+    empty = True
+    async for sub_pack in sub_packs:
+        f.write("\n" if empty else ",\n")
+        empty = False
+        text = json.dumps(sub_pack.dict(), indent=_JSON_INDENT, ensure_ascii=False)
+        # 不能用 splitlines，ensure_ascii=False 时字符串中可能含有 \u2028 等字符
+        f.write("\n".join(indent * 2 + line for line in text.split("\n")))
+    f.write("]\n}" if empty else f"\n{indent}]\n}}")
+
+
+async def dump_yaml_stream(sub_packs: AsyncIterable[SubPack], f: IO[str]):
+    """
+    将 SubPack 逐个写入 yaml 格式的 NBESF 文件
+
+    输出与 `yaml.safe_dump(SubGroup.dict(), f, sort_keys=False)` 完全一致
+    """
+    import yaml
+
+    f.write(yaml.safe_dump({"version": NBESF_VERSION}, sort_keys=False))
+    empty = True
+    async for sub_pack in sub_packs:
+        if empty:
+            f.write("groups:\n")
+            empty = False
+        # 顶层列表与映射中的列表缩进相同，单独输出每一项即可拼接
+        f.write(yaml.safe_dump([sub_pack.dict()], sort_keys=False))
+    if empty:
+        f.write("groups: []\n")
+
+
+async def dump_binary_stream(sub_packs: AsyncIterable[SubPack], f: IO[bytes]):
+    """将 SubPack 逐个写入二进制格式的 NBESF 文件，格式参见 `nbesf_model.py`"""
+    import msgpack
+
+    f.write(NBESF_BINARY_MAGIC + bytes([NBESF_BINARY_VERSION]))
+    packer = msgpack.Packer()
+    with gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as gz:
+        gz.write(packer.pack({"version": NBESF_VERSION}))
+        async for sub_pack in sub_packs:
+            gz.write(packer.pack(sub_pack.dict()))
+
+
+class _JSONReader:
+    """按需从文件中读取 json 文本并逐个解析其中的值"""
+
+    def __init__(self, f: IO[str]):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(_READ_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """跳过空白并返回下一个字符，文件结束时返回空字符串"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos : self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise NBESFParseErr(f"数据解析失败：应为 {chars!r}，实际为 {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = json.JSONDecoder().raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if not self._fill():
+                    raise NBESFParseErr("数据解析失败") from e
+                continue
+            # 数字等值可能被缓冲区截断，其后还有字符时才能确定已完整读取
+            if end < len(self.buf) or not self._fill():
+                self.pos = end
+                return value
+
+
+def _json_items(f: IO[str]) -> Iterator[tuple[str, Any]]:
+    reader = _JSONReader(f)
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.pos += 1
+    else:
+        while True:
+            key = reader.value()
+            reader.expect(":")
+            if key == "groups" and reader.peek() == "[":
+                reader.pos += 1
+                yield key, _GROUPS_START
+                if reader.peek() == "]":
+                    reader.pos += 1
+                else:
+                    while True:
+                        yield key, reader.value()
+                        if reader.expect(",]") == "]":
+                            break
+            else:
+                yield key, reader.value()
+            if reader.expect(",}") == "}":
+                break
+    if reader.peek():
+        raise NBESFParseErr("数据解析失败：文件末尾有多余的内容")
+
+
+def _yaml_items(f: IO[str]) -> Iterator[tuple[str, Any]]:
+    import yaml
+
+    loader = yaml.SafeLoader(f)
+
+    def _value():
+        return loader.construct_document(loader.compose_node(None, None))  # type: ignore
+
+    try:
+        loader.get_event()  # StreamStartEvent
+        if not loader.check_event(yaml.DocumentStartEvent):
+            raise NBESFParseErr("数据解析失败：文件为空")
+        loader.get_event()
+        if not loader.check_event(yaml.MappingStartEvent):
+            raise NBESFParseErr("数据解析失败：顶层应为映射")
+        loader.get_event()
+        while not loader.check_event(yaml.MappingEndEvent):
+            key = _value()
+            if key == "groups" and loader.check_event(yaml.SequenceStartEvent):
+                loader.get_event()
+                yield key, _GROUPS_START
+                while not loader.check_event(yaml.SequenceEndEvent):
+                    yield key, _value()
+                loader.get_event()
+            else:
+                yield key, _value()
+        loader.get_event()
+        loader.get_event()  # DocumentEndEvent
+        if not loader.check_event(yaml.StreamEndEvent):
+            raise NBESFParseErr("数据解析失败：文件中包含多个文档")
+    except yaml.YAMLError as e:
+        raise NBESFParseErr("数据解析失败") from e
+    finally:
+        loader.dispose()
+
+
+def _binary_items(f: IO[bytes]) -> Iterator[tuple[str, Any]]:
+    import msgpack
+
+    header = f.read(len(NBESF_BINARY_MAGIC) + 1)
+    if header[:-1] != NBESF_BINARY_MAGIC:
+        raise NBESFParseErr("数据解析失败：不是二进制 NBESF 文件")
+    if header[-1] != NBESF_BINARY_VERSION:
+        raise NBESFVerMatchErr(f"不支持的二进制NBESF格式版本：{header[-1]}")
+    unpacker = msgpack.Unpacker(gzip.GzipFile(fileobj=f, mode="rb"), raw=False)
+    try:
+        head = next(unpacker, None)
+        if not isinstance(head, dict):
+            raise NBESFParseErr("数据解析失败：缺少文件头")
+        yield from head.items()
+        yield "groups", _GROUPS_START
+        for sub_pack in unpacker:
+            yield "groups", sub_pack
+    except (OSError, EOFError, ValueError, msgpack.UnpackException) as e:
+        raise NBESFParseErr("数据解析失败") from e
+
+
+def detect_nbesf_format(path: Path) -> Literal["json", "yaml", "nbesf"]:
+    """根据文件内容判断 NBESF 文件的格式"""
+    with path.open("rb") as f:
+        head = f.read(1024)
+    if head.startswith(NBESF_BINARY_MAGIC):
+        return "nbesf"
+    if head.lstrip(b" \t\r\n").startswith(b"{"):
+        return "json"
+    return "yaml"
+
+
+def nbesf_stream_parser(
+    f: IO, format: Literal["json", "yaml", "yml", "nbesf"]
+) -> Iterator[SubPack]:
+    """
+    逐个读取并校验 NBESF 文件中的 SubPack
+
+    与 `nbesf_parser` 不同，文件不会被一次性载入内存，
+    因此文件后半部分的错误要等读取到时才会抛出 NBESFParseErr。
+
+    f:
+        json 与 yaml 格式为文本文件，nbesf 格式为二进制文件
+    """
+    match format:
+        case "json":
+            items = _json_items(f)
+        case "yaml" | "yml":
+            items = _yaml_items(f)
+        case "nbesf":
+            items = _binary_items(f)
+        case _:
+            raise NBESFParseErr(f"不支持的格式：{format}")
+    has_groups = False
+    for key, value in items:
+        if key == "version":
+            if value != NBESF_VERSION:
+                raise NBESFVerMatchErr(f"不支持的NBESF版本：{value}")
+        elif key == "groups":
+            has_groups = True
+            if value is _GROUPS_START:
+                continue
+            try:
+                yield SubPack.parse_obj(value)
+            except ValidationError as e:
+                logger.error("数据解析失败，该数据格式可能不满足NBESF格式标准！")
+                raise NBESFParseErr("数据解析失败") from e
+    if not has_groups:
+        raise NBESFParseErr("数据解析失败：缺少 groups")
@@ -1,10 +1,10 @@
-from collections import defaultdict
-from typing import Any, Callable, cast
+import time
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, cast
 
 from nonebot.log import logger
 from nonebot_plugin_datastore.db import create_session
 from sqlalchemy import select
-from sqlalchemy.orm.strategy_options import selectinload
+from sqlalchemy.orm import contains_eager, joinedload
 from sqlalchemy.sql.selectable import Select
 
 from ..db_model import Subscribe, User
@@ -19,58 +19,95 @@ from .nbesf_model import (
 from .utils import subs_receipt_gen_ver_1
 
 
-async def subscribes_export(selector: Callable[[Select], Select]) -> SubGroup:
+async def subscribes_export_stream(
+    selector: Callable[[Select], Select], chunk_size: int = 1000
+) -> AsyncIterator[SubPack]:
     """
-    将Bison订阅导出为 Nonebot Bison Exchangable Subscribes File 标准格式的 SubGroup 类型数据
+    逐个用户导出 Bison 订阅，每次产出一个 SubPack
+
+    订阅按用户分块从数据库中读取，内存占用与订阅总数无关。
 
     selector:
         对 sqlalchemy Select 对象的操作函数，用于限定查询范围 e.g. lambda stmt: stmt.where(User.uid=2233, User.type="group")
+    chunk_size:
+        每次从数据库中读取的订阅条数
     """
     async with create_session() as sess:
         sub_stmt = select(Subscribe).join(User)
-        sub_stmt = selector(sub_stmt).options(selectinload(Subscribe.target))
+        sub_stmt = (
+            selector(sub_stmt)
+            .options(contains_eager(Subscribe.user), joinedload(Subscribe.target))
+            .order_by(User.id, Subscribe.id)
+            .execution_options(yield_per=chunk_size)
+        )
         sub_stmt = cast(Select[tuple[Subscribe]], sub_stmt)
-        sub_data = await sess.scalars(sub_stmt)
-
-        user_stmt = select(User).join(Subscribe)
-        user_stmt = selector(user_stmt).distinct()
-        user_stmt = cast(Select[tuple[User]], user_stmt)
-        user_data = await sess.scalars(user_stmt)
-
-    groups: list[SubPack] = []
-    user_id_sub_dict: dict[int, list[SubPayload]] = defaultdict(list)
 
-    for sub in sub_data:
-        sub_paylaod = SubPayload.from_orm(sub)
-        user_id_sub_dict[sub.user_id].append(sub_paylaod)
+        user_id: Optional[int] = None
+        user_head: Optional[UserHead] = None
+        subs: list[SubPayload] = []
+        async for sub in await sess.stream_scalars(sub_stmt):
+            if sub.user_id != user_id:
+                if user_head is not None:
+                    yield SubPack(user=user_head, subs=subs)
+                user_id = sub.user_id
+                user_head = UserHead.from_orm(sub.user)
+                subs = []
+            subs.append(SubPayload.from_orm(sub))
+        if user_head is not None:
+            yield SubPack(user=user_head, subs=subs)
 
-    for user in user_data:
-        user_head = UserHead.from_orm(user)
-        sub_pack = SubPack(user=user_head, subs=user_id_sub_dict[user.id])
-        groups.append(sub_pack)
 
-    sub_group = SubGroup(groups=groups)
+async def subscribes_export(selector: Callable[[Select], Select]) -> SubGroup:
+    """
+    将Bison订阅导出为 Nonebot Bison Exchangable Subscribes File 标准格式的 SubGroup 类型数据
 
-    return sub_group
+    selector:
+        对 sqlalchemy Select 对象的操作函数，用于限定查询范围 e.g. lambda stmt: stmt.where(User.uid=2233, User.type="group")
+    """
+    groups = [sub_pack async for sub_pack in subscribes_export_stream(selector)]
+    return SubGroup(groups=groups)
 
 
-async def subscribes_import(
-    nbesf_data: SubGroup,
-):
+async def _import_ver_1(sub_packs: Iterable[SubPack], batch_size: int):
+    logger.info("开始添加订阅流程")
+    start = time.perf_counter()
+    result = await subs_receipt_gen_ver_1(sub_packs, batch_size)
+    logger.info(
+        f"订阅流程结束，耗时 {time.perf_counter() - start:.2f}s："
+        f"成功 {result.added} 条，重复 {result.duplicated} 条，失败 {result.failed} 条，"
+        f"新增 Target {result.new_targets} 个"
+    )
+    if result.failed:
+        logger.warning("部分订阅添加失败，请检查上方的错误信息")
+
+
+async def subscribes_import(nbesf_data: SubGroup, batch_size: int = 500):
     """
     从 Nonebot Bison Exchangable Subscribes File 标准格式的数据中导入订阅
 
     nbesf_data:
         符合nbesf_model标准的 SubGroup 类型数据
+    batch_size:
+        每个事务中写入的订阅条数
     """
 
-    logger.info("开始添加订阅流程")
     match nbesf_data.version:
         case 1:
-            await subs_receipt_gen_ver_1(nbesf_data)
+            await _import_ver_1(nbesf_data.groups, batch_size)
         case _:
             raise NBESFVerMatchErr(f"不支持的NBESF版本：{nbesf_data.version}")
-    logger.info("订阅流程结束，请检查所有订阅记录是否全部添加成功")
+
+
+async def subscribes_import_stream(sub_packs: Iterable[SubPack], batch_size: int = 500):
+    """
+    从逐个产出的 SubPack 中导入订阅，配合 `nbesf_stream_parser` 使用
+
+    sub_packs:
+        已通过版本校验的 SubPack，读取到多少条就写入多少条
+    batch_size:
+        每个事务中写入的订阅条数
+    """
+    await _import_ver_1(sub_packs, batch_size)
 
 
 def nbesf_parser(raw_data: Any) -> SubGroup:
@@ -1,28 +1,38 @@
-from functools import partial
+from typing import Iterable, Iterator
 
 from nonebot.log import logger
 
-from ..db_config import SubscribeDupException, config
-from .nbesf_model import NBESF_VERSION, SubGroup, SubReceipt
+from ..db_config import BulkAddResult, config
+from .nbesf_model import NBESF_VERSION, SubPack, SubReceipt
 
 
-async def subs_receipt_gen_ver_1(nbesf_data: SubGroup):
-    for item in nbesf_data.groups:
-        sub_receipt = partial(SubReceipt, user=item.user.uid, user_type=item.user.type)
-
+def subs_receipts_ver_1(sub_packs: Iterable[SubPack]) -> Iterator[SubReceipt]:
+    for item in sub_packs:
         for sub in item.subs:
-            receipt = sub_receipt(
+            yield SubReceipt(
+                user=item.user.uid,
+                user_type=item.user.type,
                 target=sub.target.target,
                 target_name=sub.target.target_name,
                 platform_name=sub.target.platform_name,
                 cats=sub.categories,
                 tags=sub.tags,
             )
-            try:
-                await config.add_subscribe(**receipt.dict())
-            except SubscribeDupException:
-                logger.warning(f"！添加订阅条目 {repr(receipt)} 失败: 相同的订阅已存在")
-            except Exception as e:
-                logger.error(f"！添加订阅条目 {repr(receipt)} 失败: {repr(e)}")
-            else:
-                logger.success(f"添加订阅条目 {repr(receipt)} 成功！")
+
+
+async def subs_receipt_gen_ver_1(
+    sub_packs: Iterable[SubPack], batch_size: int = 500
+) -> BulkAddResult:
+    """按 batch_size 分批添加订阅，同一时间只有一批订阅在内存中"""
+    result = BulkAddResult()
+    batch: list[SubReceipt] = []
+    for receipt in subs_receipts_ver_1(sub_packs):
+        batch.append(receipt)
+        if len(batch) >= batch_size:
+            result.update(await config.add_subscribes(batch, batch_size))
+            logger.info(f"已处理 {result.total} 条订阅")
+            batch = []
+    if batch:
+        result.update(await config.add_subscribes(batch, batch_size))
+        logger.info(f"已处理 {result.total} 条订阅")
+    return result
@@ -0,0 +1,38 @@
+from typing import Iterable
+
+from ..types import Target as T_Target
+from ..types import User as T_User
+from ..types import UserSubInfo
+
+
+class SubscribeIndex:
+    """内存中的订阅索引
+
+    以 (platform_name, target) 为键保存订阅了该 Target 的用户，
+    推送时无需再查询数据库。
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._index: dict[tuple[str, T_Target], dict[T_User, UserSubInfo]] = {}
+
+    def load(self, subs: Iterable[tuple[str, T_Target, UserSubInfo]]):
+        self._index.clear()
+        for platform_name, target, sub_info in subs:
+            self.add(platform_name, target, sub_info)
+        self.loaded = True
+
+    def add(self, platform_name: str, target: T_Target, sub_info: UserSubInfo):
+        """添加订阅，已存在时更新"""
+        self._index.setdefault((platform_name, target), {})[sub_info.user] = sub_info
+
+    def remove(self, platform_name: str, target: T_Target, user: T_User):
+        key = (platform_name, target)
+        if (subs := self._index.get(key)) is None:
+            return
+        subs.pop(user, None)
+        if not subs:
+            del self._index[key]
+
+    def get(self, platform_name: str, target: T_Target) -> list[UserSubInfo]:
+        return list(self._index.get((platform_name, target), {}).values())
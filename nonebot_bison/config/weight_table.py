@@ -0,0 +1,133 @@
+from datetime import datetime, time
+from typing import Optional
+
+from ..types import Target as T_Target
+from ..types import WeightConfig
+from .db_model import DEFAULT_SCHEDULE_WEIGHT
+
+_DAY_SECONDS = 24 * 60 * 60
+
+
+def _seconds(t: time) -> int:
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+def _eval_weight(conf: WeightConfig, cur_time: time) -> int:
+    for time_conf in conf.time_config:
+        if time_conf.start_time <= cur_time and time_conf.end_time > cur_time:
+            return time_conf.weight
+    return conf.default
+
+
+class TimeWeightTable:
+    """内存中的调度权重表
+
+    保存每个 Target 的 WeightConfig 以及当前权重。
+    只有带有时间段配置的 Target 才会被重新计算，并且只在越过最近的时间段边界后才计算，
+    平时的调度不需要查询数据库。
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._confs: dict[tuple[str, T_Target], WeightConfig] = {}
+        self._current: dict[tuple[str, T_Target], int] = {}
+        self._timed: set[tuple[str, T_Target]] = set()
+        self._pending: list[tuple[str, T_Target, int]] = []
+        # 当前权重的有效区间 [start, start + span)，单位为一天中的秒数
+        self._window_start: Optional[int] = None
+        self._window_span: Optional[int] = None
+        # 有效区间结束时的时间戳
+        self._window_expires: Optional[float] = None
+
+    def __contains__(self, key: tuple[str, T_Target]) -> bool:
+        return key in self._confs
+
+    def load(
+        self,
+        confs: dict[tuple[str, T_Target], WeightConfig],
+        cur_time: time,
+        timestamp: Optional[float] = None,
+    ):
+        self._confs.clear()
+        self._current.clear()
+        self._timed.clear()
+        self._window_start = None
+        for (platform_name, target), conf in confs.items():
+            self.set_config(platform_name, target, conf)
+        self.refresh(cur_time, timestamp)
+        self.loaded = True
+
+    def set_config(self, platform_name: str, target: T_Target, conf: WeightConfig):
+        key = (platform_name, target)
+        self._confs[key] = conf
+        if key in self._timed or conf.time_config:
+            # 时间段边界发生变化，下次刷新时重新计算
+            self._window_start = None
+        if conf.time_config:
+            self._timed.add(key)
+        else:
+            self._timed.discard(key)
+            self._set_current(key, conf.default)
+
+    def remove(self, platform_name: str, target: T_Target):
+        key = (platform_name, target)
+        self._confs.pop(key, None)
+        self._current.pop(key, None)
+        if key in self._timed:
+            self._timed.discard(key)
+            self._window_start = None
+
+    def get_weight(self, platform_name: str, target: T_Target) -> int:
+        key = (platform_name, target)
+        if (weight := self._current.get(key)) is not None:
+            return weight
+        if conf := self._confs.get(key):
+            return conf.default
+        return DEFAULT_SCHEDULE_WEIGHT
+
+    def _set_current(self, key: tuple[str, T_Target], weight: int):
+        if self._current.get(key) != weight:
+            self._current[key] = weight
+            self._pending.append((*key, weight))
+
+    def _window_valid(self, cur: int, timestamp: float) -> bool:
+        if self._window_start is None:
+            return False
+        if self._window_span is None:
+            return True
+        # 两次刷新相隔超过一天（如休眠后恢复）时，只比较一天中的时间会误判为仍然有效
+        if self._window_expires is not None and timestamp >= self._window_expires:
+            return False
+        return (cur - self._window_start) % _DAY_SECONDS < self._window_span
+
+    def _next_span(self, cur: int) -> Optional[int]:
+        span = None
+        for key in self._timed:
+            for time_conf in self._confs[key].time_config:
+                for boundary in (time_conf.start_time, time_conf.end_time):
+                    offset = (_seconds(boundary) - cur) % _DAY_SECONDS
+                    offset = offset or _DAY_SECONDS
+                    if span is None or offset < span:
+                        span = offset
+        return span
+
+    def refresh(
+        self, cur_time: time, timestamp: Optional[float] = None
+    ) -> list[tuple[str, T_Target, int]]:
+        """越过时间段边界时重新计算权重，返回自上次刷新以来权重发生变化的 Target
+
+        timestamp: 当前时间戳，默认为当前时间
+        """
+        if timestamp is None:
+            timestamp = datetime.now().timestamp()
+        cur = _seconds(cur_time)
+        if not self._window_valid(cur, timestamp):
+            for key in self._timed:
+                self._set_current(key, _eval_weight(self._confs[key], cur_time))
+            self._window_start = cur
+            self._window_span = self._next_span(cur)
+            self._window_expires = (
+                timestamp + self._window_span if self._window_span else None
+            )
+        changes, self._pending = self._pending, []
+        return changes
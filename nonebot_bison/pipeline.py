@@ -0,0 +1,161 @@
+import asyncio
+from collections import deque
+from typing import Optional
+
+from nonebot.log import logger
+
+from . import send
+from .plugin_config import plugin_config
+from .post.abstract_post import AbstractPost
+from .types import User
+from .utils import render_service
+from .utils.get_bot import bot_load, get_bot
+
+_Job = tuple[list[AbstractPost], asyncio.Future[None]]
+
+
+class PostPipeline:
+    """推送流水线
+
+    抓取到的 Post 先进入有界的渲染队列，由至多 render_workers 个 worker 生成消息，
+    再交给发送队列。渲染或发送缓慢时不会阻塞调度器的抓取，
+    渲染队列已满时抓取会等待，以免积压过多。
+
+    每个用户的任务排在各自的队列中，同一时刻只有一个 worker 处理同一用户的任务，
+    因此按放入顺序发送；worker 在有任务的用户之间轮流取任务，
+    某个用户积压大量任务时不会占住所有 worker。
+    """
+
+    def __init__(self, max_size: int, render_workers: int):
+        self.max_size = max_size
+        self.render_workers = render_workers
+        self.rendering = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._unfinished = 0
+        # 各用户等待渲染的任务，用户有任务正在渲染时队列可能为空
+        self._lanes: dict[User, deque[_Job]] = {}
+        # 有任务等待渲染、且没有任务正在渲染的用户
+        self._ready: deque[User] = deque()
+        self._worker_count = 0
+        self._worker_tasks: set[asyncio.Task] = set()
+
+    def _check_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_size)
+            self._idle = asyncio.Event()
+            self._idle.set()
+            self._unfinished = 0
+            self._lanes = {}
+            self._ready = deque()
+            self._worker_count = 0
+            self.rendering = 0
+
+    async def put(self, user: User, posts: list[AbstractPost]) -> asyncio.Future[None]:
+        """将同一用户的 Post 放入渲染队列，同一用户的 Post 会按放入的顺序发送
+
+        返回的 Future 在这些 Post 全部交给发送队列（或渲染失败）后完成
+        """
+        self._check_loop()
+        assert self._slots and self._idle
+        await self._slots.acquire()
+        job = asyncio.get_running_loop().create_future()
+        self._unfinished += 1
+        self._idle.clear()
+        if (lane := self._lanes.get(user)) is not None:
+            # 该用户已有任务在等待或正在渲染，排在其后
+            lane.append((posts, job))
+        else:
+            self._lanes[user] = deque([(posts, job)])
+            self._ready.append(user)
+        if self._ready and self._worker_count < self.render_workers:
+            self._worker_count += 1
+            task = asyncio.create_task(self._render_worker())
+            self._worker_tasks.add(task)
+            task.add_done_callback(self._worker_tasks.discard)
+        return job
+
+    async def _render_worker(self):
+        assert self._slots and self._idle
+        try:
+            while self._ready:
+                user = self._ready.popleft()
+                lane = self._lanes[user]
+                posts, job = lane.popleft()
+                self._slots.release()
+                try:
+                    self.rendering += 1
+                    try:
+                        await self._render_and_send(user, posts)
+                    except Exception:
+                        logger.exception(f"render posts for {user} failed")
+                    finally:
+                        self.rendering -= 1
+                    job.set_result(None)
+                finally:
+                    # worker 被取消时推送没有完成，已完成时 cancel 不起作用
+                    job.cancel()
+                    if lane:
+                        # 该用户的下一个任务排到末尾，与其他用户轮流渲染
+                        self._ready.append(user)
+                    elif self._lanes.get(user) is lane:
+                        del self._lanes[user]
+                    self._unfinished -= 1
+                    if not self._unfinished:
+                        self._idle.set()
+        finally:
+            # 判断没有可处理的用户与减少计数之间没有 await，不会遗漏新放入的任务
+            self._worker_count -= 1
+
+    async def _render_and_send(self, user: User, posts: list[AbstractPost]):
+        bot = get_bot(user)
+        if bot:
+            # 渲染期间其他推送也能看到这个 Bot 即将发送的消息
+            bot_load.assign(bot.self_id)
+        try:
+            for post in posts:
+                logger.info("send to {}: {}".format(user, post))
+                if not bot:
+                    logger.warning("no bot connected")
+                else:
+                    await send.send_msgs(
+                        bot,
+                        user.user,
+                        user.user_type,
+                        await post.generate_messages(),
+                        post.priority,
+                    )
+        finally:
+            if bot:
+                bot_load.release(bot.self_id)
+
+    async def join(self):
+        """等待渲染队列中的任务全部完成"""
+        self._check_loop()
+        assert self._idle
+        await self._idle.wait()
+
+    def queue_depths(self) -> dict[str, int]:
+        return {
+            "render_queue": sum(map(len, self._lanes.values())),
+            "rendering": self.rendering,
+            "send_queue": send.queue_size(),
+        }
+
+
+post_pipeline = PostPipeline(
+    plugin_config.bison_render_queue_size, plugin_config.bison_render_workers
+)
+
+
+async def log_metrics():
+    """在 debug 日志中输出渲染与发送的队列长度和耗时分位数"""
+    logger.debug(f"post pipeline queue depths: {post_pipeline.queue_depths()}")
+    logger.debug(f"render latency: {render_service.latency_percentiles()}")
+    logger.debug(
+        f"send lane sizes: {send.lane_sizes()}, "
+        f"wait time: {send.wait_time_percentiles()}"
+    )
@@ -3,10 +3,10 @@ from typing import Any, Optional
 
 from bs4 import BeautifulSoup as bs
 from httpx import AsyncClient
-from nonebot.plugin import require
 
 from ..post import Post
 from ..types import Category, RawPost, Target
+from ..utils.render import render_service
 from ..utils.scheduler_config import SchedulerConfig
 from .platform import CategoryNotRecognize, NewMessage, StatusChange
 
@@ -58,14 +58,12 @@ class Arknights(NewMessage):
         pics = []
         if soup.find("div", class_="standerd-container"):
             # 图文
-            require("nonebot_plugin_htmlrender")
-            from nonebot_plugin_htmlrender import capture_element
-
-            pic_data = await capture_element(
+            pic_data = await render_service.capture_element(
                 announce_url,
                 "div.main",
                 viewport={"width": 320, "height": 6400},
                 device_scale_factor=3,
+                html=raw_html.text,
             )
             # render = Render()
             # viewport = {"width": 320, "height": 6400, "deviceScaleFactor": 3}
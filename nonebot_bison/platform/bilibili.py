@@ -11,7 +11,7 @@ from pydantic import BaseModel, Field
 from typing_extensions import Self
 
 from ..post import Post
-from ..types import ApiError, Category, RawPost, Tag, Target
+from ..types import ApiError, Category, RawPost, SendPriority, Tag, Target
 from ..utils import SchedulerConfig, jaccard_text_similarity
 from .platform import CategoryNotRecognize, CategoryNotSupport, NewMessage, StatusChange
 
@@ -50,6 +50,12 @@ class BilibiliSchedConf(SchedulerConfig):
         return await super().get_query_name_client()
 
 
+class BilibiliLiveSchedConf(BilibiliSchedConf):
+    name = "live.bilibili.com"
+    # 直播间状态可以批量查询，每次调度一次请求查询一批账号
+    fetch_batch_size = 50
+
+
 class Bilibili(NewMessage):
     categories = {
         1: "一般动态",
@@ -222,9 +228,12 @@ class Bilibililive(StatusChange):
     enable_tag = False
     enabled = True
     is_common = True
-    scheduler = BilibiliSchedConf
+    scheduler = BilibiliLiveSchedConf
     name = "Bilibili直播"
     has_target = True
+    max_batch_size = BilibiliLiveSchedConf.fetch_batch_size
+    # 开播提醒需要尽快送达
+    category_send_priority = {1: SendPriority.HIGH}
 
     @unique
     class LiveStatus(Enum):
@@ -298,7 +307,13 @@ class Bilibililive(StatusChange):
         return res_data["data"]["name"]
 
     async def get_status(self, target: Target) -> Info:
-        params = {"uids[]": target}
+        status = await self.batch_get_status([target])
+        if target not in status:
+            raise self.FetchError()
+        return status[target]
+
+    async def batch_get_status(self, targets: list[Target]) -> dict[Target, Info]:
+        params = [("uids[]", target) for target in targets]
         # https://github.com/SocialSisterYi/bilibili-API-collect/blob/master/docs/live/info.md#批量查询直播间状态
         res = await self.client.get(
             "https://api.live.bilibili.com/room/v1/Room/get_status_info_by_uids",
@@ -308,11 +323,14 @@ class Bilibililive(StatusChange):
         res_dict = res.json()
 
         if res_dict["code"] == 0:
-            data = res_dict["data"][target]
             self.Info.update_forward_refs()
-            info = self.Info.parse_obj(data)
-
-            return info
+            # 未开通直播间的用户不会出现在结果中，没有任何结果时 data 可能为空列表
+            data = res_dict["data"] or {}
+            return {
+                target: self.Info.parse_obj(data[target])
+                for target in targets
+                if target in data
+            }
         else:
             raise self.FetchError()
 
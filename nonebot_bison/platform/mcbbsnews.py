@@ -1,15 +1,16 @@
 import re
 import time
 import traceback
+from typing import Optional
 
 from bs4 import BeautifulSoup, Tag
 from httpx import AsyncClient
 from nonebot.log import logger
-from nonebot.plugin import require
 
 from ..post import Post
 from ..types import Category, RawPost, Target
 from ..utils import SchedulerConfig, http_client
+from ..utils.render import render_service
 from .platform import CategoryNotRecognize, CategoryNotSupport, NewMessage
 
 
@@ -152,7 +153,7 @@ class McbbsNews(NewMessage):
             post_id = post_body.attrs.get("id")
         else:
             post_id = None
-        pics = await self._news_render(post_url, f"#{post_id}")
+        pics = await self._news_render(post_url, f"#{post_id}", html.text)
 
         return Post(
             self.name,
@@ -162,31 +163,31 @@ class McbbsNews(NewMessage):
             target_name=post["category"],
         )
 
-    async def _news_render(self, url: str, selector: str) -> list[bytes]:
+    async def _news_render(
+        self, url: str, selector: str, html: Optional[str] = None
+    ) -> list[bytes]:
         """
-        将给定的url网页的指定CSS选择器部分渲染成图片
+        将给定的url网页的指定CSS选择器部分渲染成图片，提供网页内容时未改变的网页不会重复渲染
 
         注意：
             一般而言每条新闻的长度都很可观，图片生成时间比较喜人
         """
-        require("nonebot_plugin_htmlrender")
-        from nonebot_plugin_htmlrender import capture_element, text_to_pic
-
         try:
             assert url
-            pic_data = await capture_element(
+            pic_data = await render_service.capture_element(
                 url,
                 selector,
                 viewport={"width": 1000, "height": 6400},
                 device_scale_factor=3,
+                html=html,
             )
             assert pic_data
         except:
             err_info = traceback.format_exc()
             logger.warning(f"渲染错误：{err_info}")
 
-            err_pic0 = await text_to_pic("错误发生！")
-            err_pic1 = await text_to_pic(err_info)
+            err_pic0 = await render_service.text_to_pic("错误发生！")
+            err_pic1 = await render_service.text_to_pic(err_info)
             return [err_pic0, err_pic1]
         else:
             return [pic_data]
@@ -1,19 +1,21 @@
+import asyncio
 import json
 import ssl
 import time
 import typing
 from abc import ABC, abstractmethod
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from dataclasses import dataclass
-from typing import Any, Collection, Optional, Type
+from typing import Any, Awaitable, Collection, Optional, Type
 
 import httpx
 from httpx import AsyncClient
 from nonebot.log import logger
 
+from ..config.post_store import seen_post_store
 from ..plugin_config import plugin_config
 from ..post import Post
-from ..types import Category, RawPost, Tag, Target, User, UserSubInfo
+from ..types import Category, RawPost, SendPriority, Tag, Target, User, UserSubInfo
 from ..utils import ProcessContext, SchedulerConfig
 
 
@@ -73,6 +75,13 @@ class Platform(metaclass=PlatformABCMeta, base=True):
     registry: list[Type["Platform"]]
     client: AsyncClient
     reverse_category: dict[str, Category]
+    # 大于 1 时，同一次调度中的多个 Target 会通过 batch_fetch_new_post 一同抓取
+    max_batch_size: int = 1
+    # 默认的 batch_fetch_new_post 逐个抓取 Target 时同时进行的数量上限
+    batch_fetch_concurrency: int = 4
+    # 推送的发送优先级，可按分类覆盖
+    send_priority: int = SendPriority.NORMAL
+    category_send_priority: dict[Category, int] = {}
 
     @classmethod
     @abstractmethod
@@ -87,11 +96,50 @@ class Platform(metaclass=PlatformABCMeta, base=True):
     ) -> list[tuple[User, list[Post]]]:
         ...
 
+    async def batch_fetch_new_post(
+        self, to_fetch: list[tuple[Target, list[UserSubInfo]]]
+    ) -> list[tuple[User, list[Post]]]:
+        """Fetch new posts of several targets at once
+
+        The default calls `fetch_new_post` for each target concurrently,
+        platforms with a batch api can override it
+        """
+        semaphore = asyncio.Semaphore(max(self.batch_fetch_concurrency, 1))
+
+        async def _fetch(target: Target, users: list[UserSubInfo]):
+            async with semaphore:
+                return await self.do_fetch_new_post(target, users)
+
+        results = await asyncio.gather(
+            *[_fetch(target, users) for target, users in to_fetch],
+            return_exceptions=True,
+        )
+        res = []
+        for (target, _), result in zip(to_fetch, results):
+            if isinstance(result, BaseException):
+                # 单个 Target 失败不影响同一批中的其他 Target
+                logger.opt(exception=result).error(
+                    f"fetching {self.name}-{target} failed"
+                )
+                continue
+            res.extend(result)
+        return res
+
     async def do_fetch_new_post(
         self, target: Target, users: list[UserSubInfo]
+    ) -> list[tuple[User, list[Post]]]:
+        return await self._catch_fetch_error(self.fetch_new_post(target, users))
+
+    async def do_batch_fetch_new_post(
+        self, to_fetch: list[tuple[Target, list[UserSubInfo]]]
+    ) -> list[tuple[User, list[Post]]]:
+        return await self._catch_fetch_error(self.batch_fetch_new_post(to_fetch))
+
+    async def _catch_fetch_error(
+        self, fetch: Awaitable[list[tuple[User, list[Post]]]]
     ) -> list[tuple[User, list[Post]]]:
         try:
-            return await self.fetch_new_post(target, users)
+            return await fetch
         except httpx.RequestError as err:
             if plugin_config.bison_show_network_warning:
                 logger.warning(
@@ -205,14 +253,23 @@ class Platform(metaclass=PlatformABCMeta, base=True):
             )
             user_post: list[Post] = []
             for raw_post in user_raw_post:
-                user_post.append(await self.do_parse(raw_post))
+                post = await self.do_parse(raw_post)
+                if post.priority is None:
+                    post.priority = self.get_send_priority(raw_post)
+                user_post.append(post)
             res.append((user, user_post))
         return res
 
-    @abstractmethod
+    def get_send_priority(self, raw_post: RawPost) -> int:
+        "Return send priority of given RawPost"
+        if self.category_send_priority:
+            category = self.get_category(raw_post)
+            return self.category_send_priority.get(category, self.send_priority)
+        return self.send_priority
+
     def get_category(self, post: RawPost) -> Optional[Category]:
-        "Return category of given Rawpost"
-        raise NotImplementedError()
+        "Return category of given Rawpost, None for platforms without categories"
+        return None
 
 
 class MessageProcess(Platform, abstract=True):
@@ -271,45 +328,82 @@ class MessageProcess(Platform, abstract=True):
                 for m in msgs:
                     logger.warning(m)
                 continue
-            except NotImplementedError:
-                pass
             res.append(raw_post)
         return res
 
 
+# 初始化时没有获取到任何 Post 的 Target 保存此 id，以便重启后知道其已初始化
+INITED_MARKER = ""
+
+
 class NewMessage(MessageProcess, abstract=True):
     "Fetch a list of messages, filter the new messages, dispatch it to different users"
 
     @dataclass
     class MessageStorage:
         inited: bool
-        exists_posts: set[Any]
+        # 按最近一次见到的顺序排列的 Post id，至多保留 bison_seen_post_limit 个
+        exists_posts: OrderedDict[str, None]
+
+    async def get_message_storage(self, target: Target) -> "NewMessage.MessageStorage":
+        if (store := self.get_stored_data(target)) is not None:
+            return store
+        seen_posts = await seen_post_store.load(type(self).__name__, target)
+        # 保存过记录说明该 Target 在重启前已经初始化
+        return self.MessageStorage(
+            bool(seen_posts),
+            OrderedDict.fromkeys(
+                post_id for post_id in seen_posts if post_id != INITED_MARKER
+            ),
+        )
 
     async def filter_common_with_diff(
         self, target: Target, raw_post_list: list[RawPost]
     ) -> list[RawPost]:
         filtered_post = await self.filter_common(raw_post_list)
-        store = self.get_stored_data(target) or self.MessageStorage(False, set())
+        store = await self.get_message_storage(target)
         res = []
+        new_post_ids = []
         if not store.inited and plugin_config.bison_init_filter:
             # target not init
-            for raw_post in filtered_post:
-                post_id = self.get_id(raw_post)
-                store.exists_posts.add(post_id)
+            # 记录获取到的全部 Post，而不只是通过时间过滤的，
+            # 否则近期没有发布 Post 的 Target 不会留下记录，重启后会被再次初始化
+            for raw_post in raw_post_list:
+                post_id = str(self.get_id(raw_post))
+                store.exists_posts[post_id] = None
+                new_post_ids.append(post_id)
+            if not new_post_ids:
+                # 没有获取到任何 Post 时保存一条标记
+                new_post_ids.append(INITED_MARKER)
             logger.info(
                 "init {}-{} with {}".format(
-                    self.platform_name, target, store.exists_posts
+                    self.platform_name, target, list(store.exists_posts)
                 )
             )
             store.inited = True
         else:
             for raw_post in filtered_post:
-                post_id = self.get_id(raw_post)
+                post_id = str(self.get_id(raw_post))
                 if post_id in store.exists_posts:
+                    # 仍在列表中的 Post 不会被挤出窗口，如置顶的 Post
+                    store.exists_posts.move_to_end(post_id)
                     continue
                 res.append(raw_post)
-                store.exists_posts.add(post_id)
+                store.exists_posts[post_id] = None
+                new_post_ids.append(post_id)
+        window = max(plugin_config.bison_seen_post_limit, len(raw_post_list))
+        while len(store.exists_posts) > window:
+            store.exists_posts.popitem(last=False)
         self.set_stored_data(target, store)
+        if res and self.ctx.deferred_seen_posts is not None:
+            # 推送交给发送队列后再保存，重启时仍在渲染队列中的 Post 会被重新推送
+            self.ctx.deferred_seen_posts.append(
+                (type(self).__name__, target, new_post_ids)
+            )
+        elif new_post_ids:
+            seen_post_store.add(type(self).__name__, target, new_post_ids)
+            if seen_post_store.need_flush():
+                await seen_post_store.flush()
         return res
 
     async def fetch_new_post(
@@ -339,10 +433,36 @@ class StatusChange(Platform, abstract=True):
     class FetchError(RuntimeError):
         pass
 
+    # 批量获取时没有返回状态的 Target，只在第一次出现时警告
+    _status_not_found: set[tuple[str, Target]] = set()
+
     @abstractmethod
     async def get_status(self, target: Target) -> Any:
         ...
 
+    async def batch_get_status(self, targets: list[Target]) -> dict[Target, Any]:
+        """Get status of several targets at once, targets failed to fetch are omitted
+
+        The default calls `get_status` for each target concurrently,
+        platforms with a batch api can override it
+        """
+        semaphore = asyncio.Semaphore(max(self.batch_fetch_concurrency, 1))
+
+        async def _get_status(target: Target):
+            async with semaphore:
+                try:
+                    return await self.get_status(target)
+                except self.FetchError as err:
+                    logger.warning(f"fetching {self.name}-{target} error: {err}")
+                    return None
+
+        statuses = await asyncio.gather(*map(_get_status, targets))
+        return {
+            target: status
+            for target, status in zip(targets, statuses)
+            if status is not None
+        }
+
     @abstractmethod
     def compare_status(self, target: Target, old_status, new_status) -> list[RawPost]:
         ...
@@ -359,6 +479,36 @@ class StatusChange(Platform, abstract=True):
         except self.FetchError as err:
             logger.warning(f"fetching {self.name}-{target} error: {err}")
             raise
+        return await self.handle_new_status(target, new_status, users)
+
+    async def batch_fetch_new_post(
+        self, to_fetch: list[tuple[Target, list[UserSubInfo]]]
+    ) -> list[tuple[User, list[Post]]]:
+        targets = [target for target, _ in to_fetch]
+        try:
+            new_statuses = await self.batch_get_status(targets)
+        except self.FetchError as err:
+            logger.warning(f"fetching {self.name}-{targets} error: {err}")
+            raise
+        res = []
+        for target, users in to_fetch:
+            key = (self.platform_name, target)
+            if target not in new_statuses:
+                if key not in self._status_not_found:
+                    self._status_not_found.add(key)
+                    logger.warning(
+                        f"fetching {self.name}-{target} error: status not found"
+                    )
+                continue
+            self._status_not_found.discard(key)
+            res.extend(
+                await self.handle_new_status(target, new_statuses[target], users)
+            )
+        return res
+
+    async def handle_new_status(
+        self, target: Target, new_status: Any, users: list[UserSubInfo]
+    ) -> list[tuple[User, list[Post]]]:
         res = []
         if old_status := self.get_stored_data(target):
             diff = self.compare_status(target, old_status, new_status)
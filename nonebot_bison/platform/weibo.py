@@ -1,3 +1,4 @@
+import asyncio
 import json
 import re
 from collections.abc import Callable
@@ -10,7 +11,7 @@ from nonebot.log import logger
 
 from ..post import Post
 from ..types import *
-from ..utils import SchedulerConfig, http_client
+from ..utils import SchedulerConfig, image_fetcher
 from .platform import NewMessage
 
 
@@ -168,12 +169,13 @@ class Weibo(NewMessage):
             else info.get("pics", [])
         )
         pic_urls = [img["large"]["url"] for img in raw_pics_list]
-        pics = []
-        for pic_url in pic_urls:
-            async with http_client(headers={"referer": "https://weibo.com"}) as client:
-                res = await client.get(pic_url)
-                res.raise_for_status()
-                pics.append(res.content)
+        # 任意一张图片下载失败都会抛出异常，由 do_parse 重试整条微博
+        pics = await asyncio.gather(
+            *(
+                image_fetcher.fetch(url, headers={"referer": "https://weibo.com"})
+                for url in pic_urls
+            )
+        )
         detail_url = "https://weibo.com/{}/{}".format(info["user"]["id"], info["bid"])
         # return parsed_text, detail_url, pic_urls
         return Post(
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 
 import nonebot
 from pydantic import BaseSettings
@@ -17,9 +17,40 @@ class PlugConfig(BaseSettings):
     bison_use_pic_merge: int = 0  # 多图片时启用图片合并转发（仅限群）
     # 0：不启用；1：首条消息单独发送，剩余照片合并转发；2以及以上：所有消息全部合并转发
     bison_resend_times: int = 0
+    # 按 Bot 账号覆盖发送消息的平均间隔（秒），如 {"123456": 1}，默认为 1.5
+    bison_send_interval: dict[str, float] = {}
+    bison_send_burst: int = 1  # 每个 Bot 允许连续发送的消息数量
+    # 按群号设置向同一群发送消息的最小间隔（秒），默认不限制
+    bison_send_group_interval: dict[str, float] = {}
+    bison_bot_refresh_debounce: float = 5  # 发送失败后延迟多少秒刷新 Bot 的群与好友列表，期间的失败只刷新一次
+    bison_group_admin_ttl: int = 600  # 后台登录使用的群管理员索引多少秒后在查询时重新获取
+    bison_group_admin_concurrency: int = 4  # 刷新群管理员索引时同时获取成员列表的群数量上限
+    bison_bot_member_info_ttl: int = 3600  # Bot 群名片等信息的缓存时间（秒），为 0 时不缓存
+    bison_send_priority_aging: float = 30  # 消息每等待多少秒提升一级发送优先级，为 0 时不提升
+    # 发送队列的存储方式，db：保存到数据库，重启后继续发送；memory：仅保存在内存中
+    bison_send_outbox: Literal["db", "memory"] = "db"
     bison_proxy: Optional[str]
     bison_ua: str = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/51.0.2704.103 Safari/537.36"
     bison_show_network_warning: bool = True
+    # 按调度器名称覆盖每次调度抓取的 Target 数量与并发上限，如 {"weibo.com": 3}
+    bison_fetch_batch_size: dict[str, int] = {}
+    bison_fetch_concurrency: dict[str, int] = {}
+    bison_image_fetch_concurrency: int = 4  # 同一域名同时下载图片的数量上限
+    # 图片缓存的内存与磁盘容量上限（MB），为 0 时不使用
+    bison_image_cache_memory_size: int = 32
+    bison_image_cache_disk_size: int = 256
+    bison_render_workers: int = 2  # 同时生成推送消息的数量上限
+    bison_render_queue_size: int = 100  # 等待生成消息的推送数量上限
+    bison_render_pool_size: int = 2  # 启动时预热的截图页面数量
+    bison_render_concurrency: int = 2  # 同时进行的浏览器渲染数量上限
+    bison_render_timeout: int = 60  # 单次浏览器渲染的超时时间（秒）
+    bison_render_cache_size: int = 256  # 截图缓存的磁盘容量上限（MB），为 0 时不缓存
+    # 文字转图片结果的内存与磁盘缓存容量上限（MB），为 0 时不使用
+    bison_text_pic_cache_memory_size: int = 16
+    bison_text_pic_cache_disk_size: int = 0
+    # 已推送 Post id 的存储方式，db：保存到数据库，重启后无需重新初始化；memory：仅保存在内存中
+    bison_seen_post_store: Literal["db", "memory"] = "db"
+    bison_seen_post_limit: int = 100  # 每个 Target 保留的最近 Post id 数量
 
     class Config:
         extra = "ignore"
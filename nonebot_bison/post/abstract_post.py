@@ -28,6 +28,8 @@ class OptionalMixin:
     override_use_pic: Optional[bool] = None
     compress: bool = False
     extra_msg: list[Message] = field(default_factory=list)
+    # 发送优先级，见 SendPriority，为 None 时由平台决定
+    priority: Optional[int] = None
 
     def _use_pic(self):
         if not self.override_use_pic is None:
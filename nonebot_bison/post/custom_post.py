@@ -4,8 +4,8 @@ from typing import Optional
 
 from nonebot.adapters.onebot.v11.message import Message, MessageSegment
 from nonebot.log import logger
-from nonebot.plugin import require
 
+from ..utils.render import render_service
 from .abstract_post import AbstractPost, BasePost
 
 
@@ -19,10 +19,9 @@ class _CustomPost(BasePost):
         return self.message_segments
 
     async def generate_pic_messages(self) -> list[MessageSegment]:
-        require("nonebot_plugin_htmlrender")
-        from nonebot_plugin_htmlrender import md_to_pic
-
-        pic_bytes = await md_to_pic(md=self._generate_md(), css_path=self.css_path)
+        pic_bytes = await render_service.md_to_pic(
+            md=self._generate_md(), css_path=self.css_path
+        )
         return [MessageSegment.image(pic_bytes)]
 
     def _generate_md(self) -> str:
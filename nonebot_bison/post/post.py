@@ -1,3 +1,4 @@
+import asyncio
 from dataclasses import dataclass, field
 from functools import reduce
 from io import BytesIO
@@ -7,7 +8,7 @@ from nonebot.adapters.onebot.v11.message import Message, MessageSegment
 from nonebot.log import logger
 from PIL import Image
 
-from ..utils import http_client, parse_text
+from ..utils import image_fetcher, parse_text
 from .abstract_post import AbstractPost, BasePost, OptionalMixin
 
 
@@ -23,81 +24,79 @@ class _Post(BasePost):
     _message: Optional[list[MessageSegment]] = None
     _pic_message: Optional[list[MessageSegment]] = None
 
-    async def _pic_url_to_image(self, data: Union[str, bytes]) -> Image.Image:
-        pic_buffer = BytesIO()
+    async def _pic_url_to_bytes(self, data: Union[str, bytes]) -> bytes:
         if isinstance(data, str):
-            async with http_client() as client:
-                res = await client.get(data)
-            pic_buffer.write(res.content)
-        else:
-            pic_buffer.write(data)
-        return Image.open(pic_buffer)
+            return await image_fetcher.fetch(data)
+        return data
 
     def _check_image_square(self, size: tuple[int, int]) -> bool:
         return abs(size[0] - size[1]) / size[0] < 0.05
 
-    async def _pic_merge(self) -> None:
-        if len(self.pics) < 3:
-            return
-        first_image = await self._pic_url_to_image(self.pics[0])
-        if not self._check_image_square(first_image.size):
-            return
-        images: list[Image.Image] = [first_image]
-        # first row
-        for i in range(1, 3):
-            cur_img = await self._pic_url_to_image(self.pics[i])
-            if not self._check_image_square(cur_img.size):
-                return
-            if cur_img.size[1] != images[0].size[1]:  # height not equal
-                return
-            images.append(cur_img)
-        _tmp = 0
+    def _check_merge_image(
+        self, images: list[Image.Image], index: int, cur_img: Image.Image
+    ) -> bool:
+        "检查第 index 张图片能否与之前的图片拼接"
+        if not self._check_image_square(cur_img.size):
+            return False
+        row, col = divmod(index, 3)
+        if col == 0:
+            # 每行第一张图片与第一张图片宽度相同
+            return row == 0 or cur_img.size[0] == images[0].size[0]
+        if cur_img.size[1] != images[row * 3].size[1]:  # height not equal
+            return False
+        return row == 0 or cur_img.size[0] == images[col].size[0]
+
+    @staticmethod
+    def _compose_images(images: list[Image.Image], rows: int) -> bytes:
         x_coord = [0]
         for i in range(3):
-            _tmp += images[i].size[0]
-            x_coord.append(_tmp)
-        y_coord = [0, first_image.size[1]]
-
-        async def process_row(row: int) -> bool:
-            if len(self.pics) < (row + 1) * 3:
-                return False
-            row_first_img = await self._pic_url_to_image(self.pics[row * 3])
-            if not self._check_image_square(row_first_img.size):
-                return False
-            if row_first_img.size[0] != images[0].size[0]:
-                return False
-            image_row: list[Image.Image] = [row_first_img]
-            for i in range(row * 3 + 1, row * 3 + 3):
-                cur_img = await self._pic_url_to_image(self.pics[i])
-                if not self._check_image_square(cur_img.size):
-                    return False
-                if cur_img.size[1] != row_first_img.size[1]:
-                    return False
-                if cur_img.size[0] != images[i % 3].size[0]:
-                    return False
-                image_row.append(cur_img)
-            images.extend(image_row)
-            y_coord.append(y_coord[-1] + row_first_img.size[1])
-            return True
-
-        if await process_row(1):
-            matrix = (3, 2)
-        else:
-            matrix = (3, 1)
-        if await process_row(2):
-            matrix = (3, 3)
-        logger.info("trigger merge image")
+            x_coord.append(x_coord[-1] + images[i].size[0])
+        y_coord = [0]
+        for row in range(rows):
+            y_coord.append(y_coord[-1] + images[row * 3].size[1])
         target = Image.new("RGB", (x_coord[-1], y_coord[-1]))
-        for y in range(matrix[1]):
-            for x in range(matrix[0]):
+        for y in range(rows):
+            for x in range(3):
                 target.paste(
-                    images[y * matrix[0] + x],
+                    images[y * 3 + x],
                     (x_coord[x], y_coord[y], x_coord[x + 1], y_coord[y + 1]),
                 )
         target_io = BytesIO()
         target.save(target_io, "JPEG")
-        self.pics = self.pics[matrix[0] * matrix[1] :]
-        self.pics.insert(0, target_io.getvalue())
+        return target_io.getvalue()
+
+    async def _pic_merge(self) -> None:
+        if len(self.pics) < 3:
+            return
+        rows = min(len(self.pics) // 3, 3)
+        # 同时下载可能参与拼接的图片，按顺序检查，遇到不能拼接的图片时取消剩余的下载
+        fetch_tasks = [
+            asyncio.create_task(self._pic_url_to_bytes(pic))
+            for pic in self.pics[: rows * 3]
+        ]
+        images: list[Image.Image] = []
+        try:
+            for index, fetch_task in enumerate(fetch_tasks):
+                try:
+                    # 只解析图片头，解码与拼接在线程中进行
+                    cur_img = Image.open(BytesIO(await fetch_task))
+                except Exception as err:
+                    logger.warning(f"load image for merging failed: {err!r}")
+                    break
+                if not self._check_merge_image(images, index, cur_img):
+                    break
+                images.append(cur_img)
+        finally:
+            for fetch_task in fetch_tasks:
+                fetch_task.cancel()
+            await asyncio.gather(*fetch_tasks, return_exceptions=True)
+        rows = len(images) // 3
+        if not rows:
+            return
+        logger.info("trigger merge image")
+        merged = await asyncio.to_thread(self._compose_images, images[: rows * 3], rows)
+        self.pics = self.pics[rows * 3 :]
+        self.pics.insert(0, merged)
 
     async def generate_text_messages(self) -> list[MessageSegment]:
 
@@ -13,6 +13,8 @@ scheduler_dict: dict[Type[SchedulerConfig], Scheduler] = {}
 async def init_scheduler():
     _schedule_class_dict: dict[Type[SchedulerConfig], list[Target]] = {}
     _schedule_class_platform_dict: dict[Type[SchedulerConfig], list[str]] = {}
+    await config.load_time_weight_table()
+    await config.load_subscribe_index()
     for platform in platform_manager.values():
         scheduler_config = platform.scheduler
         if not hasattr(scheduler_config, "name") or not scheduler_config.name:
@@ -38,6 +40,7 @@ async def init_scheduler():
         )
     config.register_add_target_hook(handle_insert_new_target)
     config.register_delete_target_hook(handle_delete_target)
+    config.register_weight_change_hook(handle_weight_change)
 
 
 async def handle_insert_new_target(platform_name: str, target: T_Target):
@@ -50,3 +53,10 @@ async def handle_delete_target(platform_name: str, target: T_Target):
     platform = platform_manager[platform_name]
     scheduler_obj = scheduler_dict[platform.scheduler]
     scheduler_obj.delete_schedulable(platform_name, target)
+
+
+async def handle_weight_change(platform_name: str, target: T_Target, weight: int):
+    if not (platform := platform_manager.get(platform_name)):
+        return
+    scheduler_obj = scheduler_dict[platform.scheduler]
+    scheduler_obj.update_schedulable_weight(platform_name, target, weight)
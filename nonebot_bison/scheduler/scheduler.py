@@ -1,28 +1,23 @@
-from dataclasses import dataclass
+import asyncio
 from typing import Optional, Type
 
-from nonebot.adapters.onebot.v11.bot import Bot
 from nonebot.log import logger
 from nonebot_plugin_apscheduler import scheduler
 
 from ..config import config
+from ..config.post_store import seen_post_store
+from ..config.send_outbox import send_outbox
+from ..pipeline import post_pipeline
 from ..platform import platform_manager
-from ..send import send_msgs
+from ..plugin_config import plugin_config
 from ..types import Target
 from ..utils import ProcessContext, SchedulerConfig
-from ..utils.get_bot import get_bot
-
-
-@dataclass
-class Schedulable:
-    platform_name: str
-    target: Target
-    current_weight: int
+from .weighted_queue import Schedulable, WeightedQueue
 
 
 class Scheduler:
 
-    schedulable_list: list[Schedulable]
+    schedulable_queue: WeightedQueue
 
     def __init__(
         self,
@@ -36,17 +31,31 @@ class Scheduler:
             raise RuntimeError(f"{self.name} not found")
         self.scheduler_config = scheduler_config
         self.scheduler_config_obj = self.scheduler_config()
-        self.schedulable_list = []
+        self.schedulable_queue = WeightedQueue()
         for platform_name, target in schedulables:
-            self.schedulable_list.append(
-                Schedulable(
-                    platform_name=platform_name, target=target, current_weight=0
-                )
+            self.schedulable_queue.push(
+                platform_name,
+                target,
+                config.get_current_weight(platform_name, target),
             )
         self.platform_name_list = platform_name_list
-        self.pre_weight_val = 0  # 轮调度中“本轮”增加权重和的初值
+        self.fetch_batch_size = max(
+            plugin_config.bison_fetch_batch_size.get(
+                self.name, scheduler_config.fetch_batch_size
+            ),
+            1,
+        )
+        self.fetch_semaphore = asyncio.Semaphore(
+            max(
+                plugin_config.bison_fetch_concurrency.get(
+                    self.name, scheduler_config.fetch_concurrency
+                ),
+                1,
+            )
+        )
         logger.info(
             f"register scheduler for {self.name} with {self.scheduler_config.schedule_type} {self.scheduler_config.schedule_setting}"
+            f", fetching {self.fetch_batch_size} target(s) per tick"
         )
         scheduler.add_job(
             self.exec_fetch,
@@ -55,47 +64,80 @@ class Scheduler:
         )
 
     async def get_next_schedulable(self) -> Optional[Schedulable]:
-        if not self.schedulable_list:
-            return None
-        cur_weight = await config.get_current_weight_val(self.platform_name_list)
-        weight_sum = self.pre_weight_val
-        self.pre_weight_val = 0
-        cur_max_schedulable = None
-        for schedulable in self.schedulable_list:
-            schedulable.current_weight += cur_weight[
-                f"{schedulable.platform_name}-{schedulable.target}"
-            ]
-            weight_sum += cur_weight[
-                f"{schedulable.platform_name}-{schedulable.target}"
-            ]
-            if (
-                not cur_max_schedulable
-                or cur_max_schedulable.current_weight < schedulable.current_weight
-            ):
-                cur_max_schedulable = schedulable
-        assert cur_max_schedulable
-        cur_max_schedulable.current_weight -= weight_sum
-        return cur_max_schedulable
+        if schedulables := await self.get_next_schedulables(1):
+            return schedulables[0]
+        return None
+
+    async def get_next_schedulables(self, size: int) -> list[Schedulable]:
+        if not self.schedulable_queue:
+            return []
+        await config.refresh_current_weight()
+        return self.schedulable_queue.pop_batch(size)
+
+    def _group_schedulables(
+        self, schedulables: list[Schedulable]
+    ) -> list[list[Schedulable]]:
+        "将支持批量抓取的平台的 Schedulable 合并为一组"
+        groups: list[list[Schedulable]] = []
+        batch_groups: dict[str, list[Schedulable]] = {}
+        for schedulable in schedulables:
+            platform_name = schedulable.platform_name
+            max_batch_size = platform_manager[platform_name].max_batch_size
+            if max_batch_size <= 1:
+                groups.append([schedulable])
+                continue
+            group = batch_groups.get(platform_name)
+            if not group or len(group) >= max_batch_size:
+                group = batch_groups[platform_name] = []
+                groups.append(group)
+            group.append(schedulable)
+        return groups
 
     async def exec_fetch(self):
-        context = ProcessContext()
-        if not (schedulable := await self.get_next_schedulable()):
+        schedulables = await self.get_next_schedulables(self.fetch_batch_size)
+        groups = self._group_schedulables(schedulables)
+        if len(groups) == 1:
+            await self.fetch_schedulables(groups[0])
             return
-        logger.trace(
-            f"scheduler {self.name} fetching next target: [{schedulable.platform_name}]{schedulable.target}"
+        results = await asyncio.gather(
+            *[self.fetch_schedulables(group) for group in groups],
+            return_exceptions=True,
         )
-        send_userinfo_list = await config.get_platform_target_subscribers(
-            schedulable.platform_name, schedulable.target
+        for group, result in zip(groups, results):
+            if isinstance(result, Exception):
+                logger.opt(exception=result).error(
+                    f"scheduler {self.name} fetching [{group[0].platform_name}]{','.join(s.target for s in group)} failed"
+                )
+
+    async def fetch_schedulables(self, schedulables: list[Schedulable]):
+        async with self.fetch_semaphore:
+            await self._fetch_schedulables(schedulables)
+
+    async def _fetch_schedulables(self, schedulables: list[Schedulable]):
+        "抓取同一平台的一组 Schedulable，支持批量抓取的平台总是使用批量抓取"
+        context = ProcessContext(defer_seen_posts=True)
+        platform_name = schedulables[0].platform_name
+        targets = [schedulable.target for schedulable in schedulables]
+        logger.trace(
+            f"scheduler {self.name} fetching next target: [{platform_name}]{','.join(targets)}"
         )
+        to_fetch = [
+            (
+                target,
+                await config.get_platform_target_subscribers(platform_name, target),
+            )
+            for target in targets
+        ]
 
-        client = await self.scheduler_config_obj.get_client(schedulable.target)
+        client = await self.scheduler_config_obj.get_client(targets[0])
         context.register_to_client(client)
 
         try:
-            platform_obj = platform_manager[schedulable.platform_name](context, client)
-            to_send = await platform_obj.do_fetch_new_post(
-                schedulable.target, send_userinfo_list
-            )
+            platform_obj = platform_manager[platform_name](context, client)
+            if platform_obj.max_batch_size > 1:
+                to_send = await platform_obj.do_batch_fetch_new_post(to_fetch)
+            else:
+                to_send = await platform_obj.do_fetch_new_post(*to_fetch[0])
         except Exception as err:
             records = context.gen_req_records()
             for record in records:
@@ -103,42 +145,57 @@ class Scheduler:
             err.args += (records,)
             raise
 
-        if not to_send:
-            return
-
-        for user, send_list in to_send:
-            bot = get_bot(user)
-            for send_post in send_list:
-                logger.info("send to {}: {}".format(user, send_post))
-                if not bot:
-                    logger.warning("no bot connected")
-                else:
-                    await send_msgs(
-                        bot,
-                        user.user,
-                        user.user_type,
-                        await send_post.generate_messages(),
-                    )
+        jobs = [
+            await post_pipeline.put(user, send_list)
+            for user, send_list in to_send
+            if send_list
+        ]
+        if context.deferred_seen_posts:
+            _save_seen_posts_when_sent(jobs, context.deferred_seen_posts)
 
     def insert_new_schedulable(self, platform_name: str, target: Target):
-        self.pre_weight_val += 1000
-        self.schedulable_list.append(Schedulable(platform_name, target, 1000))
+        self.schedulable_queue.push(
+            platform_name,
+            target,
+            config.get_current_weight(platform_name, target),
+            urgent=True,
+        )
         logger.info(
             f"insert [{platform_name}]{target} to Schduler({self.scheduler_config.name})"
         )
 
     def delete_schedulable(self, platform_name, target: Target):
-        if not self.schedulable_list:
+        self.schedulable_queue.remove(platform_name, target)
+
+    def update_schedulable_weight(
+        self, platform_name: str, target: Target, weight: int
+    ):
+        self.schedulable_queue.set_weight(platform_name, target, weight)
+
+
+def _save_seen_posts_when_sent(
+    jobs: list[asyncio.Future[None]], seen_posts: list[tuple[str, Target, list[str]]]
+):
+    """推送全部交给发送队列、且发送队列中的消息写入后再保存 Post id，推送被取消时不保存
+
+    若消息仍在发送队列的内存缓冲中时就保存 Post id，两次写入之间崩溃会丢失推送
+    """
+    remaining = len(jobs)
+
+    def _save():
+        for platform_class, target, post_ids in seen_posts:
+            seen_post_store.add(platform_class, target, post_ids)
+
+    def _job_done(job: asyncio.Future[None]):
+        nonlocal remaining
+        if job.cancelled():
             return
-        to_find_idx = None
-        for idx, schedulable in enumerate(self.schedulable_list):
-            if (
-                schedulable.platform_name == platform_name
-                and schedulable.target == target
-            ):
-                to_find_idx = idx
-                break
-        if to_find_idx is not None:
-            deleted_schdulable = self.schedulable_list.pop(to_find_idx)
-            self.pre_weight_val -= deleted_schdulable.current_weight
-        return
+        remaining -= 1
+        if not remaining:
+            send_outbox.call_after_flush(_save)
+
+    if not jobs:
+        # 没有需要推送给任何用户的 Post
+        _save()
+    for job in jobs:
+        job.add_done_callback(_job_done)
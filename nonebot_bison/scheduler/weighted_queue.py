@@ -0,0 +1,129 @@
+import heapq
+import itertools
+from dataclasses import dataclass, field
+from fractions import Fraction
+from typing import Iterator, Optional
+
+from ..types import Target
+
+
+@dataclass
+class Schedulable:
+    platform_name: str
+    target: Target
+    weight: int = 1
+    deadline: Fraction = field(default_factory=Fraction)
+
+    @property
+    def key(self) -> str:
+        return f"{self.platform_name}-{self.target}"
+
+
+_Entry = list  # [deadline, seq, Optional[Schedulable]]
+
+
+class WeightedQueue:
+    """基于虚拟时间的加权轮询队列
+
+    每个 Schedulable 拥有一个虚拟截止时间 deadline，每次调度取出 deadline 最小者，
+    并将其 deadline 推后 1/weight。
+    在权重不变的一轮（权重和次）调度中，每个 Schedulable 恰好被调度 weight 次，
+    与原先平滑加权轮询的结果一致，但取出、插入、删除均为 O(log n)。
+
+    堆中被删除或更新的条目采用惰性删除，失效条目过多时整体重建。
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[_Entry] = []
+        self._index: dict[tuple[str, Target], _Entry] = {}
+        self._counter = itertools.count()
+        self._dead_count = 0
+        self.virtual_time = Fraction(0)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: tuple[str, Target]) -> bool:
+        return key in self._index
+
+    def __iter__(self) -> Iterator[Schedulable]:
+        for entry in self._index.values():
+            yield entry[2]
+
+    def get(self, platform_name: str, target: Target) -> Optional[Schedulable]:
+        if entry := self._index.get((platform_name, target)):
+            return entry[2]
+
+    def _push_entry(self, schedulable: Schedulable):
+        entry = [schedulable.deadline, next(self._counter), schedulable]
+        self._index[(schedulable.platform_name, schedulable.target)] = entry
+        heapq.heappush(self._heap, entry)
+
+    def _invalidate(self, entry: _Entry):
+        entry[2] = None
+        self._dead_count += 1
+        if self._dead_count > 64 and self._dead_count > len(self._heap) // 2:
+            self._heap = [entry for entry in self._heap if entry[2] is not None]
+            heapq.heapify(self._heap)
+            self._dead_count = 0
+
+    def push(
+        self, platform_name: str, target: Target, weight: int = 1, urgent=False
+    ) -> Schedulable:
+        """加入新的 Schedulable，已存在时会被替换
+
+        urgent: 是否在下一次调度时优先取出
+        """
+        weight = max(weight, 1)
+        self.remove(platform_name, target)
+        stride = Fraction(1, weight)
+        deadline = self.virtual_time + (-stride if urgent else stride)
+        schedulable = Schedulable(platform_name, target, weight, deadline)
+        self._push_entry(schedulable)
+        return schedulable
+
+    def remove(self, platform_name: str, target: Target) -> Optional[Schedulable]:
+        entry = self._index.pop((platform_name, target), None)
+        if entry is None:
+            return None
+        schedulable = entry[2]
+        self._invalidate(entry)
+        return schedulable
+
+    def set_weight(self, platform_name: str, target: Target, weight: int):
+        """修改权重，按比例缩放剩余的虚拟时间以保持公平"""
+        weight = max(weight, 1)
+        entry = self._index.get((platform_name, target))
+        if entry is None or entry[2].weight == weight:
+            return
+        old = entry[2]
+        remaining = old.deadline - self.virtual_time
+        schedulable = Schedulable(
+            old.platform_name,
+            old.target,
+            weight,
+            self.virtual_time + remaining * old.weight / weight,
+        )
+        self._invalidate(entry)
+        self._push_entry(schedulable)
+
+    def pop_next(self) -> Optional[Schedulable]:
+        """取出下一个应被调度的 Schedulable，并将其重新放回队列"""
+        if batch := self.pop_batch(1):
+            return batch[0]
+        return None
+
+    def pop_batch(self, size: int) -> list[Schedulable]:
+        """取出至多 size 个互不相同的 Schedulable，并将它们重新放回队列"""
+        picked: list[Schedulable] = []
+        while self._heap and len(picked) < size:
+            _, _, schedulable = heapq.heappop(self._heap)
+            if schedulable is None:
+                self._dead_count -= 1
+                continue
+            picked.append(schedulable)
+        for schedulable in picked:
+            self.virtual_time = max(self.virtual_time, schedulable.deadline)
+            schedulable.deadline += Fraction(1, schedulable.weight)
+            self._push_entry(schedulable)
+        return picked
@@ -1,15 +1,23 @@
 import importlib
-import json
 import time
 from functools import partial, wraps
 from pathlib import Path
 from types import ModuleType
-from typing import Any, Callable, Coroutine, TypeVar
+from typing import IO, Any, Callable, Coroutine, TypeVar
 
 from nonebot.log import logger
 
-from ..config.subs_io import nbesf_parser, subscribes_export, subscribes_import
-from ..config.subs_io.nbesf_model import SubGroup
+from ..config.subs_io import (
+    nbesf_stream_parser,
+    subscribes_export_stream,
+    subscribes_import_stream,
+)
+from ..config.subs_io.nbesf_stream import (
+    detect_nbesf_format,
+    dump_binary_stream,
+    dump_json_stream,
+    dump_yaml_stream,
+)
 from ..scheduler.manager import init_scheduler
 
 try:
@@ -29,6 +37,15 @@ def import_yaml_module() -> ModuleType:
     return pyyaml
 
 
+def import_msgpack_module() -> ModuleType:
+    try:
+        msgpack = importlib.import_module("msgpack")
+    except ImportError as e:
+        raise ImportError("请使用 `pip install nonebot-bison[msgpack]` 安装所需依赖") from e
+
+    return msgpack
+
+
 P = ParamSpec("P")
 R = TypeVar("R")
 
@@ -71,8 +88,8 @@ def path_init(ctx, param, value):
 @click.option(
     "--format",
     default="json",
-    type=click.Choice(["json", "yaml", "yml"]),
-    help="指定导出格式[json, yaml]，默认为 json",
+    type=click.Choice(["json", "yaml", "yml", "nbesf"]),
+    help="指定导出格式[json, yaml, nbesf]，默认为 json，nbesf 为压缩的二进制格式",
 )
 @run_async
 async def subs_export(path: Path, format: str):
@@ -81,62 +98,86 @@ async def subs_export(path: Path, format: str):
 
     export_file = path / f"bison_subscribes_export_{int(time.time())}.{format}"
 
-    logger.info("正在获取订阅信息...")
-    export_data: SubGroup = await subscribes_export(lambda x: x)
+    logger.info("正在导出订阅信息...")
+    # 逐个用户读取并写入订阅，避免一次性将全部订阅载入内存
+    sub_packs = subscribes_export_stream(lambda x: x)
 
-    with export_file.open("w", encoding="utf-8") as f:
-        match format:
-            case "yaml" | "yml":
-                logger.info("正在导出为yaml...")
+    match format:
+        case "yaml" | "yml":
+            logger.info("正在导出为yaml...")
 
-                pyyaml = import_yaml_module()
-                pyyaml.safe_dump(export_data.dict(), f, sort_keys=False)
+            import_yaml_module()
+            with export_file.open("w", encoding="utf-8") as f:
+                await dump_yaml_stream(sub_packs, f)
 
-            case "json":
-                logger.info("正在导出为json...")
+        case "json":
+            logger.info("正在导出为json...")
 
-                json.dump(export_data.dict(), f, indent=4, ensure_ascii=False)
+            with export_file.open("w", encoding="utf-8") as f:
+                await dump_json_stream(sub_packs, f)
 
-            case _:
-                raise click.BadParameter(message=f"不支持的导出格式: {format}")
+        case "nbesf":
+            logger.info("正在导出为二进制nbesf...")
 
-        logger.success(f"导出完毕！已导出到 {path} ")
+            import_msgpack_module()
+            with export_file.open("wb") as f:
+                await dump_binary_stream(sub_packs, f)
+
+        case _:
+            raise click.BadParameter(message=f"不支持的导出格式: {format}")
+
+    logger.success(f"导出完毕！已导出到 {path} ")
+
+
+def open_import_file(path: Path, format: str) -> IO:
+    if format == "nbesf":
+        return path.open("rb")
+    return path.open("r", encoding="utf-8")
 
 
 @cli.command(help="从Nonebot Biosn Exchangable Subscribes File导入订阅", name="import")
 @click.option("--path", "-p", required=True, help="导入文件名")
 @click.option(
     "--format",
-    default="json",
-    type=click.Choice(["json", "yaml", "yml"]),
-    help="指定导入格式[json, yaml]，默认为 json",
+    default=None,
+    type=click.Choice(["json", "yaml", "yml", "nbesf"]),
+    help="指定导入格式[json, yaml, nbesf]，默认根据文件内容自动识别",
 )
 @run_async
-async def subs_import(path: str, format: str):
+async def subs_import(path: str, format: str | None):
 
     await init_scheduler()
 
     import_file_path = Path(path)
     assert import_file_path.is_file(), "该路径不是文件！"
 
-    with import_file_path.open("r", encoding="utf-8") as f:
-        match format:
-            case "yaml" | "yml":
-                logger.info("正在从yaml导入...")
+    if format is None:
+        format = detect_nbesf_format(import_file_path)
+
+    match format:
+        case "yaml" | "yml":
+            logger.info("正在从yaml导入...")
+
+            import_yaml_module()
 
-                pyyaml = import_yaml_module()
-                import_items = pyyaml.safe_load(f)
+        case "json":
+            logger.info("正在从json导入...")
 
-            case "json":
-                logger.info("正在从json导入...")
+        case "nbesf":
+            logger.info("正在从二进制nbesf导入...")
 
-                import_items = json.load(f)
+            import_msgpack_module()
 
-            case _:
-                raise click.BadParameter(message=f"不支持的导入格式: {format}")
+        case _:
+            raise click.BadParameter(message=f"不支持的导入格式: {format}")
 
-        nbesf_data = nbesf_parser(import_items)
-        await subscribes_import(nbesf_data)
+    # 先完整校验一遍文件，只要有任何错误都不会进行订阅；
+    # 两次读取都是逐个 SubPack 进行的，内存占用与文件大小无关
+    with open_import_file(import_file_path, format) as f:
+        for _ in nbesf_stream_parser(f, format):
+            pass
+    with open_import_file(import_file_path, format) as f:
+        await subscribes_import_stream(nbesf_stream_parser(f, format))
 
 
 def main():
@@ -1,35 +1,258 @@
 import asyncio
-from asyncio.tasks import sleep
+import math
+import time
 from collections import deque
-from typing import Deque, Literal, Union
+from dataclasses import dataclass, field
+from typing import Deque, Literal, Optional, Union
 
+from nonebot import get_driver
 from nonebot.adapters.onebot.v11.bot import Bot
 from nonebot.adapters.onebot.v11.exception import ActionFailed
 from nonebot.adapters.onebot.v11.message import Message, MessageSegment
 from nonebot.log import logger
 
+from .config.send_outbox import load_message, send_outbox
 from .plugin_config import plugin_config
-from .utils.get_bot import refresh_bots
-
-QUEUE: Deque[
-    tuple[
-        Bot,
-        int,
-        Literal["private", "group", "group-forward"],
-        Union[str, Message],
-        int,
-    ]
-] = deque()
+from .types import SendPriority
+from .utils.get_bot import bot_directory, bot_load, bot_member_info, get_bots
 
 MESSGE_SEND_INTERVAL = 1.5
 
 
+class TokenBucket:
+    """令牌桶，平均每 interval 秒产生一个令牌，至多积攒 capacity 个"""
+
+    def __init__(self, interval: float, capacity: int = 1):
+        self.interval = interval
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float) -> float:
+        """距离下一个令牌可用还需等待的秒数"""
+        if self.interval <= 0:
+            return 0
+        elapsed = max(now - self.updated, 0)
+        self.tokens = min(self.capacity, self.tokens + elapsed / self.interval)
+        self.updated = max(now, self.updated)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) * self.interval
+
+    def consume(self):
+        if self.interval > 0:
+            self.tokens -= 1
+
+
+@dataclass(eq=False)
+class SendItem:
+    user: int
+    user_type: Literal["private", "group", "group-forward"]
+    msg: Union[str, Message]
+    retry_time: int
+    outbox_key: str = ""
+    priority: int = SendPriority.NORMAL
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class BotSendQueue:
+    """单个 Bot 的发送队列
+
+    发送频率由 Bot 的令牌桶限制，发往群的消息还受该群的令牌桶限制。
+    某个群的令牌耗尽时先发送其他群的消息，同一群或用户的消息总是按顺序发送。
+
+    优先级高的消息先发送，消息每等待 priority_aging 秒提升一级优先级，
+    以免优先级低的消息一直得不到发送。
+    """
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.items: Deque[SendItem] = deque()
+        self.bucket = TokenBucket(
+            plugin_config.bison_send_interval.get(bot.self_id, MESSGE_SEND_INTERVAL),
+            plugin_config.bison_send_burst,
+        )
+        self.priority_aging = plugin_config.bison_send_priority_aging
+        self._group_buckets: dict[int, Optional[TokenBucket]] = {}
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+
+    def _group_bucket(self, item: SendItem) -> Optional[TokenBucket]:
+        if item.user_type == "private":
+            return None
+        if item.user not in self._group_buckets:
+            interval = plugin_config.bison_send_group_interval.get(str(item.user))
+            self._group_buckets[item.user] = TokenBucket(interval) if interval else None
+        return self._group_buckets[item.user]
+
+    def put(self, item: SendItem):
+        self.items.append(item)
+        self._wakeup.set()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(do_send_msgs(self))
+
+    def _effective_priority(self, item: SendItem, now: float) -> float:
+        if self.priority_aging <= 0:
+            return item.priority
+        return item.priority - (now - item.enqueued_at) // self.priority_aging
+
+    def pick(self) -> tuple[Optional[SendItem], float]:
+        """取出下一条可以发送的消息，没有时返回需要等待的秒数"""
+        now = time.monotonic()
+        wait = self.bucket.wait_time(now)
+        if wait > 0:
+            return None, wait
+        wait = math.inf
+        blocked = set()
+        picked: Optional[SendItem] = None
+        picked_priority = math.inf
+        for item in self.items:
+            target = (item.user_type == "private", item.user)
+            if target in blocked:
+                continue
+            group_bucket = self._group_bucket(item)
+            if group_bucket and (group_wait := group_bucket.wait_time(now)) > 0:
+                # 同一群的后续消息也不能越过这一条
+                blocked.add(target)
+                wait = min(wait, group_wait)
+                continue
+            # 优先级相同时先加入队列的先发送
+            if (priority := self._effective_priority(item, now)) < picked_priority:
+                picked, picked_priority = item, priority
+        if picked is None:
+            return None, wait
+        self.items.remove(picked)
+        self.bucket.consume()
+        if group_bucket := self._group_bucket(picked):
+            group_bucket.consume()
+        _record_wait_time(picked, now)
+        return picked, 0
+
+    async def wait(self, timeout: float):
+        """等待 timeout 秒，期间有新消息加入时提前返回"""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+WAIT_TIME_SAMPLES = 200
+_wait_times: dict[int, Deque[float]] = {}
+
+
+def _record_wait_time(item: SendItem, now: float):
+    _wait_times.setdefault(item.priority, deque(maxlen=WAIT_TIME_SAMPLES)).append(
+        now - item.enqueued_at
+    )
+
+
+def _lane_name(priority: int) -> str:
+    try:
+        return SendPriority(priority).name
+    except ValueError:
+        return str(priority)
+
+
+def wait_time_percentiles() -> dict[str, dict[str, float]]:
+    """最近发送的消息在队列中等待的时间分位数（秒），按优先级分组"""
+    res = {}
+    for priority, samples in sorted(_wait_times.items()):
+        ordered = sorted(samples)
+        res[_lane_name(priority)] = {
+            f"p{p}": ordered[max(math.ceil(len(ordered) * p / 100) - 1, 0)]
+            for p in (50, 90, 99)
+        }
+    return res
+
+
+QUEUES: dict[str, BotSendQueue] = {}
+_queues_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_send_queue(bot: Bot) -> BotSendQueue:
+    global _queues_loop
+    loop = asyncio.get_running_loop()
+    if _queues_loop is not loop:
+        # 发送任务绑定在事件循环上，事件循环改变后需要重新创建
+        QUEUES.clear()
+        _queues_loop = loop
+    if bot.self_id not in QUEUES:
+        QUEUES[bot.self_id] = BotSendQueue(bot)
+    queue = QUEUES[bot.self_id]
+    # Bot 重新连接后会是新的对象
+    queue.bot = bot
+    return queue
+
+
+def _queue_depth(bot_id: str) -> int:
+    return len(QUEUES[bot_id].items) if bot_id in QUEUES else 0
+
+
+bot_load.queue_depth = _queue_depth
+
+
+def queue_size() -> int:
+    """所有 Bot 的发送队列中等待发送的消息数量"""
+    return sum(len(queue.items) for queue in QUEUES.values())
+
+
+def lane_sizes() -> dict[str, int]:
+    """按优先级统计等待发送的消息数量"""
+    res = {priority.name: 0 for priority in SendPriority}
+    for queue in QUEUES.values():
+        for item in queue.items:
+            lane = _lane_name(item.priority)
+            res[lane] = res.get(lane, 0) + 1
+    return res
+
+
+_REPLAY: dict[str, list[SendItem]] = {}
+
+
+async def load_outbox():
+    """读取上次退出时未发送完成的消息，对应的 Bot 连接后重新发送"""
+    for record in await send_outbox.load():
+        _REPLAY.setdefault(record.bot_id, []).append(
+            SendItem(
+                record.user,
+                record.user_type,  # type: ignore
+                load_message(record.message),
+                record.retry_time,
+                record.key,
+                record.priority,
+            )
+        )
+    if _REPLAY:
+        logger.info(
+            f"loaded {sum(map(len, _REPLAY.values()))} unsent message(s) from outbox"
+        )
+    for bot in get_bots():
+        replay_outbox(bot)
+
+
+def replay_outbox(bot: Bot):
+    items = _REPLAY.pop(bot.self_id, [])
+    if not items:
+        return
+    logger.info(f"resend {len(items)} message(s) by bot {bot.self_id}")
+    queue = get_send_queue(bot)
+    for item in items:
+        queue.put(item)
+
+
+@get_driver().on_bot_connect
+async def _(bot: Bot):
+    replay_outbox(bot)
+
+
 async def _do_send(
     bot: "Bot",
     user: int,
     user_type: Literal["group", "private", "group-forward"],
     msg: Union[str, Message],
 ):
+    start = time.perf_counter()
     try:
         if user_type == "group":
             await bot.send_group_msg(group_id=user, message=msg)
@@ -38,39 +261,36 @@ async def _do_send(
         elif user_type == "group-forward":
             await bot.send_group_forward_msg(group_id=user, messages=msg)
     except ActionFailed:
-        await refresh_bots()
+        bot_load.record_failure(bot.self_id)
+        bot_directory.request_refresh()
         logger.warning(f"send msg failed, refresh bots")
+    except Exception:
+        bot_load.record_failure(bot.self_id)
+        raise
+    else:
+        bot_load.record_sent(bot.self_id, time.perf_counter() - start)
 
 
-async def do_send_msgs():
-    if not QUEUE:
-        return
-    while True:
-        # why read from queue then pop item from queue?
-        # if there is only 1 item in queue, pop it and await send
-        # the length of queue will be 0.
-        # At that time, adding items to queue will trigger a new execution of this func, which is wrong.
-        # So, read from queue first then pop from it
-        bot, user, user_type, msg, retry_time = QUEUE[0]
+async def do_send_msgs(queue: BotSendQueue):
+    while queue.items:
+        item, wait = queue.pick()
+        if item is None:
+            await queue.wait(wait)
+            continue
         try:
-            await _do_send(bot, user, user_type, msg)
+            await _do_send(queue.bot, item.user, item.user_type, item.msg)
         except Exception as e:
-            await asyncio.sleep(MESSGE_SEND_INTERVAL)
-            QUEUE.popleft()
-            if retry_time > 0:
-                QUEUE.appendleft((bot, user, user_type, msg, retry_time - 1))
-            else:
-                msg_str = str(msg)
-                if len(msg_str) > 50:
-                    msg_str = msg_str[:50] + "..."
-                logger.warning(f"send msg err {e} {msg_str}")
-        else:
-            # sleeping after popping may also cause re-execution error like above mentioned
-            await asyncio.sleep(MESSGE_SEND_INTERVAL)
-            QUEUE.popleft()
-        finally:
-            if not QUEUE:
-                return
+            if item.retry_time > 0:
+                item.retry_time -= 1
+                queue.items.appendleft(item)
+                continue
+            msg_str = str(item.msg)
+            if len(msg_str) > 50:
+                msg_str = msg_str[:50] + "..."
+            logger.warning(f"send msg err {e} {msg_str}")
+        send_outbox.ack(item.outbox_key)
+        if send_outbox.need_flush():
+            await send_outbox.flush()
 
 
 async def _send_msgs_dispatch(
@@ -78,33 +298,42 @@ async def _send_msgs_dispatch(
     user,
     user_type: Literal["private", "group", "group-forward"],
     msg: Union[str, Message],
+    priority: int = SendPriority.NORMAL,
 ):
     if plugin_config.bison_use_queue:
-        QUEUE.append((bot, user, user_type, msg, plugin_config.bison_resend_times))
-        # len(QUEUE) before append was 0
-        if len(QUEUE) == 1:
-            asyncio.create_task(do_send_msgs())
+        retry_time = plugin_config.bison_resend_times
+        key = send_outbox.add(bot.self_id, user, user_type, msg, retry_time, priority)
+        get_send_queue(bot).put(
+            SendItem(user, user_type, msg, retry_time, key, priority)
+        )
+        if send_outbox.need_flush():
+            await send_outbox.flush()
     else:
         await _do_send(bot, user, user_type, msg)
 
 
 async def send_msgs(
-    bot: Bot, user, user_type: Literal["private", "group"], msgs: list[Message]
+    bot: Bot,
+    user,
+    user_type: Literal["private", "group"],
+    msgs: list[Message],
+    priority: Optional[int] = None,
 ):
+    if priority is None:
+        priority = SendPriority.NORMAL
     if not plugin_config.bison_use_pic_merge or user_type == "private":
         for msg in msgs:
-            await _send_msgs_dispatch(bot, user, user_type, msg)
+            await _send_msgs_dispatch(bot, user, user_type, msg, priority)
         return
     msgs = msgs.copy()
     if plugin_config.bison_use_pic_merge == 1:
-        await _send_msgs_dispatch(bot, user, "group", msgs.pop(0))
+        await _send_msgs_dispatch(bot, user, "group", msgs.pop(0), priority)
     if msgs:
         if len(msgs) == 1:  # 只有一条消息序列就不合并转发
-            await _send_msgs_dispatch(bot, user, "group", msgs.pop(0))
+            await _send_msgs_dispatch(bot, user, "group", msgs.pop(0), priority)
         else:
-            group_bot_info = await bot.get_group_member_info(
-                group_id=user, user_id=int(bot.self_id), no_cache=True
-            )  # 调用api获取群内bot的相关参数
+            # 获取群内bot的相关参数，通常已有缓存
+            group_bot_info = await bot_member_info.get(bot, user)
             forward_msg = Message(
                 [
                     MessageSegment.node_custom(
@@ -116,4 +345,4 @@ async def send_msgs(
                 ]
             )
 
-            await _send_msgs_dispatch(bot, user, "group-forward", forward_msg)
+            await _send_msgs_dispatch(bot, user, "group-forward", forward_msg, priority)
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from datetime import time
+from enum import IntEnum
 from typing import Any, Literal, NamedTuple, NewType
 
 from httpx import URL
@@ -24,6 +25,14 @@ class PlatformTarget:
     target_name: str
 
 
+class SendPriority(IntEnum):
+    """推送的发送优先级，数值越小越先发送"""
+
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
 class UserSubInfo(NamedTuple):
     user: User
     categories: list[Category]
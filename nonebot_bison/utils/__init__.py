@@ -11,10 +11,16 @@ from nonebot.plugin import require
 from ..plugin_config import plugin_config
 from .context import ProcessContext
 from .http import http_client
+from .image import image_fetcher
+from .image_cache import image_cache
+from .render import render_service
 from .scheduler_config import SchedulerConfig, scheduler
 
 __all__ = [
     "http_client",
+    "image_fetcher",
+    "image_cache",
+    "render_service",
     "Singleton",
     "parse_text",
     "ProcessContext",
@@ -36,10 +42,7 @@ class Singleton(type):
 async def parse_text(text: str) -> MessageSegment:
     "return raw text if don't use pic, otherwise return rendered opcode"
     if plugin_config.bison_use_pic:
-        require("nonebot_plugin_htmlrender")
-        from nonebot_plugin_htmlrender import text_to_pic as _text_to_pic
-
-        return MessageSegment.image(await _text_to_pic(text))
+        return MessageSegment.image(await render_service.text_to_pic(text))
     else:
         return MessageSegment.text(text)
 
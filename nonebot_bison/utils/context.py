@@ -1,25 +1,50 @@
 from base64 import b64encode
+from contextvars import ContextVar
+from typing import Optional
 
 from httpx import AsyncClient, Response
 
+from ..types import Target
+
+_current_context: ContextVar[Optional["ProcessContext"]] = ContextVar(
+    "bison_process_context", default=None
+)
+
+
+async def _log_to_current_ctx(r: Response):
+    if ctx := _current_context.get():
+        ctx.log_response(r)
+
 
 class ProcessContext:
     reqs: list[Response]
+    # 为 None 时 Post id 在抓取时立即写入 seen_post_store
+    deferred_seen_posts: Optional[list[tuple[str, Target, list[str]]]]
 
-    def __init__(self) -> None:
+    def __init__(self, defer_seen_posts: bool = False) -> None:
+        """
+        defer_seen_posts:
+            将要推送的 Post 的 id 暂存在 deferred_seen_posts 中，
+            由调用者在推送交给发送队列后写入，避免重启时丢失尚未发送的推送
+        """
         self.reqs = []
+        self.deferred_seen_posts = [] if defer_seen_posts else None
 
     def log_response(self, resp: Response):
         self.reqs.append(resp)
 
     def register_to_client(self, client: AsyncClient):
-        async def _log_to_ctx(r: Response):
-            self.log_response(r)
+        """将当前 task 中通过 client 发出的请求记录到本 context
 
-        hooks = {
-            "response": [_log_to_ctx],
-        }
-        client.event_hooks = hooks
+        同一个 client 可能被多个并发的抓取共享，所以按 task 区分 context
+        """
+        _current_context.set(self)
+        response_hooks = client.event_hooks["response"]
+        if _log_to_current_ctx not in response_hooks:
+            client.event_hooks = {
+                **client.event_hooks,
+                "response": [*response_hooks, _log_to_current_ctx],
+            }
 
     def _should_print_content(self, r: Response) -> bool:
         content_type = r.headers["content-type"]
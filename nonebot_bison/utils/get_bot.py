@@ -1,22 +1,63 @@
 """ 提供获取 Bot 的方法 """
+import asyncio
 import random
-from typing import Any, Optional
+import time
+from collections import deque
+from typing import Any, Callable, Optional
 
 import nonebot
 from nonebot import get_driver, on_notice
 from nonebot.adapters.onebot.v11 import (
     Bot,
     FriendAddNoticeEvent,
+    GroupAdminNoticeEvent,
     GroupDecreaseNoticeEvent,
     GroupIncreaseNoticeEvent,
+    NoticeEvent,
 )
+from nonebot.log import logger
 
+from ..plugin_config import plugin_config
 from ..types import User
 
 GROUP: dict[int, list[Bot]] = {}
 USER: dict[int, list[Bot]] = {}
 
 
+class BotMemberInfoCache:
+    """Bot 自身在各个群中的成员信息（群名片、昵称等）缓存
+
+    以 (Bot, 群号) 为键，缓存 ttl 秒，Bot 进出群、群名片或管理员变动时失效。
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._cache: dict[tuple[str, int], tuple[float, dict[str, Any]]] = {}
+
+    async def get(self, bot: Bot, group_id: int) -> dict[str, Any]:
+        key = (bot.self_id, group_id)
+        now = time.monotonic()
+        if (cached := self._cache.get(key)) and now - cached[0] < self.ttl:
+            return cached[1]
+        info = await bot.get_group_member_info(
+            group_id=group_id, user_id=int(bot.self_id), no_cache=True
+        )
+        if self.ttl > 0:
+            self._cache[key] = (now, info)
+        return info
+
+    def invalidate(self, bot_id: str, group_id: Optional[int] = None):
+        """使缓存失效，不指定群号时使该 Bot 的所有缓存失效"""
+        if group_id is not None:
+            self._cache.pop((bot_id, group_id), None)
+            return
+        for key in [key for key in self._cache if key[0] == bot_id]:
+            del self._cache[key]
+
+
+bot_member_info = BotMemberInfoCache(plugin_config.bison_bot_member_info_ttl)
+
+
 def get_bots() -> list[Bot]:
     """获取所有 OneBot 11 Bot"""
     bots = []
@@ -26,37 +67,135 @@ def get_bots() -> list[Bot]:
     return bots
 
 
-async def refresh_bots():
-    """刷新缓存的 Bot 数据"""
-    GROUP.clear()
-    USER.clear()
-    for bot in get_bots():
-        # 获取群列表
-        groups = await bot.get_group_list()
+class BotDirectory:
+    """Bot 所在的群与好友的目录，即 GROUP 与 USER
+
+    Bot 连接时只获取这个 Bot 的群列表与好友列表，断开时移除这个 Bot，
+    加群、退群、加好友的通知直接修改目录，无需重新获取。
+    完整刷新会同时获取所有 Bot 的列表，进行中的刷新会被复用；
+    request_refresh 在 debounce 秒后才开始刷新，期间的多次请求只刷新一次。
+    """
+
+    def __init__(self, debounce: float):
+        self.debounce = debounce
+        self._groups: dict[str, set[int]] = {}
+        self._friends: dict[str, set[int]] = {}
+        self._refreshing: dict[str, asyncio.Task] = {}
+        self._full_refresh: Optional[asyncio.Task] = None
+        self._scheduled: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _check_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 任务绑定在事件循环上，事件循环改变后需要重新创建
+            self._refreshing.clear()
+            self._full_refresh = None
+            self._scheduled = None
+            self._loop = loop
+
+    @staticmethod
+    def _link(index: dict[int, list[Bot]], key: int, bot: Bot):
+        bots = index.setdefault(key, [])
+        if bot not in bots:
+            bots.append(bot)
+
+    @staticmethod
+    def _unlink(index: dict[int, list[Bot]], key: int, bot_id: str):
+        bots = [bot for bot in index.get(key, []) if bot.self_id != bot_id]
+        if bots:
+            index[key] = bots
+        else:
+            index.pop(key, None)
+
+    def add_group(self, bot: Bot, group_id: int):
+        self._groups.setdefault(bot.self_id, set()).add(group_id)
+        self._link(GROUP, group_id, bot)
+
+    def remove_group(self, bot: Bot, group_id: int):
+        self._groups.get(bot.self_id, set()).discard(group_id)
+        self._unlink(GROUP, group_id, bot.self_id)
+
+    def add_friend(self, bot: Bot, user_id: int):
+        self._friends.setdefault(bot.self_id, set()).add(user_id)
+        self._link(USER, user_id, bot)
+
+    def remove_bot(self, bot_id: str):
+        for group_id in self._groups.pop(bot_id, set()):
+            self._unlink(GROUP, group_id, bot_id)
+        for user_id in self._friends.pop(bot_id, set()):
+            self._unlink(USER, user_id, bot_id)
+
+    async def _do_refresh_bot(self, bot: Bot):
+        groups, users = await asyncio.gather(
+            bot.get_group_list(), bot.get_friend_list()
+        )
+        self.remove_bot(bot.self_id)
         for group in groups:
-            group_id = group["group_id"]
-            if group_id not in GROUP:
-                GROUP[group_id] = [bot]
-            else:
-                GROUP[group_id].append(bot)
-
-        # 获取好友列表
-        users = await bot.get_friend_list()
+            self.add_group(bot, group["group_id"])
         for user in users:
-            user_id = user["user_id"]
-            if user_id not in USER:
-                USER[user_id] = [bot]
-            else:
-                USER[user_id].append(bot)
+            self.add_friend(bot, user["user_id"])
+
+    async def refresh_bot(self, bot: Bot):
+        """重新获取一个 Bot 的群列表与好友列表"""
+        self._check_loop()
+        task = self._refreshing.get(bot.self_id)
+        if task is None:
+            task = asyncio.create_task(self._do_refresh_bot(bot))
+            self._refreshing[bot.self_id] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(bot.self_id, None))
+        await asyncio.shield(task)
+
+    async def _do_refresh(self):
+        bots = get_bots()
+        bot_ids = {bot.self_id for bot in bots}
+        for bot_id in set(self._groups) | set(self._friends):
+            if bot_id not in bot_ids:
+                self.remove_bot(bot_id)
+        await asyncio.gather(*(self.refresh_bot(bot) for bot in bots))
+
+    async def refresh(self):
+        """重新获取所有 Bot 的群列表与好友列表"""
+        self._check_loop()
+        if self._full_refresh is None or self._full_refresh.done():
+            self._full_refresh = asyncio.create_task(self._do_refresh())
+        await asyncio.shield(self._full_refresh)
+
+    def request_refresh(self):
+        """在 debounce 秒后进行一次完整刷新，已有等待中的刷新时不重复安排"""
+        self._check_loop()
+        if self._scheduled is None or self._scheduled.done():
+            self._scheduled = asyncio.create_task(self._delayed_refresh())
+
+    async def _delayed_refresh(self):
+        await asyncio.sleep(self.debounce)
+        try:
+            await self.refresh()
+        except Exception as err:
+            logger.warning(f"refresh bots failed: {err!r}")
+
+
+bot_directory = BotDirectory(plugin_config.bison_bot_refresh_debounce)
+
+
+async def refresh_bots():
+    """刷新缓存的 Bot 数据"""
+    await bot_directory.refresh()
 
 
 driver = get_driver()
 
 
 @driver.on_bot_connect
+async def _(bot: Bot):
+    bot_member_info.invalidate(bot.self_id)
+    await bot_directory.refresh_bot(bot)
+
+
 @driver.on_bot_disconnect
 async def _(bot: Bot):
-    await refresh_bots()
+    bot_member_info.invalidate(bot.self_id)
+    bot_directory.remove_bot(bot.self_id)
 
 
 change_notice = on_notice(priority=1)
@@ -64,19 +203,104 @@ change_notice = on_notice(priority=1)
 
 @change_notice.handle()
 async def _(bot: Bot, event: FriendAddNoticeEvent):
-    await refresh_bots()
+    bot_directory.add_friend(bot, event.user_id)
 
 
 # 01-06 16:56:51 [SUCCESS] nonebot | OneBot V11 **** | [notice.group_increase.approve]: {'time': 1672995411, 'self_id': ****, 'post_type': 'notice', 'notice_type': 'group_increase', 'sub_type': 'approve', 'user_id': ****, 'group_id': ****, 'operator_id': 0}
 # 01-06 16:58:09 [SUCCESS] nonebot | OneBot V11 **** | [notice.group_decrease.kick_me]: {'time': 1672995489, 'self_id': ****, 'post_type': 'notice', 'notice_type': 'group_decrease', 'sub_type': 'kick_me', 'user_id': ****, 'group_id': ****, 'operator_id': ****}
 @change_notice.handle()
 async def _(bot: Bot, event: GroupDecreaseNoticeEvent | GroupIncreaseNoticeEvent):
-    if bot.self_id == event.user_id:
-        await refresh_bots()
+    if bot.self_id == str(event.user_id):
+        bot_member_info.invalidate(bot.self_id, event.group_id)
+        if isinstance(event, GroupIncreaseNoticeEvent):
+            bot_directory.add_group(bot, event.group_id)
+        else:
+            bot_directory.remove_group(bot, event.group_id)
+
+
+@change_notice.handle()
+async def _(bot: Bot, event: GroupAdminNoticeEvent):
+    if bot.self_id == str(event.user_id):
+        bot_member_info.invalidate(bot.self_id, event.group_id)
+
+
+# 群名片变更（go-cqhttp 扩展）：{'notice_type': 'group_card', 'group_id': ****, 'user_id': ****, 'card_new': '...', 'card_old': '...'}
+@change_notice.handle()
+async def _(bot: Bot, event: NoticeEvent):
+    if event.notice_type == "group_card" and bot.self_id == str(
+        getattr(event, "user_id", None)
+    ):
+        bot_member_info.invalidate(bot.self_id, getattr(event, "group_id"))
+
+
+class BotLoadTracker:
+    """记录各个 Bot 的发送负载，用于在多个 Bot 中选择负载最低的
+
+    负载依次比较最近 failure_window 秒内的发送失败次数
+    与新消息的预计等待时间（秒），后者为发送队列中的消息数、
+    已分配但尚未发送的推送数与这条消息之和，乘以最近发送耗时的指数移动平均，
+    没有发送记录的 Bot 按 DEFAULT_LATENCY 估计。
+    """
+
+    LATENCY_SMOOTHING = 0.2
+    DEFAULT_LATENCY = 1.0
+
+    def __init__(self, failure_window: float = 300):
+        self.failure_window = failure_window
+        # 由发送队列提供各个 Bot 队列中的消息数
+        self.queue_depth: Callable[[str], int] = lambda bot_id: 0
+        self._assigned: dict[str, int] = {}
+        self._failures: dict[str, deque[float]] = {}
+        self._latency: dict[str, float] = {}
+
+    def assign(self, bot_id: str):
+        """记录分配给 Bot 的推送，发送前调用"""
+        self._assigned[bot_id] = self._assigned.get(bot_id, 0) + 1
+
+    def release(self, bot_id: str):
+        """推送已交给发送队列或已放弃"""
+        if self._assigned.get(bot_id, 0) > 1:
+            self._assigned[bot_id] -= 1
+        else:
+            self._assigned.pop(bot_id, None)
+
+    def record_sent(self, bot_id: str, latency: float):
+        if bot_id in self._latency:
+            self._latency[bot_id] += self.LATENCY_SMOOTHING * (
+                latency - self._latency[bot_id]
+            )
+        else:
+            self._latency[bot_id] = latency
+
+    def record_failure(self, bot_id: str):
+        self._failures.setdefault(bot_id, deque()).append(time.monotonic())
+
+    def _recent_failures(self, bot_id: str) -> int:
+        failures = self._failures.get(bot_id)
+        if not failures:
+            return 0
+        expire = time.monotonic() - self.failure_window
+        while failures and failures[0] < expire:
+            failures.popleft()
+        return len(failures)
+
+    def load(self, bot_id: str) -> tuple[int, float]:
+        pending = self.queue_depth(bot_id) + self._assigned.get(bot_id, 0)
+        latency = self._latency.get(bot_id, self.DEFAULT_LATENCY)
+        return self._recent_failures(bot_id), (pending + 1) * latency
+
+    def choose(self, bots: list[Bot]) -> Bot:
+        """选择负载最低的 Bot，负载相同时随机选择"""
+        loads = {bot.self_id: self.load(bot.self_id) for bot in bots}
+        min_load = min(loads.values())
+        return random.choice([bot for bot in bots if loads[bot.self_id] == min_load])
+
+
+bot_load = BotLoadTracker()
 
 
 def get_bot(user: User) -> Optional[Bot]:
-    """获取 Bot"""
+    """获取 Bot，有多个 Bot 时选择负载最低的"""
     bots = []
     if user.user_type == "group":
         bots = GROUP.get(user.user, [])
@@ -87,14 +311,14 @@ def get_bot(user: User) -> Optional[Bot]:
     if not bots:
         return
 
-    return random.choice(bots)
+    return bot_load.choose(bots)
 
 
 async def get_groups() -> list[dict[str, Any]]:
     """获取所有群号"""
     all_groups: dict[int, dict[str, Any]] = {}
-    for bot in get_bots():
-        groups = await bot.get_group_list()
+    bot_groups = await asyncio.gather(*(bot.get_group_list() for bot in get_bots()))
+    for groups in bot_groups:
         all_groups.update(
             {
                 group["group_id"]: group
@@ -0,0 +1,83 @@
+import asyncio
+from typing import Iterable, Optional
+
+import httpx
+from nonebot.log import logger
+
+from ..plugin_config import plugin_config
+from .http import http_client
+from .image_cache import ImageCache, image_cache
+
+
+class ImageFetcher:
+    """图片下载服务
+
+    同一 host 的图片复用同一个 client 的连接池，避免每张图片都重新建立连接，
+    同一 host 同时进行的下载数不超过 per_host_limit。
+    下载的图片经过 cache 缓存，重复的 URL 不会再次下载。
+    """
+
+    def __init__(self, per_host_limit: int, cache: ImageCache):
+        self.per_host_limit = max(per_host_limit, 1)
+        self.cache = cache
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_host_resource(
+        self, host: str
+    ) -> tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 连接与信号量都绑定在事件循环上，事件循环改变后需要重新创建
+            self._clients.clear()
+            self._semaphores.clear()
+            self._loop = loop
+        if host not in self._clients:
+            self._clients[host] = http_client(
+                limits=httpx.Limits(max_connections=self.per_host_limit)
+            )
+            self._semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._clients[host], self._semaphores[host]
+
+    async def fetch(self, url: str, headers: Optional[dict[str, str]] = None) -> bytes:
+        """下载单张图片，失败时抛出异常"""
+        return await self.cache.get(url, lambda: self._download(url, headers))
+
+    async def _download(
+        self, url: str, headers: Optional[dict[str, str]] = None
+    ) -> bytes:
+        client, semaphore = self._get_host_resource(httpx.URL(url).host)
+        async with semaphore:
+            res = await client.get(url, headers=headers)
+            res.raise_for_status()
+            return res.content
+
+    async def fetch_all(
+        self, urls: Iterable[str], headers: Optional[dict[str, str]] = None
+    ) -> list[Optional[bytes]]:
+        """并发下载多张图片，结果与 urls 顺序一致，下载失败的图片为 None"""
+        urls = list(urls)
+        results = await asyncio.gather(
+            *(self.fetch(url, headers) for url in urls), return_exceptions=True
+        )
+        res: list[Optional[bytes]] = []
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                logger.warning(f"fetch image {url} failed: {result!r}")
+                res.append(None)
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                res.append(result)
+        return res
+
+    async def close(self):
+        clients = list(self._clients.values())
+        self._clients.clear()
+        self._semaphores.clear()
+        for client in clients:
+            await client.aclose()
+
+
+image_fetcher = ImageFetcher(plugin_config.bison_image_fetch_concurrency, image_cache)
@@ -0,0 +1,225 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from nonebot.log import logger
+from nonebot_plugin_datastore import get_plugin_data
+
+from ..plugin_config import plugin_config
+
+_plugin_data = get_plugin_data()
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+class ImageCache:
+    """以 URL 与内容哈希为键的图片缓存
+
+    图片内容以 sha256 存放，不同 URL 指向相同内容时只保存一份。
+    内存层与插件数据目录下的磁盘层各有容量上限，超出时按 LRU 淘汰，
+    容量为 0 时不使用对应的层。
+    同一 URL 同时只会下载一次，其余请求等待这次下载的结果；
+    发起下载的请求被取消时其余请求不受影响，所有请求都取消后才取消下载。
+    磁盘读写在线程中进行，先写入唯一的临时文件再替换，容量统计与淘汰由锁保护。
+    """
+
+    MAX_URL_ENTRIES = 4096
+
+    def __init__(
+        self, memory_budget: int, disk_budget: int, dir_name: str = "image_cache"
+    ):
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.dir_name = dir_name
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_size = 0
+        self._urls: OrderedDict[str, str] = OrderedDict()
+        self._disk_size: Optional[int] = None
+        self._disk_lock = threading.Lock()
+        self._inflight: dict[str, asyncio.Task[bytes]] = {}
+        self._waiters: dict[asyncio.Task[bytes], int] = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "memory_size": self._memory_size,
+            "disk_size": self._disk_size or 0,
+        }
+
+    def hit_rate(self) -> float:
+        hits = self.memory_hits + self.disk_hits + self.coalesced
+        total = hits + self.misses
+        return hits / total if total else 0
+
+    async def get(self, url: str, fetch: Callable[[], Awaitable[bytes]]) -> bytes:
+        """读取 URL 对应的图片，未缓存时调用 fetch 下载"""
+        if (data := self._get_memory(url)) is not None:
+            self.memory_hits += 1
+            return data
+        if (task := self._inflight.get(url)) is not None:
+            self.coalesced += 1
+            return await self._wait(url, task)
+
+        # 下载在独立的任务中进行，由所有等待者共享，
+        # 发起下载的请求被取消时交给其余等待者，全部取消后才取消下载
+        task = asyncio.create_task(self._load(url, fetch))
+        self._inflight[url] = task
+        task.add_done_callback(lambda task: self._load_done(url, task))
+        return await self._wait(url, task)
+
+    async def _wait(self, url: str, task: "asyncio.Task[bytes]") -> bytes:
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    # 之后的请求重新下载，不再等待这个将被取消的任务
+                    if self._inflight.get(url) is task:
+                        del self._inflight[url]
+                    task.cancel()
+
+    async def _load(self, url: str, fetch: Callable[[], Awaitable[bytes]]) -> bytes:
+        if (data := await self._run_disk(self._get_disk, url)) is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            data = await fetch()
+            await self._run_disk(self._put_disk, url, data)
+        self._put_memory(url, data)
+        return data
+
+    def _load_done(self, url: str, task: "asyncio.Task[bytes]"):
+        if self._inflight.get(url) is task:
+            del self._inflight[url]
+        # 没有等待者时避免 asyncio 报告未获取的异常
+        if not task.cancelled():
+            task.exception()
+
+    def _get_memory(self, url: str) -> Optional[bytes]:
+        if (digest := self._urls.get(url)) is None:
+            return None
+        self._urls.move_to_end(url)
+        if (data := self._memory.get(digest)) is None:
+            return None
+        self._memory.move_to_end(digest)
+        return data
+
+    def _put_memory(self, url: str, data: bytes):
+        digest = hashlib.sha256(data).hexdigest()
+        self._urls[url] = digest
+        self._urls.move_to_end(url)
+        while len(self._urls) > self.MAX_URL_ENTRIES:
+            self._urls.popitem(last=False)
+        if len(data) > self.memory_budget:
+            return
+        if digest not in self._memory:
+            self._memory[digest] = data
+            self._memory_size += len(data)
+        self._memory.move_to_end(digest)
+        while self._memory_size > self.memory_budget:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    async def _run_disk(self, func: Callable, *args):
+        if self.disk_budget <= 0:
+            return None
+        try:
+            return await asyncio.to_thread(func, *args)
+        except OSError as err:
+            logger.warning(f"image cache disk error: {err!r}")
+            return None
+
+    @property
+    def _disk_dir(self) -> Path:
+        return _plugin_data.data_dir / self.dir_name
+
+    def _get_disk(self, url: str) -> Optional[bytes]:
+        url_file = self._disk_dir / "urls" / _url_key(url)
+        if not url_file.exists():
+            return None
+        blob = self._disk_dir / "blobs" / url_file.read_text()
+        if not blob.exists():
+            url_file.unlink(missing_ok=True)
+            return None
+        os.utime(blob)
+        return blob.read_bytes()
+
+    def _put_disk(self, url: str, data: bytes):
+        if len(data) > self.disk_budget:
+            return
+        digest = hashlib.sha256(data).hexdigest()
+        blob_dir = self._disk_dir / "blobs"
+        url_dir = self._disk_dir / "urls"
+        blob_dir.mkdir(parents=True, exist_ok=True)
+        url_dir.mkdir(parents=True, exist_ok=True)
+        blob = blob_dir / digest
+        tmp = None
+        if not blob.exists():
+            with tempfile.NamedTemporaryFile(
+                dir=blob_dir, suffix=".tmp", delete=False
+            ) as file:
+                file.write(data)
+            tmp = Path(file.name)
+        with self._disk_lock:
+            if self._disk_size is None:
+                self._disk_size = sum(
+                    blob.stat().st_size for blob in self._iter_blobs(blob_dir)
+                )
+            if blob.exists():
+                os.utime(blob)
+                if tmp:
+                    tmp.unlink(missing_ok=True)
+            elif tmp:
+                tmp.replace(blob)
+                self._disk_size += len(data)
+            else:
+                # 检查之后被其他线程淘汰，放弃这次写入
+                return
+            (url_dir / _url_key(url)).write_text(digest)
+            if self._disk_size > self.disk_budget:
+                self._evict_disk(blob_dir, url_dir)
+
+    @staticmethod
+    def _iter_blobs(blob_dir: Path):
+        # 跳过其他线程尚未写完的临时文件
+        return (blob for blob in blob_dir.iterdir() if blob.suffix != ".tmp")
+
+    def _evict_disk(self, blob_dir: Path, url_dir: Path):
+        blobs = sorted(
+            ((blob, blob.stat()) for blob in self._iter_blobs(blob_dir)),
+            key=lambda item: item[1].st_mtime,
+        )
+        size = sum(stat.st_size for _, stat in blobs)
+        for blob, stat in blobs:
+            if size <= self.disk_budget:
+                break
+            blob.unlink(missing_ok=True)
+            size -= stat.st_size
+        self._disk_size = size
+        kept = {blob.name for blob in self._iter_blobs(blob_dir)}
+        for url_file in url_dir.iterdir():
+            if url_file.read_text() not in kept:
+                url_file.unlink(missing_ok=True)
+
+
+image_cache = ImageCache(
+    plugin_config.bison_image_cache_memory_size * 1024 * 1024,
+    plugin_config.bison_image_cache_disk_size * 1024 * 1024,
+)
@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import math
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Awaitable, Callable, Literal, Optional, TypeVar
+
+from nonebot.log import logger
+from nonebot.plugin import require
+
+from ..plugin_config import plugin_config
+from .image_cache import ImageCache
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page, ViewportSize
+
+T = TypeVar("T")
+
+
+class RenderService:
+    """浏览器渲染服务
+
+    所有经由 htmlrender 的渲染都在此排队，同时进行的渲染不超过 concurrency 个，
+    超过 timeout 秒的渲染会被取消并抛出 asyncio.TimeoutError。
+    截图使用预热的页面池中的页面，用完后放回，省去每次创建页面的开销；
+    text_to_pic 与 md_to_pic 的页面由 htmlrender 自行创建。
+
+    截图时提供页面的 html 则会使用 cache 缓存截图，
+    网址、选择器、视口与 html 内容均未改变时不会再次截图。
+    text_to_pic 与 md_to_pic 的结果以文本（与 css 路径）为键缓存在 text_cache 中。
+    """
+
+    LATENCY_SAMPLES = 200
+
+    def __init__(
+        self,
+        pool_size: int,
+        concurrency: int,
+        timeout: float,
+        cache: Optional[ImageCache] = None,
+        text_cache: Optional[ImageCache] = None,
+    ):
+        self.pool_size = pool_size
+        self.concurrency = max(concurrency, 1)
+        self.timeout = timeout
+        self.cache = cache
+        self.text_cache = text_cache
+        self.timeouts = 0
+        self._idle_pages: dict[float, list["Page"]] = {}
+        self._latencies: dict[str, deque[float]] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            # 页面与信号量都绑定在事件循环上，事件循环改变后需要重新创建
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+            self._idle_pages.clear()
+        return self._semaphore
+
+    async def _run(self, kind: str, job: Callable[[], Awaitable[T]]) -> T:
+        async with self._get_semaphore():
+            start = time.perf_counter()
+            try:
+                res = await asyncio.wait_for(job(), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                logger.warning(f"{kind} timeout after {self.timeout}s")
+                raise
+            self._latencies.setdefault(kind, deque(maxlen=self.LATENCY_SAMPLES)).append(
+                time.perf_counter() - start
+            )
+            return res
+
+    def latency_percentiles(self) -> dict[str, dict[str, float]]:
+        """最近若干次成功渲染的耗时分位数（秒），按渲染方式分组"""
+        res = {}
+        for kind, samples in self._latencies.items():
+            ordered = sorted(samples)
+            res[kind] = {
+                f"p{p}": ordered[max(math.ceil(len(ordered) * p / 100) - 1, 0)]
+                for p in (50, 90, 99)
+            }
+        return res
+
+    async def _new_page(self, device_scale_factor: float) -> "Page":
+        require("nonebot_plugin_htmlrender")
+        from nonebot_plugin_htmlrender.browser import get_browser
+
+        browser = await get_browser()
+        return await browser.new_page(device_scale_factor=device_scale_factor)
+
+    async def _acquire_page(self, device_scale_factor: float) -> "Page":
+        idle_pages = self._idle_pages.setdefault(device_scale_factor, [])
+        while idle_pages:
+            page = idle_pages.pop()
+            # 浏览器可能已被关闭
+            if not page.is_closed():
+                return page
+        return await self._new_page(device_scale_factor)
+
+    async def _release_page(self, device_scale_factor: float, page: "Page"):
+        idle_pages = self._idle_pages.setdefault(device_scale_factor, [])
+        if len(idle_pages) < self.pool_size and not page.is_closed():
+            idle_pages.append(page)
+        else:
+            await page.close()
+
+    async def warm_up(self, device_scale_factor: float = 3):
+        """预先创建截图所用的页面"""
+        self._get_semaphore()
+        idle_pages = self._idle_pages.setdefault(device_scale_factor, [])
+        while len(idle_pages) < self.pool_size:
+            idle_pages.append(await self._new_page(device_scale_factor))
+        logger.info(f"render service warmed up with {len(idle_pages)} page(s)")
+
+    async def capture_element(
+        self,
+        url: str,
+        selector: str,
+        viewport: "ViewportSize",
+        device_scale_factor: float = 1,
+        type: Literal["jpeg", "png"] = "png",
+        quality: Optional[int] = None,
+        html: Optional[str] = None,
+    ) -> bytes:
+        """打开 url 并截取 selector 对应的元素
+
+        html: 调用方获取到的页面内容，用于判断页面是否改变，提供时会缓存截图
+        """
+
+        async def job() -> bytes:
+            page = await self._acquire_page(device_scale_factor)
+            try:
+                await page.set_viewport_size(viewport)
+                await page.goto(url)
+                pic_data = await page.locator(selector).screenshot(
+                    type=type, quality=quality
+                )
+            except BaseException:
+                # 出错的页面状态未知，不再复用
+                await page.close()
+                raise
+            await self._release_page(device_scale_factor, page)
+            return pic_data
+
+        if html is None or self.cache is None:
+            return await self._run("capture_element", job)
+        cache_key = "\n".join(
+            (
+                url,
+                selector,
+                f"{viewport['width']}x{viewport['height']}@{device_scale_factor}",
+                f"{type}:{quality}",
+                hashlib.sha256(html.encode()).hexdigest(),
+            )
+        )
+        return await self.cache.get(
+            cache_key, lambda: self._run("capture_element", job)
+        )
+
+    async def _cached_text_render(
+        self, cache_key: str, job: Callable[[], Awaitable[bytes]]
+    ) -> bytes:
+        if self.text_cache is None:
+            return await job()
+        return await self.text_cache.get(cache_key, job)
+
+    async def text_to_pic(self, text: str) -> bytes:
+        require("nonebot_plugin_htmlrender")
+        from nonebot_plugin_htmlrender import text_to_pic
+
+        return await self._cached_text_render(
+            f"text_to_pic\n{text}",
+            lambda: self._run("text_to_pic", lambda: text_to_pic(text)),
+        )
+
+    async def md_to_pic(self, md: str, css_path: Optional[str] = None) -> bytes:
+        require("nonebot_plugin_htmlrender")
+        from nonebot_plugin_htmlrender import md_to_pic
+
+        return await self._cached_text_render(
+            f"md_to_pic\n{css_path or ''}\n{md}",
+            lambda: self._run("md_to_pic", lambda: md_to_pic(md=md, css_path=css_path)),
+        )
+
+
+render_service = RenderService(
+    plugin_config.bison_render_pool_size,
+    plugin_config.bison_render_concurrency,
+    plugin_config.bison_render_timeout,
+    # 截图通常较大，只缓存在磁盘上
+    ImageCache(0, plugin_config.bison_render_cache_size * 1024 * 1024, "render_cache"),
+    ImageCache(
+        plugin_config.bison_text_pic_cache_memory_size * 1024 * 1024,
+        plugin_config.bison_text_pic_cache_disk_size * 1024 * 1024,
+        "text_pic_cache",
+    ),
+)
@@ -11,6 +11,10 @@ class SchedulerConfig:
     schedule_type: Literal["date", "interval", "cron"]
     schedule_setting: dict
     name: str
+    # 每次调度最多抓取的 Target 数量
+    fetch_batch_size: int = 1
+    # 同一调度器同时进行的抓取数量上限
+    fetch_concurrency: int = 1
 
     def __str__(self):
         return f"[{self.name}]-{self.name}-{self.schedule_setting}"
@@ -26,7 +30,10 @@ class SchedulerConfig:
 
 
 def scheduler(
-    schedule_type: Literal["date", "interval", "cron"], schedule_setting: dict
+    schedule_type: Literal["date", "interval", "cron"],
+    schedule_setting: dict,
+    fetch_batch_size: int = 1,
+    fetch_concurrency: int = 1,
 ) -> Type[SchedulerConfig]:
     return type(
         "AnonymousScheduleConfig",
@@ -34,5 +41,7 @@ def scheduler(
         {
             "schedule_type": schedule_type,
             "schedule_setting": schedule_setting,
+            "fetch_batch_size": fetch_batch_size,
+            "fetch_concurrency": fetch_concurrency,
         },
     )
@@ -159,3 +159,273 @@ async def test_del_subsribe(init_scheduler):
         assert (await sess.scalar(select(func.count()).select_from(Target))) == 1
         target: Target = await sess.scalar(select(Target))
         assert target.target_name == "weibo_name_new"
+
+
+async def test_subscribe_index(app: App, init_scheduler):
+    from nonebot_bison.config.db_config import config
+    from nonebot_bison.types import Target as T_Target
+    from nonebot_bison.types import User as T_User
+    from nonebot_bison.types import UserSubInfo
+
+    await config.add_subscribe(
+        user=123,
+        user_type="group",
+        target=T_Target("weibo_id"),
+        target_name="weibo_name",
+        platform_name="weibo",
+        cats=[1],
+        tags=[],
+    )
+    await config.add_subscribe(
+        user=234,
+        user_type="group",
+        target=T_Target("weibo_id"),
+        target_name="weibo_name",
+        platform_name="weibo",
+        cats=[],
+        tags=[],
+    )
+    await config.update_subscribe(
+        user=123,
+        user_type="group",
+        target="weibo_id",
+        target_name="weibo_name",
+        platform_name="weibo",
+        cats=[2],
+        tags=["tag"],
+    )
+    await config.del_subscribe(
+        user=234, user_type="group", target="weibo_id", platform_name="weibo"
+    )
+    expected = [UserSubInfo(T_User(123, "group"), [2], ["tag"])]
+    assert (
+        await config.get_platform_target_subscribers("weibo", T_Target("weibo_id"))
+        == expected
+    )
+
+    # 内存索引与数据库一致
+    await config.load_subscribe_index()
+    assert (
+        await config.get_platform_target_subscribers("weibo", T_Target("weibo_id"))
+        == expected
+    )
+
+
+async def test_get_all_weight_config(app: App):
+    from datetime import time
+
+    from nonebot_bison.config.db_config import config
+    from nonebot_bison.types import Target as T_Target
+    from nonebot_bison.types import TimeWeightConfig, WeightConfig
+
+    targets = ["weibo_id", "weibo_id2"]
+    for target in targets:
+        await config.add_subscribe(
+            user=123,
+            user_type="group",
+            target=T_Target(target),
+            target_name=f"{target}_name",
+            platform_name="weibo",
+            cats=[],
+            tags=[],
+        )
+    weight_conf = WeightConfig(
+        default=20,
+        time_config=[
+            TimeWeightConfig(start_time=time(1, 0), end_time=time(2, 0), weight=5)
+        ],
+    )
+    await config.update_time_weight_config(T_Target("weibo_id2"), "weibo", weight_conf)
+
+    # 同一平台的每个 Target 都会返回
+    res = await config.get_all_weight_config()
+    assert set(res["weibo"]) == set(targets)
+    assert res["weibo"]["weibo_id2"].weight == weight_conf
+
+
+async def _query_plan(stmt) -> str:
+    from nonebot_plugin_datastore.db import get_engine
+    from sqlalchemy import text
+
+    async with get_engine().connect() as conn:
+        sql = str(
+            stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+        )
+        res = await conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+        return "\n".join(row[-1] for row in res)
+
+
+async def test_hot_path_indexes(app: App):
+    from sqlalchemy import select
+
+    from nonebot_bison.config.db_model import ScheduleTimeWeight, Subscribe, Target
+
+    assert "ix_nonebot_bison_target_platform_name" in await _query_plan(
+        select(Target).where(Target.platform_name == "weibo")
+    )
+    assert "ix_nonebot_bison_subscribe_user_id" in await _query_plan(
+        select(Subscribe).where(Subscribe.user_id == 1)
+    )
+    assert "ix_nonebot_bison_scheduletimeweight_target_id" in await _query_plan(
+        select(ScheduleTimeWeight).where(ScheduleTimeWeight.target_id == 1)
+    )
+    # 唯一约束的索引已能满足按 target_id 与按 (platform_name, target) 的查询
+    for stmt in (
+        select(Subscribe).where(Subscribe.target_id == 1),
+        select(Target).where(Target.platform_name == "weibo", Target.target == "1"),
+    ):
+        plan = await _query_plan(stmt)
+        assert "SEARCH" in plan and "SCAN" not in plan
+
+
+@pytest.mark.benchmark
+async def test_db_config_benchmark(app: App, mocker):
+    """
+    向数据库写入 N 条订阅后统计 DBConfig 各方法的平均耗时，并与去掉热点索引时比较
+
+    N 可以通过环境变量 BISON_BENCHMARK_SUBSCRIBES 指定，默认为 20000
+    """
+    import os
+    import random
+    import time
+    from datetime import time as dt_time
+
+    from nonebot.log import logger
+    from nonebot_plugin_datastore.db import get_engine
+    from sqlalchemy import text
+
+    from nonebot_bison.config.db_config import config
+    from nonebot_bison.config.subs_io.nbesf_model import SubReceipt
+    from nonebot_bison.types import Target as T_Target
+    from nonebot_bison.types import TimeWeightConfig, WeightConfig
+
+    mocker.patch.object(config, "add_target_hook", [])
+    mocker.patch.object(config, "delete_target_hook", [])
+    mocker.patch.object(config, "weight_change_hook", [])
+
+    sub_count = int(os.environ.get("BISON_BENCHMARK_SUBSCRIBES", 20000))
+    user_count = max(sub_count // 5, 1)
+    target_count = max(sub_count // 10, 1)
+    platforms = ["weibo", "bilibili", "rss", "ncm-artist"]
+    rand = random.Random(0)
+    targets = [(platforms[i % len(platforms)], str(i)) for i in range(target_count)]
+    receipts = []
+    for uid in range(user_count):
+        for platform_name, target in rand.sample(targets, min(5, target_count)):
+            receipts.append(
+                SubReceipt(
+                    user=uid,
+                    user_type="group",
+                    target=target,
+                    target_name=f"name {target}",
+                    platform_name=platform_name,
+                    cats=[1],
+                    tags=[],
+                )
+            )
+
+    start = time.perf_counter()
+    await config.add_subscribes(receipts, 1000)
+    logger.info(f"seed {len(receipts)} subscribes: {time.perf_counter() - start:.2f}s")
+    weight_conf = WeightConfig(
+        default=10,
+        time_config=[
+            TimeWeightConfig(
+                start_time=dt_time(1, 0), end_time=dt_time(2, 0), weight=20
+            )
+        ],
+    )
+    for platform_name, target in targets[::10]:
+        await config.update_time_weight_config(
+            T_Target(target), platform_name, weight_conf
+        )
+
+    async def _measure() -> dict[str, float]:
+        # 每个方法调用 repeat 次，取平均耗时
+        repeat = 20
+        rand = random.Random(1)
+        samples = {
+            "list_subscribe": [
+                (config.list_subscribe, (rand.randrange(user_count), "group"))
+                for _ in range(repeat)
+            ],
+            "list_subs_with_all_info": [(config.list_subs_with_all_info, ())] * 3,
+            "get_platform_target": [
+                (config.get_platform_target, (platform_name,))
+                for platform_name in platforms
+            ],
+            "get_time_weight_config": [
+                (config.get_time_weight_config, (T_Target(target), platform_name))
+                for platform_name, target in rand.sample(targets, repeat)
+            ],
+            "update_time_weight_config": [
+                (
+                    config.update_time_weight_config,
+                    (T_Target(target), platform_name, weight_conf),
+                )
+                for platform_name, target in targets[::10][:repeat]
+            ],
+            "load_time_weight_table": [(config.load_time_weight_table, ())] * 3,
+            "load_subscribe_index": [(config.load_subscribe_index, ())] * 3,
+            "get_all_weight_config": [(config.get_all_weight_config, ())] * 3,
+            "update_subscribe": [
+                (
+                    config.update_subscribe,
+                    (
+                        receipt.user,
+                        "group",
+                        receipt.target,
+                        receipt.target_name,
+                        receipt.platform_name,
+                        [2],
+                        [],
+                    ),
+                )
+                for receipt in rand.sample(receipts, repeat)
+            ],
+        }
+        res = {}
+        for name, calls in samples.items():
+            start = time.perf_counter()
+            for fun, args in calls:
+                await fun(*args)
+            res[name] = (time.perf_counter() - start) / len(calls) * 1000
+        # 新增与删除订阅成对进行，不改变数据量
+        new_subs = [
+            (user_count + i, platform_name, target)
+            for i, (platform_name, target) in enumerate(rand.sample(targets, repeat))
+        ]
+        start = time.perf_counter()
+        for uid, platform_name, target in new_subs:
+            await config.add_subscribe(
+                uid, "group", T_Target(target), "name", platform_name, [], []
+            )
+        res["add_subscribe"] = (time.perf_counter() - start) / repeat * 1000
+        start = time.perf_counter()
+        for uid, platform_name, target in new_subs:
+            await config.del_subscribe(uid, "group", target, platform_name)
+        res["del_subscribe"] = (time.perf_counter() - start) / repeat * 1000
+        return res
+
+    indexes = {
+        "ix_nonebot_bison_target_platform_name": "nonebot_bison_target(platform_name)",
+        "ix_nonebot_bison_subscribe_user_id": "nonebot_bison_subscribe(user_id)",
+        "ix_nonebot_bison_scheduletimeweight_target_id": (
+            "nonebot_bison_scheduletimeweight(target_id)"
+        ),
+    }
+    with_index = await _measure()
+    async with get_engine().begin() as conn:
+        for name in indexes:
+            await conn.execute(text(f"DROP INDEX {name}"))
+    try:
+        without_index = await _measure()
+    finally:
+        async with get_engine().begin() as conn:
+            for name, columns in indexes.items():
+                await conn.execute(text(f"CREATE INDEX {name} ON {columns}"))
+
+    for name, cost in with_index.items():
+        logger.info(
+            f"{name}: {cost:.2f}ms indexed, {without_index[name]:.2f}ms without index"
+        )
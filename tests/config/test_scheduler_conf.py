@@ -102,21 +102,32 @@ async def test_get_current_weight(init_scheduler, mocker: MockerFixture):
             ],
         ),
     )
+
+    async def _current_weight():
+        await config.refresh_current_weight()
+        return {
+            f"{platform_name}-{target}": config.get_current_weight(
+                platform_name, T_Target(target)
+            )
+            for platform_name, target in (
+                ("weibo", "weibo_id"),
+                ("weibo", "weibo_id1"),
+                ("bilibili", "weibo_id1"),
+            )
+        }
+
     mocker.patch.object(db_config, "_get_time", return_value=time(1, 30))
-    weight = await config.get_current_weight_val(["weibo", "bilibili"])
-    assert len(weight) == 3
+    weight = await _current_weight()
     assert weight["weibo-weibo_id"] == 20
     assert weight["weibo-weibo_id1"] == 10
     assert weight["bilibili-weibo_id1"] == 10
     mocker.patch.object(db_config, "_get_time", return_value=time(4, 0))
-    weight = await config.get_current_weight_val(["weibo", "bilibili"])
-    assert len(weight) == 3
+    weight = await _current_weight()
     assert weight["weibo-weibo_id"] == 30
     assert weight["weibo-weibo_id1"] == 10
     assert weight["bilibili-weibo_id1"] == 10
     mocker.patch.object(db_config, "_get_time", return_value=time(5, 0))
-    weight = await config.get_current_weight_val(["weibo", "bilibili"])
-    assert len(weight) == 3
+    weight = await _current_weight()
     assert weight["weibo-weibo_id"] == 10
     assert weight["weibo-weibo_id1"] == 10
     assert weight["bilibili-weibo_id1"] == 10
@@ -221,3 +232,80 @@ async def test_get_platform_target_subscribers(app: App, init_scheduler):
     assert len(res) == 2
     assert UserSubInfo(T_User(123, "group"), [2], ["tag2"]) in res
     assert UserSubInfo(T_User(245, "group"), [3], ["tag3"]) in res
+
+
+async def test_weight_table_only_refresh_on_boundary(
+    init_scheduler, mocker: MockerFixture
+):
+    from datetime import time
+
+    from nonebot_bison.config import db_config, weight_table
+    from nonebot_bison.config.db_config import TimeWeightConfig, WeightConfig, config
+    from nonebot_bison.types import Target as T_Target
+
+    await config.add_subscribe(
+        user=123,
+        user_type="group",
+        target=T_Target("weibo_id"),
+        target_name="weibo_name",
+        platform_name="weibo",
+        cats=[],
+        tags=[],
+    )
+    await config.update_time_weight_config(
+        target=T_Target("weibo_id"),
+        platform_name="weibo",
+        conf=WeightConfig(
+            default=10,
+            time_config=[
+                TimeWeightConfig(start_time=time(1, 0), end_time=time(2, 0), weight=20),
+            ],
+        ),
+    )
+    mocker.patch.object(db_config, "_get_time", return_value=time(1, 30))
+    await config.load_time_weight_table()
+
+    changes = []
+
+    async def _on_change(platform_name, target, weight):
+        changes.append((platform_name, target, weight))
+
+    mocker.patch.object(config, "weight_change_hook", [_on_change])
+    eval_weight = mocker.spy(weight_table, "_eval_weight")
+
+    mocker.patch.object(db_config, "_get_time", return_value=time(1, 59, 59))
+    await config.refresh_current_weight()
+    assert eval_weight.call_count == 0
+    assert changes == []
+
+    mocker.patch.object(db_config, "_get_time", return_value=time(2, 0))
+    await config.refresh_current_weight()
+    assert eval_weight.call_count == 1
+    assert changes == [("weibo", "weibo_id", 10)]
+    assert config.get_current_weight("weibo", T_Target("weibo_id")) == 10
+
+
+async def test_time_weight_table_expires(app: App, mocker: MockerFixture):
+    from nonebot_bison.config import weight_table
+    from nonebot_bison.config.db_config import TimeWeightConfig, WeightConfig
+    from nonebot_bison.config.weight_table import TimeWeightTable
+    from nonebot_bison.types import Target as T_Target
+
+    eval_weight = mocker.spy(weight_table, "_eval_weight")
+    table = TimeWeightTable()
+    conf = WeightConfig(
+        default=10,
+        time_config=[
+            TimeWeightConfig(start_time=time(1, 0), end_time=time(2, 0), weight=20)
+        ],
+    )
+    table.load({("weibo", T_Target("t")): conf}, time(0, 30), timestamp=0)
+    assert table.get_weight("weibo", T_Target("t")) == 10
+    assert eval_weight.call_count == 1
+
+    # 未越过时间段边界时不重新计算
+    table.refresh(time(0, 40), timestamp=600)
+    assert eval_weight.call_count == 1
+    # 相隔超过一天时，即使一天中的时间仍在区间内也重新计算
+    table.refresh(time(0, 40), timestamp=24 * 60 * 60 + 600)
+    assert eval_weight.call_count == 2
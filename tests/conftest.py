@@ -30,7 +30,9 @@ async def app(tmp_path: Path, request: pytest.FixtureRequest, mocker: MockerFixt
 
     from nonebot_bison import plugin_config
     from nonebot_bison.config.db_model import (
+        OutboxMessage,
         ScheduleTimeWeight,
+        SeenPost,
         Subscribe,
         Target,
         User,
@@ -38,6 +40,8 @@ async def app(tmp_path: Path, request: pytest.FixtureRequest, mocker: MockerFixt
 
     plugin_config.bison_config_path = str(tmp_path / "legacy_config")
     plugin_config.bison_filter_log = False
+    # 测试时不预热浏览器页面
+    plugin_config.bison_render_pool_size = 0
 
     datastore_config.datastore_config_dir = tmp_path / "config"
     datastore_config.datastore_cache_dir = tmp_path / "cache"
@@ -51,15 +55,27 @@ async def app(tmp_path: Path, request: pytest.FixtureRequest, mocker: MockerFixt
         import nonebot_bison.utils.get_bot
 
         mocker.patch.object(nonebot_bison.utils.get_bot, "refresh_bots")
+        mocker.patch.object(nonebot_bison.utils.get_bot.bot_directory, "refresh_bot")
+    from nonebot_bison.utils.get_bot import bot_member_info
+
+    # 每个测试使用独立的 Bot 群成员信息缓存
+    mocker.patch.object(bot_member_info, "_cache", {})
 
     yield App()
 
     # cleanup
+    from nonebot_bison.config.post_store import seen_post_store
+    from nonebot_bison.config.send_outbox import send_outbox
+
+    await seen_post_store.flush()
+    await send_outbox.flush()
     async with create_session() as session, session.begin():
         await session.execute(delete(User))
         await session.execute(delete(Subscribe))
         await session.execute(delete(Target))
         await session.execute(delete(ScheduleTimeWeight))
+        await session.execute(delete(SeenPost))
+        await session.execute(delete(OutboxMessage))
 
     # 关闭渲染图片时打开的浏览器
     await shutdown_browser()
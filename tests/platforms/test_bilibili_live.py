@@ -25,6 +25,8 @@ def dummy_only_open_user_subinfo(app: App):
 @pytest.mark.asyncio
 @respx.mock
 async def test_fetch_bililive_only_live_open(bili_live, dummy_only_open_user_subinfo):
+    from nonebot_bison.types import SendPriority
+
     mock_bili_live_status = get_json("bili_live_status.json")
 
     bili_live_router = respx.get(
@@ -52,6 +54,8 @@ async def test_fetch_bililive_only_live_open(bili_live, dummy_only_open_user_sub
         "https://i0.hdslb.com/bfs/live/new_room_cover/fd357f0f3cbbb48e9acfbcda616b946c2454c56c.jpg"
     ]
     assert post.compress == True
+    # 开播提醒优先发送
+    assert post.priority == SendPriority.HIGH
     # 标题变更
     mock_bili_live_status["data"][target]["title"] = "【Zc】从0挑战到15肉鸽！目前11难度"
     bili_live_router.mock(return_value=Response(200, json=mock_bili_live_status))
@@ -79,6 +83,8 @@ def dummy_only_title_user_subinfo(app: App):
 async def test_fetch_bililive_only_title_change(
     bili_live, dummy_only_title_user_subinfo
 ):
+    from nonebot_bison.types import SendPriority
+
     mock_bili_live_status = get_json("bili_live_status.json")
     target = "13164144"
 
@@ -118,6 +124,7 @@ async def test_fetch_bililive_only_title_change(
         "https://i0.hdslb.com/bfs/live-key-frame/keyframe10170435000003044248mwowx0.jpg"
     ]
     assert post.compress == True
+    assert post.priority == SendPriority.NORMAL
     # 直播状态更新-下播
     mock_bili_live_status["data"][target]["live_status"] = 0
     bili_live_router.mock(return_value=Response(200, json=mock_bili_live_status))
@@ -255,3 +262,48 @@ async def test_fetch_bililive_combo(bili_live, dummy_bililive_user_subinfo):
         "https://i0.hdslb.com/bfs/live-key-frame/keyframe10170435000003044248mwowx0.jpg"
     ]
     assert post4.compress == True
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_batch_fetch_bililive(bili_live, dummy_only_open_user_subinfo, mocker):
+    from copy import deepcopy
+
+    from nonebot_bison.platform import platform as platform_module
+
+    mock_bili_live_status = get_json("bili_live_status.json")
+    mock_bili_live_status["data"]["2233"] = deepcopy(
+        mock_bili_live_status["data"]["13164144"]
+    )
+    mock_bili_live_status["data"]["2233"]["uid"] = 2233
+
+    bili_live_router = respx.get(
+        url__startswith="https://api.live.bilibili.com/room/v1/Room/get_status_info_by_uids"
+    )
+    bili_live_router.mock(return_value=Response(200, json=mock_bili_live_status))
+
+    to_fetch = [
+        ("13164144", [dummy_only_open_user_subinfo]),
+        ("2233", [dummy_only_open_user_subinfo]),
+        ("404", [dummy_only_open_user_subinfo]),
+    ]
+    warning = mocker.spy(platform_module.logger, "warning")
+    res = await bili_live.batch_fetch_new_post(to_fetch)
+    assert bili_live_router.call_count == 1
+    assert bili_live_router.calls.last.request.url.params.get_list("uids[]") == [
+        "13164144",
+        "2233",
+        "404",
+    ]
+    assert res == []
+
+    mock_bili_live_status["data"]["2233"]["live_status"] = 1
+    bili_live_router.mock(return_value=Response(200, json=mock_bili_live_status))
+    res = await bili_live.batch_fetch_new_post(to_fetch)
+    assert bili_live_router.call_count == 2
+    assert len(res) == 1
+    assert res[0][1][0].text == "[开播] 【Zc】从0挑战到15肉鸽！目前10难度"
+    # 没有开通直播间的用户只警告一次
+    assert [call.args[0] for call in warning.call_args_list] == [
+        "fetching Bilibili直播-404 error: status not found"
+    ]
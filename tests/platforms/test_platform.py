@@ -362,6 +362,169 @@ async def test_new_message_target_without_cats_tags(
     assert "p2" in id_set_1 and "p3" in id_set_1 and "p4" in id_set_1
 
 
+@pytest.mark.asyncio
+async def test_new_message_resume_after_restart(
+    mock_platform_without_cats_tags, user_info_factory
+):
+    from nonebot_bison.config.post_store import seen_post_store
+    from nonebot_bison.utils import ProcessContext
+
+    res1 = await mock_platform_without_cats_tags(
+        ProcessContext(), AsyncClient()
+    ).fetch_new_post("dummy", [user_info_factory([], [])])
+    assert len(res1) == 0
+    await seen_post_store.flush()
+
+    # 模拟重启：内存中的状态丢失，从数据库恢复，不再重新初始化
+    mock_platform_without_cats_tags.store.clear()
+    res2 = await mock_platform_without_cats_tags(
+        ProcessContext(), AsyncClient()
+    ).fetch_new_post("dummy", [user_info_factory([], [])])
+    assert len(res2) == 1
+    assert {post.text for post in res2[0][1]} == {"p2", "p3", "p4"}
+
+
+@pytest.mark.asyncio
+async def test_new_message_quiet_target_resume_after_restart(
+    mock_platform_without_cats_tags, user_info_factory, mocker
+):
+    from nonebot_bison.config.post_store import seen_post_store
+    from nonebot_bison.utils import ProcessContext
+
+    old_post = {"id": 1, "text": "p1", "date": passed, "tags": [], "category": 1}
+    new_post = {"id": 2, "text": "p2", "date": now, "tags": [], "category": 1}
+    platform = mock_platform_without_cats_tags
+    for target, first_fetch in (("quiet", [old_post]), ("empty", [])):
+        # 初始化时没有 2 小时内的 Post 或没有任何 Post
+        mocker.patch.object(platform, "get_sub_list", return_value=first_fetch)
+        res = await platform(ProcessContext(), AsyncClient()).fetch_new_post(
+            target, [user_info_factory([], [])]
+        )
+        assert res == []
+        await seen_post_store.flush()
+
+        # 重启后不再重新初始化，停机期间发布的 Post 仍会推送
+        platform.store.clear()
+        mocker.patch.object(platform, "get_sub_list", return_value=[old_post, new_post])
+        res = await platform(ProcessContext(), AsyncClient()).fetch_new_post(
+            target, [user_info_factory([], [])]
+        )
+        assert [post.text for post in res[0][1]] == ["p2"]
+
+
+@pytest.mark.asyncio
+async def test_new_message_defer_seen_posts(
+    mock_platform_without_cats_tags, user_info_factory
+):
+    from nonebot_bison.config.post_store import seen_post_store
+    from nonebot_bison.utils import ProcessContext
+
+    platform = mock_platform_without_cats_tags
+    context = ProcessContext(defer_seen_posts=True)
+    res1 = await platform(context, AsyncClient()).fetch_new_post(
+        "dummy", [user_info_factory([], [])]
+    )
+    assert len(res1) == 0
+    # 初始化时的 Post 不会推送，直接保存
+    assert context.deferred_seen_posts == []
+
+    context = ProcessContext(defer_seen_posts=True)
+    res2 = await platform(context, AsyncClient()).fetch_new_post(
+        "dummy", [user_info_factory([], [])]
+    )
+    assert {post.text for post in res2[0][1]} == {"p2", "p3", "p4"}
+    assert context.deferred_seen_posts == [("MockPlatform", "dummy", ["2", "3", "4"])]
+    await seen_post_store.flush()
+
+    # 推送发送前重启，这些 Post 会被重新推送
+    platform.store.clear()
+    res3 = await platform(ProcessContext(), AsyncClient()).fetch_new_post(
+        "dummy", [user_info_factory([], [])]
+    )
+    assert {post.text for post in res3[0][1]} == {"p2", "p3", "p4"}
+
+
+@pytest.mark.asyncio
+async def test_default_batch_fetch_new_post(
+    mock_platform_without_cats_tags, user_info_factory, mocker
+):
+    from nonebot_bison.types import Target
+    from nonebot_bison.utils import ProcessContext
+
+    platform = mock_platform_without_cats_tags
+    sub_list = raw_post_list_1
+
+    async def _get_sub_list(target):
+        if target == "broken":
+            raise RuntimeError("fetch failed")
+        return sub_list
+
+    mocker.patch.object(platform, "get_sub_list", side_effect=_get_sub_list)
+    to_fetch = [
+        (Target(target), [user_info_factory([], [])])
+        for target in ("t1", "broken", "t2")
+    ]
+    res = await platform(ProcessContext(), AsyncClient()).batch_fetch_new_post(to_fetch)
+    assert res == []
+
+    sub_list = raw_post_list_2
+    res = await platform(ProcessContext(), AsyncClient()).batch_fetch_new_post(to_fetch)
+    # 抓取失败的 Target 不影响其他 Target
+    assert [{post.text for post in posts} for _, posts in res] == [
+        {"p2", "p3", "p4"},
+        {"p2", "p3", "p4"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_default_batch_get_status(mock_status_change, mocker):
+    from nonebot_bison.types import Target
+    from nonebot_bison.utils import ProcessContext
+
+    platform = mock_status_change
+
+    async def _get_status(target):
+        if target == "broken":
+            raise platform.FetchError("fetch failed")
+        return {"s": target == "on"}
+
+    mocker.patch.object(platform, "get_status", side_effect=_get_status)
+    statuses = await platform(ProcessContext(), AsyncClient()).batch_get_status(
+        [Target("on"), Target("broken"), Target("off")]
+    )
+    assert statuses == {"on": {"s": True}, "off": {"s": False}}
+
+
+async def test_seen_post_store_limit(app: App):
+    from nonebot_bison.config.post_store import DBSeenPostStore
+
+    store = DBSeenPostStore(limit=2, flush_size=3)
+    store.add("MockPlatform", "dummy", ["1", "2"])
+    assert not store.need_flush()
+    store.add("MockPlatform", "dummy", ["2", "3"])
+    assert store.need_flush()
+    await store.flush()
+    assert await store.load("MockPlatform", "dummy") == ["2", "3"]
+    assert await store.load("MockPlatform", "other") == []
+
+
+async def test_seen_post_store_flush_failed(app: App):
+    from unittest.mock import patch
+
+    from nonebot_bison.config import post_store
+    from nonebot_bison.config.post_store import DBSeenPostStore
+
+    store = DBSeenPostStore(limit=10, flush_size=2)
+    store.add("MockPlatform", "dummy", ["1", "2"])
+    with patch.object(post_store, "create_session", side_effect=RuntimeError):
+        await store.flush()
+    # 写入失败的记录放回缓冲区，与之后新增的记录一起写入
+    store.add("MockPlatform", "dummy", ["3"])
+    assert store.need_flush()
+    await store.flush()
+    assert await store.load("MockPlatform", "dummy") == ["1", "2", "3"]
+
+
 @pytest.mark.asyncio
 async def test_new_message_target(mock_platform, user_info_factory):
     from nonebot_bison.utils import ProcessContext
@@ -82,6 +82,21 @@ async def test_fetch_new(weibo, dummy_user_subinfo):
     assert len(post.pics) == 1
 
 
+@pytest.mark.asyncio
+@respx.mock
+async def test_parse_retry_failed_pic(weibo, mocker):
+    from nonebot_bison.utils import image_fetcher
+    from nonebot_bison.utils.image_cache import ImageCache
+
+    mocker.patch.object(image_fetcher, "cache", ImageCache(0, 0))
+    raw_post = get_json("weibo_ak_list_1.json")["data"]["cards"][1]
+    image_cdn_router.mock(side_effect=[Response(502), Response(200, content=b"pic")])
+    # 图片下载失败时整条微博重新解析，不会发送缺少图片的消息
+    post = await weibo.do_parse(raw_post)
+    assert image_cdn_router.call_count == 2
+    assert post.pics == [b"pic"]
+
+
 @pytest.mark.asyncio
 async def test_classification(weibo):
     mock_data = get_json("weibo_ak_list_1.json")
@@ -38,14 +38,14 @@ async def test_scheduler_without_time(init_scheduler):
         123, "group", T_Target("t2"), "target1", "bilibili", [], []
     )
     await config.add_subscribe(
-        123, "group", T_Target("t2"), "target1", "bilibili-live", [], []
+        123, "group", T_Target("t2"), "target1", "bilibili-bangumi", [], []
     )
 
     await config.update_time_weight_config(
         T_Target("t2"), "bilibili", WeightConfig(default=20, time_config=[])
     )
     await config.update_time_weight_config(
-        T_Target("t2"), "bilibili-live", WeightConfig(default=30, time_config=[])
+        T_Target("t2"), "bilibili-bangumi", WeightConfig(default=30, time_config=[])
     )
 
     await init_scheduler()
@@ -53,12 +53,12 @@ async def test_scheduler_without_time(init_scheduler):
     static_res = await get_schedule_times(BilibiliSchedConf, 6)
     assert static_res["bilibili-t1"] == 1
     assert static_res["bilibili-t2"] == 2
-    assert static_res["bilibili-live-t2"] == 3
+    assert static_res["bilibili-bangumi-t2"] == 3
 
     static_res = await get_schedule_times(BilibiliSchedConf, 6)
     assert static_res["bilibili-t1"] == 1
     assert static_res["bilibili-t2"] == 2
-    assert static_res["bilibili-live-t2"] == 3
+    assert static_res["bilibili-bangumi-t2"] == 3
 
 
 async def test_scheduler_with_time(app: App, init_scheduler, mocker: MockerFixture):
@@ -75,7 +75,7 @@ async def test_scheduler_with_time(app: App, init_scheduler, mocker: MockerFixtu
         123, "group", T_Target("t2"), "target1", "bilibili", [], []
     )
     await config.add_subscribe(
-        123, "group", T_Target("t2"), "target1", "bilibili-live", [], []
+        123, "group", T_Target("t2"), "target1", "bilibili-bangumi", [], []
     )
 
     await config.update_time_weight_config(
@@ -89,7 +89,7 @@ async def test_scheduler_with_time(app: App, init_scheduler, mocker: MockerFixtu
         ),
     )
     await config.update_time_weight_config(
-        T_Target("t2"), "bilibili-live", WeightConfig(default=30, time_config=[])
+        T_Target("t2"), "bilibili-bangumi", WeightConfig(default=30, time_config=[])
     )
 
     await init_scheduler()
@@ -99,12 +99,12 @@ async def test_scheduler_with_time(app: App, init_scheduler, mocker: MockerFixtu
     static_res = await get_schedule_times(BilibiliSchedConf, 6)
     assert static_res["bilibili-t1"] == 1
     assert static_res["bilibili-t2"] == 2
-    assert static_res["bilibili-live-t2"] == 3
+    assert static_res["bilibili-bangumi-t2"] == 3
 
     static_res = await get_schedule_times(BilibiliSchedConf, 6)
     assert static_res["bilibili-t1"] == 1
     assert static_res["bilibili-t2"] == 2
-    assert static_res["bilibili-live-t2"] == 3
+    assert static_res["bilibili-bangumi-t2"] == 3
 
     mocker.patch.object(db_config, "_get_time", return_value=time(10, 30))
 
@@ -112,6 +112,30 @@ async def test_scheduler_with_time(app: App, init_scheduler, mocker: MockerFixtu
     assert static_res["bilibili-t2"] == 6
 
 
+async def test_scheduler_weight_change(init_scheduler):
+    from nonebot_bison.config import config
+    from nonebot_bison.config.db_config import WeightConfig
+    from nonebot_bison.platform.bilibili import BilibiliSchedConf
+    from nonebot_bison.scheduler.manager import init_scheduler
+    from nonebot_bison.types import Target as T_Target
+
+    for target in ("t1", "t2"):
+        await config.add_subscribe(
+            123, "group", T_Target(target), "target1", "bilibili", [], []
+        )
+    await init_scheduler()
+
+    static_res = await get_schedule_times(BilibiliSchedConf, 20)
+    assert static_res == {"bilibili-t1": 10, "bilibili-t2": 10}
+
+    # 权重变化通过钩子直接更新调度队列
+    await config.update_time_weight_config(
+        T_Target("t2"), "bilibili", WeightConfig(default=30, time_config=[])
+    )
+    static_res = await get_schedule_times(BilibiliSchedConf, 40)
+    assert static_res == {"bilibili-t1": 10, "bilibili-t2": 30}
+
+
 async def test_scheduler_add_new(init_scheduler):
     from nonebot_bison.config import config
     from nonebot_bison.platform.bilibili import BilibiliSchedConf
@@ -156,3 +180,206 @@ async def test_schedule_delete(init_scheduler):
     await config.del_subscribe(123, "group", T_Target("t1"), "bilibili")
     stat_res = await get_schedule_times(BilibiliSchedConf, 2)
     assert stat_res["bilibili-t2"] == 2
+
+
+def _legacy_schedule(weights: dict[str, int], time: int) -> list[str]:
+    "原先 get_next_schedulable 中使用的平滑加权轮询"
+    current_weight = {key: 0 for key in weights}
+    res = []
+    for _ in range(time):
+        weight_sum = 0
+        cur_max = None
+        for key, weight in weights.items():
+            current_weight[key] += weight
+            weight_sum += weight
+            if not cur_max or current_weight[cur_max] < current_weight[key]:
+                cur_max = key
+        assert cur_max
+        current_weight[cur_max] -= weight_sum
+        res.append(cur_max)
+    return res
+
+
+async def test_weighted_queue_fairness(app: App):
+    from collections import Counter
+
+    from nonebot_bison.scheduler.weighted_queue import WeightedQueue
+    from nonebot_bison.types import Target as T_Target
+
+    weights = {f"bilibili-t{i}": (i * 7) % 23 + 1 for i in range(30)}
+    weight_sum = sum(weights.values())
+
+    queue = WeightedQueue()
+    for i in range(30):
+        queue.push("bilibili", T_Target(f"t{i}"), weights[f"bilibili-t{i}"])
+
+    legacy_res = _legacy_schedule(weights, weight_sum * 3)
+    for round in range(3):
+        res = [queue.pop_next().key for _ in range(weight_sum)]  # type: ignore
+        legacy_round = legacy_res[round * weight_sum : (round + 1) * weight_sum]
+        assert Counter(res) == Counter(legacy_round) == Counter(weights)
+
+
+async def test_weighted_queue_insert_delete(app: App):
+    from nonebot_bison.scheduler.weighted_queue import WeightedQueue
+    from nonebot_bison.types import Target as T_Target
+
+    queue = WeightedQueue()
+    for i in range(200):
+        queue.push("weibo", T_Target(f"t{i}"), 10)
+    for _ in range(50):
+        queue.pop_next()
+
+    queue.push("weibo", T_Target("new"), urgent=True)
+    schedulable = queue.pop_next()
+    assert schedulable and schedulable.target == "new"
+
+    for i in range(200):
+        queue.remove("weibo", T_Target(f"t{i}"))
+    assert len(queue) == 1
+    assert ("weibo", "new") in queue
+    for _ in range(3):
+        schedulable = queue.pop_next()
+        assert schedulable and schedulable.target == "new"
+
+    queue.remove("weibo", T_Target("new"))
+    assert queue.pop_next() is None
+
+
+async def test_exec_fetch_batch(init_scheduler, mocker: MockerFixture):
+    import asyncio
+
+    from nonebot_bison.config import config
+    from nonebot_bison.platform.weibo import WeiboSchedConf
+    from nonebot_bison.scheduler import scheduler_dict
+    from nonebot_bison.scheduler.manager import init_scheduler
+    from nonebot_bison.types import Target as T_Target
+
+    for i in range(5):
+        await config.add_subscribe(
+            123, "group", T_Target(f"t{i}"), f"target{i}", "weibo", [], []
+        )
+    await init_scheduler()
+
+    scheduler = scheduler_dict[WeiboSchedConf]
+    scheduler.fetch_batch_size = 3
+    scheduler.fetch_semaphore = asyncio.Semaphore(2)
+
+    fetched = []
+    running = 0
+    max_running = 0
+
+    async def _fetch(schedulables):
+        nonlocal running, max_running
+        (schedulable,) = schedulables
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        fetched.append(schedulable.target)
+        running -= 1
+        if schedulable.target == "t0":
+            raise RuntimeError("fetch failed")
+
+    mocker.patch.object(scheduler, "_fetch_schedulables", _fetch)
+
+    await scheduler.exec_fetch()
+    assert len(set(fetched)) == 3
+    assert max_running == 2
+
+    await scheduler.exec_fetch()
+    assert len(set(fetched)) == 5
+
+
+async def test_group_batch_schedulables(init_scheduler):
+    from nonebot_bison.platform.bilibili import Bilibililive, BilibiliSchedConf
+    from nonebot_bison.scheduler import scheduler_dict
+    from nonebot_bison.scheduler.weighted_queue import Schedulable
+    from nonebot_bison.types import Target as T_Target
+
+    scheduler = scheduler_dict[BilibiliSchedConf]
+    schedulables = [
+        Schedulable("bilibili-live", T_Target("t1")),
+        Schedulable("bilibili", T_Target("t1")),
+        Schedulable("bilibili-live", T_Target("t2")),
+        Schedulable("bilibili", T_Target("t2")),
+        Schedulable("bilibili-live", T_Target("t3")),
+    ]
+    groups = scheduler._group_schedulables(schedulables)
+    assert [[(s.platform_name, s.target) for s in group] for group in groups] == [
+        [("bilibili-live", "t1"), ("bilibili-live", "t2"), ("bilibili-live", "t3")],
+        [("bilibili", "t1")],
+        [("bilibili", "t2")],
+    ]
+
+    assert Bilibililive.max_batch_size > 1
+    Bilibililive.max_batch_size, max_batch_size = 2, Bilibililive.max_batch_size
+    try:
+        groups = scheduler._group_schedulables(schedulables)
+    finally:
+        Bilibililive.max_batch_size = max_batch_size
+    assert [len(group) for group in groups] == [2, 1, 1, 1]
+
+
+async def test_bilibili_live_batch_by_default(init_scheduler):
+    from nonebot_bison.platform.bilibili import Bilibililive, BilibiliLiveSchedConf
+    from nonebot_bison.scheduler import scheduler_dict
+
+    assert Bilibililive.scheduler is BilibiliLiveSchedConf
+    scheduler = scheduler_dict[BilibiliLiveSchedConf]
+    assert scheduler.fetch_batch_size == Bilibililive.max_batch_size
+    assert scheduler.fetch_batch_size > 1
+
+
+async def test_save_seen_posts_after_sent(init_scheduler, mocker: MockerFixture):
+    import asyncio
+
+    from nonebot_bison.config import config
+    from nonebot_bison.config.post_store import seen_post_store
+    from nonebot_bison.config.send_outbox import send_outbox
+    from nonebot_bison.platform import platform_manager
+    from nonebot_bison.platform.weibo import WeiboSchedConf
+    from nonebot_bison.scheduler import scheduler_dict
+    from nonebot_bison.scheduler.manager import init_scheduler
+    from nonebot_bison.scheduler.weighted_queue import Schedulable
+    from nonebot_bison.types import Target as T_Target
+    from nonebot_bison.types import User
+
+    await config.add_subscribe(123, "group", T_Target("t1"), "target1", "weibo", [], [])
+    await init_scheduler()
+    weibo_scheduler = scheduler_dict[WeiboSchedConf]
+
+    async def _fetch_new_post(self, target, users):
+        self.ctx.deferred_seen_posts.append(("Weibo", target, ["1"]))
+        return [(User(123, "group"), ["post"]), (User(456, "group"), ["post"])]
+
+    jobs = []
+
+    async def _put(user, posts):
+        jobs.append(asyncio.get_running_loop().create_future())
+        return jobs[-1]
+
+    mocker.patch.object(platform_manager["weibo"], "do_fetch_new_post", _fetch_new_post)
+    mocker.patch("nonebot_bison.scheduler.scheduler.post_pipeline.put", _put)
+    add = mocker.patch.object(seen_post_store, "add")
+
+    await weibo_scheduler._fetch_schedulables([Schedulable("weibo", T_Target("t1"))])
+    assert len(jobs) == 2
+    jobs[0].set_result(None)
+    await asyncio.sleep(0)
+    add.assert_not_called()
+    jobs[1].set_result(None)
+    await asyncio.sleep(0)
+    # 发送队列中的消息写入数据库后才保存
+    add.assert_not_called()
+    await send_outbox.flush()
+    add.assert_called_once_with("Weibo", "t1", ["1"])
+
+    # 推送被取消时不保存
+    jobs.clear()
+    add.reset_mock()
+    await weibo_scheduler._fetch_schedulables([Schedulable("weibo", T_Target("t1"))])
+    jobs[0].set_result(None)
+    jobs[1].cancel()
+    await asyncio.sleep(0)
+    await send_outbox.flush()
+    add.assert_not_called()
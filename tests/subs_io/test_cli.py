@@ -24,13 +24,13 @@ def test_cli_help(app: App):
     result = runner.invoke(cli, ["export", "--help"])
     assert result.exit_code == 0
 
-    for opt in ["--path", "-p", "导出路径", "--format", "指定导出格式[json, yaml]，默认为 json"]:
+    for opt in ["--path", "-p", "导出路径", "--format", "指定导出格式[json, yaml, nbesf]"]:
         assert opt in result.output
 
     result = runner.invoke(cli, ["import", "--help"])
     assert result.exit_code == 0
 
-    for opt in ["--path", "-p", "导入文件名", "--format", "指定导入格式[json, yaml]，默认为 json"]:
+    for opt in ["--path", "-p", "导入文件名", "--format", "默认根据文件内容自动识别"]:
         assert opt in result.output
 
 
@@ -142,3 +142,38 @@ async def test_subs_import(app: App, tmp_path):
     )
     assert result.exit_code == 0
     assert len(await config.list_subs_with_all_info()) == 6
+
+
+async def test_subs_import_detect_format(app: App, tmp_path: Path):
+    from nonebot_bison.config.db_config import config
+    from nonebot_bison.config.subs_io import nbesf_parser
+    from nonebot_bison.config.subs_io.nbesf_stream import dump_binary_stream
+    from nonebot_bison.script.cli import cli, run_sync
+
+    from .utils import get_json
+
+    async def _sub_packs():
+        for sub_pack in nbesf_parser(get_json("subs_export.json")).groups:
+            yield sub_pack
+
+    binary_file = tmp_path / "export.nbesf"
+    with binary_file.open("wb") as f:
+        await dump_binary_stream(_sub_packs(), f)
+    yaml_file = tmp_path / "export.txt"
+    yaml_file.write_text(get_file("subs_export.yaml"))
+
+    runner = CliRunner()
+    result = await run_sync(runner.invoke)(cli, ["import", "-p", str(binary_file)])
+    assert result.exit_code == 0
+    assert len(await config.list_subs_with_all_info()) == 3
+
+    result = await run_sync(runner.invoke)(cli, ["import", "-p", str(yaml_file)])
+    assert result.exit_code == 0
+    assert len(await config.list_subs_with_all_info()) == 6
+
+    # 指定的格式与文件内容不符时不会导入任何订阅
+    result = await run_sync(runner.invoke)(
+        cli, ["import", "-p", str(binary_file), "--format", "json"]
+    )
+    assert result.exit_code == 1
+    assert len(await config.list_subs_with_all_info()) == 6
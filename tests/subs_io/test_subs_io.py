@@ -89,3 +89,250 @@ async def test_subs_import_all_fail(app: App, init_scheduler):
 
     with pytest.raises(NBESFParseErr):
         nbesf_data = nbesf_parser(get_json("subs_export_all_illegal.json"))
+
+
+async def test_subs_import_bulk(app: App, mocker):
+    from nonebot_bison.config.db_config import config
+    from nonebot_bison.config.subs_io import nbesf_parser
+    from nonebot_bison.config.subs_io.utils import subs_receipt_gen_ver_1
+    from nonebot_bison.types import Target as TTarget
+    from nonebot_bison.types import User as TUser
+
+    await config.add_subscribe(
+        user=234,
+        user_type="group",
+        target=TTarget("weibo_id"),
+        target_name="weibo_name",
+        platform_name="weibo",
+        cats=[],
+        tags=[],
+    )
+    new_targets = []
+
+    async def _hook(platform_name, target):
+        new_targets.append((platform_name, target))
+
+    mocker.patch.object(config, "add_target_hook", [_hook])
+    add_subscribe = mocker.spy(config, "add_subscribe")
+
+    nbesf_data = nbesf_parser(get_json("subs_export_has_subdup_err.json"))
+    result = await subs_receipt_gen_ver_1(nbesf_data.groups, batch_size=2)
+
+    assert (result.added, result.duplicated, result.failed) == (3, 2, 0)
+    # 每个新的 Target 只通知一次调度器
+    assert sorted(new_targets) == [("bilibili", "bilibili_id"), ("weibo", "weibo_id2")]
+    add_subscribe.assert_not_called()
+    assert len(await config.list_subs_with_all_info()) == 4
+    subscribers = await config.get_platform_target_subscribers(
+        "weibo", TTarget("weibo_id2")
+    )
+    assert [sub.user for sub in subscribers] == [TUser(123, "group")]
+    assert subscribers[0].tags == ["poca"]
+
+
+async def test_subs_export_stream(app: App, init_scheduler):
+    import io
+    import json
+
+    import yaml
+
+    from nonebot_bison.config.subs_io import nbesf_parser, subscribes_export_stream
+    from nonebot_bison.config.subs_io.nbesf_stream import (
+        dump_json_stream,
+        dump_yaml_stream,
+    )
+    from nonebot_bison.config.subs_io.utils import subs_receipt_gen_ver_1
+
+    nbesf_data = nbesf_parser(get_json("subs_export_has_subdup_err.json"))
+    nbesf_data.groups[0].subs[0].target.target_name = "明日方舟 Arknights"
+    await subs_receipt_gen_ver_1(nbesf_data.groups)
+
+    # 每次只读取一条订阅，同一用户的订阅跨越多个分块
+    sub_packs = [
+        sub_pack async for sub_pack in subscribes_export_stream(lambda x: x, 1)
+    ]
+    assert [(pack.user.uid, len(pack.subs)) for pack in sub_packs] == [
+        (123, 2),
+        (234, 2),
+    ]
+
+    async def _iter(packs):
+        for pack in packs:
+            yield pack
+
+    # 流式导出的文件与一次性导出的文件完全相同
+    for packs in (sub_packs, []):
+        data = {"version": 1, "groups": [pack.dict() for pack in packs]}
+        expected = io.StringIO()
+        json.dump(data, expected, indent=4, ensure_ascii=False)
+        streamed = io.StringIO()
+        await dump_json_stream(_iter(packs), streamed)
+        assert streamed.getvalue() == expected.getvalue()
+
+        expected = io.StringIO()
+        yaml.safe_dump(data, expected, sort_keys=False)
+        streamed = io.StringIO()
+        await dump_yaml_stream(_iter(packs), streamed)
+        assert streamed.getvalue() == expected.getvalue()
+
+
+async def test_nbesf_stream_parser(app: App, mocker):
+    import io
+
+    import yaml
+
+    from nonebot_bison.config.subs_io import nbesf_parser
+    from nonebot_bison.config.subs_io import nbesf_stream as nbesf_stream_module
+    from nonebot_bison.config.subs_io import nbesf_stream_parser
+    from nonebot_bison.config.subs_io.nbesf_model import NBESFParseErr, NBESFVerMatchErr
+
+    # 每次只读取少量字符，值会被截断在缓冲区边界上
+    mocker.patch.object(nbesf_stream_module, "_READ_SIZE", 7)
+    expected = nbesf_parser(get_json("subs_export.json")).groups
+    sub_packs = list(
+        nbesf_stream_parser(io.StringIO(get_file("subs_export.json")), "json")
+    )
+    assert sub_packs == expected
+    yaml_text = get_file("subs_export.yaml")
+    sub_packs = list(nbesf_stream_parser(io.StringIO(yaml_text), "yaml"))
+    assert sub_packs == nbesf_parser(yaml.safe_load(yaml_text)).groups
+
+    assert list(nbesf_stream_parser(io.StringIO('{"groups": []}'), "json")) == []
+    assert list(nbesf_stream_parser(io.StringIO("groups: []"), "yaml")) == []
+    for text, format in (("{}", "json"), ("", "yaml"), ("version: 1", "yaml")):
+        with pytest.raises(NBESFParseErr):
+            list(nbesf_stream_parser(io.StringIO(text), format))
+    with pytest.raises(NBESFVerMatchErr):
+        list(nbesf_stream_parser(io.StringIO('{"version": 12, "groups": []}'), "json"))
+
+    # 文件后半部分的错误在读取到时才抛出
+    text = get_file("subs_export.json")
+    sub_packs = nbesf_stream_parser(io.StringIO(text[: len(text) // 2]), "json")
+    assert next(sub_packs) == expected[0]
+    with pytest.raises(NBESFParseErr):
+        list(sub_packs)
+    with pytest.raises(NBESFParseErr):
+        list(
+            nbesf_stream_parser(
+                io.StringIO(get_file("subs_export_all_illegal.json")), "json"
+            )
+        )
+
+
+async def test_subs_import_stream(app: App, init_scheduler):
+    import io
+
+    from nonebot_bison.config.db_config import config
+    from nonebot_bison.config.subs_io import (
+        nbesf_stream_parser,
+        subscribes_import_stream,
+    )
+
+    f = io.StringIO(get_file("subs_export_has_subdup_err.json"))
+    await subscribes_import_stream(nbesf_stream_parser(f, "json"), batch_size=2)
+
+    assert len(await config.list_subs_with_all_info()) == 4
+
+
+async def test_nbesf_binary(app: App, tmp_path: Path):
+    import io
+
+    from nonebot_bison.config.subs_io import nbesf_parser, nbesf_stream_parser
+    from nonebot_bison.config.subs_io.nbesf_model import NBESFParseErr, NBESFVerMatchErr
+    from nonebot_bison.config.subs_io.nbesf_stream import (
+        detect_nbesf_format,
+        dump_binary_stream,
+    )
+
+    expected = nbesf_parser(get_json("subs_export.json")).groups
+
+    async def _iter():
+        for sub_pack in expected:
+            yield sub_pack
+
+    f = io.BytesIO()
+    await dump_binary_stream(_iter(), f)
+    data = f.getvalue()
+    assert data.startswith(b"NBESF\x01")
+    assert list(nbesf_stream_parser(io.BytesIO(data), "nbesf")) == expected
+
+    for file_name, content, format in (
+        ("a", data, "nbesf"),
+        ("b", get_file("subs_export.json").encode(), "json"),
+        ("c", get_file("subs_export.yaml").encode(), "yaml"),
+    ):
+        (tmp_path / file_name).write_bytes(content)
+        assert detect_nbesf_format(tmp_path / file_name) == format
+
+    with pytest.raises(NBESFVerMatchErr):
+        list(nbesf_stream_parser(io.BytesIO(b"NBESF\x02" + data[6:]), "nbesf"))
+    for broken in (b"", data[:5], data[: len(data) - 8], b"NBESF\x01garbage"):
+        with pytest.raises(NBESFParseErr):
+            list(nbesf_stream_parser(io.BytesIO(broken), "nbesf"))
+
+
+@pytest.mark.benchmark
+async def test_nbesf_benchmark(app: App, tmp_path: Path):
+    """比较 10 万条订阅在各格式下的导出、导入耗时与文件大小"""
+    import time
+
+    from nonebot.log import logger
+
+    from nonebot_bison.config.subs_io import nbesf_stream_parser
+    from nonebot_bison.config.subs_io.nbesf_model import SubPack
+    from nonebot_bison.config.subs_io.nbesf_stream import (
+        dump_binary_stream,
+        dump_json_stream,
+        dump_yaml_stream,
+    )
+
+    sub_packs = [
+        SubPack.parse_obj(
+            {
+                "user": {"type": "group", "uid": 100000 + user},
+                "subs": [
+                    {
+                        "categories": [1, 2],
+                        "tags": ["明日方舟"] if sub % 2 else [],
+                        "target": {
+                            "target_name": f"目标 {user * 5 + sub}",
+                            "target": str(3000000 + user * 5 + sub),
+                            "platform_name": "bilibili",
+                            "default_schedule_weight": 10,
+                        },
+                    }
+                    for sub in range(5)
+                ],
+            }
+        )
+        for user in range(20000)
+    ]
+
+    async def _iter():
+        for sub_pack in sub_packs:
+            yield sub_pack
+
+    text = {"encoding": "utf-8"}
+    sizes = {}
+    for format, dump, binary in (
+        ("json", dump_json_stream, False),
+        ("yaml", dump_yaml_stream, False),
+        ("nbesf", dump_binary_stream, True),
+    ):
+        path = tmp_path / f"export.{format}"
+        start = time.perf_counter()
+        with path.open("wb") if binary else path.open("w", **text) as f:
+            await dump(_iter(), f)
+        dump_cost = time.perf_counter() - start
+        start = time.perf_counter()
+        with path.open("rb") if binary else path.open("r", **text) as f:
+            count = sum(len(pack.subs) for pack in nbesf_stream_parser(f, format))
+        load_cost = time.perf_counter() - start
+        sizes[format] = path.stat().st_size
+        logger.info(
+            f"{format}: size {sizes[format] / 1024 / 1024:.2f}MiB, "
+            f"export {dump_cost:.2f}s, import {load_cost:.2f}s"
+        )
+        assert count == 100000
+    # 压缩后的二进制格式比文本格式小
+    assert sizes["nbesf"] < min(sizes["json"], sizes["yaml"])
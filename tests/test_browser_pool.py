@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+from nonebug import App
+from pytest_mock import MockerFixture
+
+
+class FakePage:
+    capturing = 0
+    max_capturing = 0
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+    async def set_viewport_size(self, viewport):
+        self.viewport = viewport
+
+    async def goto(self, url):
+        self.url = url
+
+    def locator(self, selector):
+        page = self
+
+        class Locator:
+            async def screenshot(self, **kwargs):
+                FakePage.capturing += 1
+                FakePage.max_capturing = max(FakePage.max_capturing, FakePage.capturing)
+                try:
+                    await asyncio.sleep(page.delay)
+                finally:
+                    FakePage.capturing -= 1
+                return f"{page.url} {selector}".encode()
+
+        return Locator()
+
+
+async def test_capture_element_pool(app: App):
+    from nonebot_bison.utils.render import RenderService
+
+    service = RenderService(pool_size=1, concurrency=2, timeout=1)
+    pages = []
+
+    async def _new_page(device_scale_factor):
+        page = FakePage(0.01)
+        pages.append(page)
+        return page
+
+    service._new_page = _new_page
+    await service.warm_up()
+    assert len(pages) == 1
+
+    res = await asyncio.gather(
+        *(
+            service.capture_element(
+                f"https://example.com/{i}",
+                "div.main",
+                {"width": 320, "height": 6400},
+                3,
+            )
+            for i in range(4)
+        )
+    )
+    assert res == [f"https://example.com/{i} div.main".encode() for i in range(4)]
+    assert FakePage.max_capturing == 2
+    # 页面被复用，多出的页面用完后被关闭，池中只保留一个
+    assert len(pages) < 4
+    assert [page.closed for page in pages].count(False) == 1
+    assert set(service.latency_percentiles()["capture_element"]) == {
+        "p50",
+        "p90",
+        "p99",
+    }
+
+
+async def test_capture_element_timeout(app: App):
+    from nonebot_bison.utils.render import RenderService
+
+    service = RenderService(pool_size=1, concurrency=1, timeout=0.05)
+    page = FakePage(1)
+
+    async def _new_page(device_scale_factor):
+        return page
+
+    service._new_page = _new_page
+    with pytest.raises(asyncio.TimeoutError):
+        await service.capture_element(
+            "https://example.com", "div.main", {"width": 320, "height": 6400}
+        )
+    assert service.timeouts == 1
+    # 超时的页面不再复用
+    assert page.closed
+    assert service.latency_percentiles() == {}
+
+
+async def test_capture_element_cache(app: App):
+    from nonebot_bison.utils.image_cache import ImageCache
+    from nonebot_bison.utils.render import RenderService
+
+    pages = []
+
+    async def _new_page(device_scale_factor):
+        page = FakePage(0)
+        pages.append(page)
+        return page
+
+    def _make_service():
+        service = RenderService(
+            pool_size=0,
+            concurrency=1,
+            timeout=1,
+            cache=ImageCache(0, 1024 * 1024, "render_cache"),
+        )
+        service._new_page = _new_page
+        return service
+
+    viewport = {"width": 320, "height": 6400}
+    service = _make_service()
+    await service.capture_element("https://example.com", "div", viewport, html="a")
+    await service.capture_element("https://example.com", "div", viewport, html="a")
+    assert len(pages) == 1
+    # 页面内容、视口改变或未提供页面内容时重新截图
+    await service.capture_element("https://example.com", "div", viewport, html="b")
+    await service.capture_element(
+        "https://example.com", "div", {"width": 1000, "height": 6400}, html="a"
+    )
+    await service.capture_element("https://example.com", "div", viewport)
+    assert len(pages) == 4
+    # 缓存保存在磁盘上，重启后仍然有效
+    res = await _make_service().capture_element(
+        "https://example.com", "div", viewport, html="a"
+    )
+    assert res == b"https://example.com div"
+    assert len(pages) == 4
+
+
+async def test_text_pic_cache(app: App, mocker: MockerFixture):
+    import nonebot_plugin_htmlrender
+
+    from nonebot_bison.utils.image_cache import ImageCache
+    from nonebot_bison.utils.render import RenderService
+
+    text_to_pic = mocker.patch.object(
+        nonebot_plugin_htmlrender, "text_to_pic", return_value=b"text"
+    )
+    md_to_pic = mocker.patch.object(
+        nonebot_plugin_htmlrender, "md_to_pic", return_value=b"md"
+    )
+    text_cache = ImageCache(1024, 0)
+    service = RenderService(
+        pool_size=0, concurrency=1, timeout=1, text_cache=text_cache
+    )
+    assert await service.text_to_pic("a") == b"text"
+    assert await service.text_to_pic("a") == b"text"
+    assert await service.text_to_pic("b") == b"text"
+    assert text_to_pic.call_count == 2
+    await service.md_to_pic("a", "a.css")
+    await service.md_to_pic("a", "a.css")
+    await service.md_to_pic("a", "b.css")
+    await service.md_to_pic("a")
+    assert md_to_pic.call_count == 3
+    assert text_cache.hit_rate() == 2 / 7
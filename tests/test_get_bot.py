@@ -1,5 +1,8 @@
+import asyncio
+
 import pytest
 from nonebug import App
+from pytest_mock.plugin import MockerFixture
 
 
 @pytest.mark.asyncio
@@ -100,3 +103,115 @@ async def test_get_bot_two_bots(app: App) -> None:
         groups = await get_groups()
 
         assert groups == [{"group_id": 1}, {"group_id": 2}, {"group_id": 3}]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("app", [{"refresh_bot": True}], indirect=True)
+async def test_bot_directory_incremental(app: App) -> None:
+    from nonebot import get_driver
+    from nonebot.adapters.onebot.v11 import Bot as BotV11
+    from nonebot.adapters.onebot.v11.event import (
+        FriendAddNoticeEvent,
+        GroupDecreaseNoticeEvent,
+        GroupIncreaseNoticeEvent,
+    )
+    from nonebot.message import handle_event
+
+    from nonebot_bison.types import User
+    from nonebot_bison.utils.get_bot import BotDirectory, bot_directory, get_bot
+
+    async with app.test_api() as ctx:
+        bot = ctx.create_bot(base=BotV11, self_id="1", auto_connect=False)
+        driver = get_driver()
+        driver._bots = {bot.self_id: bot}
+
+        # 通知直接修改目录，不调用 API
+        common = {"time": 0, "self_id": 1, "post_type": "notice", "user_id": 1}
+        await handle_event(
+            bot,
+            GroupIncreaseNoticeEvent(
+                notice_type="group_increase",
+                sub_type="approve",
+                group_id=10,
+                operator_id=0,
+                **common,
+            ),
+        )
+        await handle_event(
+            bot, FriendAddNoticeEvent(notice_type="friend_add", **common)
+        )
+        assert get_bot(User(10, "group")) == bot
+        assert get_bot(User(1, "private")) == bot
+        await handle_event(
+            bot,
+            GroupDecreaseNoticeEvent(
+                notice_type="group_decrease",
+                sub_type="kick_me",
+                group_id=10,
+                operator_id=2,
+                **common,
+            ),
+        )
+        assert get_bot(User(10, "group")) is None
+
+        # 短时间内的多次刷新请求只刷新一次
+        directory = BotDirectory(debounce=0.05)
+        ctx.should_call_api("get_group_list", {}, [{"group_id": 20}])
+        ctx.should_call_api("get_friend_list", {}, [])
+        for _ in range(5):
+            directory.request_refresh()
+        await asyncio.sleep(0.2)
+        assert ctx.wait_list.empty()
+        assert get_bot(User(20, "group")) == bot
+        assert get_bot(User(1, "private")) == bot
+
+        # 断开连接的 Bot 在完整刷新时被移除
+        driver._bots = {}
+        await directory.refresh()
+        assert get_bot(User(20, "group")) is None
+        bot_directory.remove_bot(bot.self_id)
+        assert get_bot(User(1, "private")) is None
+
+
+@pytest.mark.asyncio
+async def test_get_bot_load_aware(app: App, mocker: MockerFixture) -> None:
+    from nonebot.adapters.onebot.v11 import Bot as BotV11
+
+    from nonebot_bison.types import User
+    from nonebot_bison.utils import get_bot as get_bot_module
+    from nonebot_bison.utils.get_bot import BotLoadTracker, bot_directory, get_bot
+
+    load = BotLoadTracker()
+    mocker.patch.object(get_bot_module, "bot_load", load)
+    async with app.test_api() as ctx:
+        bot1 = ctx.create_bot(base=BotV11, self_id="1", auto_connect=False)
+        bot2 = ctx.create_bot(base=BotV11, self_id="2", auto_connect=False)
+        bot_directory.add_group(bot1, 1)
+        bot_directory.add_group(bot2, 1)
+
+        # 负载相同时随机选择
+        assert {get_bot(User(1, "group")) for _ in range(50)} == {bot1, bot2}
+        # 分配给 Bot 的推送与队列中的消息都计入负载
+        load.assign("1")
+        assert get_bot(User(1, "group")) == bot2
+        load.queue_depth = lambda bot_id: 2 if bot_id == "2" else 0
+        assert get_bot(User(1, "group")) == bot1
+        load.release("1")
+        load.queue_depth = lambda bot_id: 0
+        # 最近发送失败或发送缓慢的 Bot 较少被选中
+        load.record_failure("1")
+        assert get_bot(User(1, "group")) == bot2
+        load.failure_window = 0
+        load.record_sent("2", 3)
+        load.record_sent("2", 0)
+        assert load.load("2") == (0, pytest.approx(2.4))
+        assert get_bot(User(1, "group")) == bot1
+        # 发送缓慢但队列为空的 Bot 不如发送迅速、队列较短的 Bot
+        load.record_sent("1", 0.1)
+        load.queue_depth = lambda bot_id: 2 if bot_id == "1" else 0
+        assert load.load("1") == (0, pytest.approx(0.3))
+        assert get_bot(User(1, "group")) == bot1
+        load.queue_depth = lambda bot_id: 0
+
+        bot_directory.remove_bot("1")
+        bot_directory.remove_bot("2")
@@ -0,0 +1,116 @@
+import pytest
+from nonebug import App
+from pytest_mock.plugin import MockerFixture
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("app", [{"refresh_bot": True}], indirect=True)
+async def test_group_admin_index(app: App, mocker: MockerFixture):
+    from nonebot import get_driver
+    from nonebot.adapters.onebot.v11 import Bot
+    from nonebot.adapters.onebot.v11.event import (
+        GroupAdminNoticeEvent,
+        GroupDecreaseNoticeEvent,
+        GroupIncreaseNoticeEvent,
+    )
+    from nonebot.message import handle_event
+
+    from nonebot_bison.admin_page import api, group_admin
+    from nonebot_bison.admin_page.group_admin import GroupAdminIndex
+    from nonebot_bison.utils.get_bot import bot_directory
+
+    index = GroupAdminIndex(ttl=600, concurrency=1)
+    mocker.patch.object(api, "group_admin_index", index)
+    mocker.patch.object(group_admin, "group_admin_index", index)
+
+    async with app.test_api() as ctx:
+        bot = ctx.create_bot(base=Bot, self_id="8888", auto_connect=False)
+        get_driver()._bots = {bot.self_id: bot}
+        bot_directory.add_group(bot, 1)
+        bot_directory.add_group(bot, 2)
+
+        ctx.should_call_api(
+            "get_group_list",
+            {},
+            [{"group_id": 1, "group_name": "a"}, {"group_id": 2, "group_name": "b"}],
+        )
+        ctx.should_call_api(
+            "get_group_member_list",
+            {"group_id": 1},
+            [{"user_id": 10, "role": "owner"}, {"user_id": 11, "role": "member"}],
+        )
+        ctx.should_call_api(
+            "get_group_member_list",
+            {"group_id": 2},
+            [{"user_id": 10, "role": "admin"}, {"user_id": 11, "role": "admin"}],
+        )
+        assert await api.get_admin_groups(10) == [
+            {"id": 1, "name": "a"},
+            {"id": 2, "name": "b"},
+        ]
+        # 之后的查询直接使用索引
+        assert await api.get_admin_groups(11) == [{"id": 2, "name": "b"}]
+        assert await api.get_admin_groups(12) == []
+        assert ctx.wait_list.empty()
+
+        # 管理员变动、退群的通知直接修改索引
+        common = {"time": 0, "self_id": 8888, "post_type": "notice", "group_id": 2}
+        await handle_event(
+            bot,
+            GroupAdminNoticeEvent(
+                notice_type="group_admin", sub_type="set", user_id=12, **common
+            ),
+        )
+        await handle_event(
+            bot,
+            GroupDecreaseNoticeEvent(
+                notice_type="group_decrease",
+                sub_type="leave",
+                user_id=10,
+                operator_id=10,
+                **common,
+            ),
+        )
+        assert await api.get_admin_groups(12) == [{"id": 2, "name": "b"}]
+        assert await api.get_admin_groups(10) == [{"id": 1, "name": "a"}]
+        assert ctx.wait_list.empty()
+
+        # Bot 加入新群时获取该群的管理员
+        ctx.should_call_api(
+            "get_group_info", {"group_id": 3}, {"group_id": 3, "group_name": "c"}
+        )
+        ctx.should_call_api(
+            "get_group_member_list", {"group_id": 3}, [{"user_id": 13, "role": "owner"}]
+        )
+        await handle_event(
+            bot,
+            GroupIncreaseNoticeEvent(
+                notice_type="group_increase",
+                sub_type="invite",
+                user_id=8888,
+                operator_id=13,
+                **{**common, "group_id": 3},
+            ),
+        )
+        assert await api.get_admin_groups(13) == [{"id": 3, "name": "c"}]
+        assert ctx.wait_list.empty()
+
+        # 索引过期后等待重新获取再回答，遗漏的取消管理员通知不会保留权限
+        assert index.refreshed_at
+        index.refreshed_at -= 601
+        ctx.should_call_api(
+            "get_group_list",
+            {},
+            [{"group_id": 1, "group_name": "a"}, {"group_id": 2, "group_name": "b"}],
+        )
+        ctx.should_call_api(
+            "get_group_member_list", {"group_id": 1}, [{"user_id": 10, "role": "owner"}]
+        )
+        ctx.should_call_api(
+            "get_group_member_list",
+            {"group_id": 2},
+            [{"user_id": 12, "role": "member"}],
+        )
+        assert await api.get_admin_groups(12) == []
+        assert ctx.wait_list.empty()
+        bot_directory.remove_bot(bot.self_id)
@@ -0,0 +1,146 @@
+import asyncio
+
+import respx
+from httpx import Response
+from nonebug import App
+
+
+@respx.mock
+async def test_fetch_all_ordered(app: App):
+    from nonebot_bison.utils.image import ImageFetcher
+    from nonebot_bison.utils.image_cache import ImageCache
+
+    downloading = 0
+    max_downloading = 0
+
+    async def _image(request):
+        nonlocal downloading, max_downloading
+        downloading += 1
+        max_downloading = max(max_downloading, downloading)
+        await asyncio.sleep(0.01)
+        downloading -= 1
+        if request.url.path == "/broken.jpg":
+            return Response(404)
+        return Response(200, content=request.url.path.encode())
+
+    image_router = respx.get(host="img.example.com").mock(side_effect=_image)
+    urls = [f"https://img.example.com/{i}.jpg" for i in range(5)]
+    urls.insert(2, "https://img.example.com/broken.jpg")
+
+    fetcher = ImageFetcher(per_host_limit=2, cache=ImageCache(0, 0))
+    res = await fetcher.fetch_all(urls, headers={"referer": "https://example.com"})
+    assert res == [b"/0.jpg", b"/1.jpg", None, b"/2.jpg", b"/3.jpg", b"/4.jpg"]
+    assert max_downloading == 2
+    assert image_router.call_count == 6
+    assert image_router.calls[0].request.headers["referer"] == "https://example.com"
+    # 同一域名共用一个 client
+    assert len(fetcher._clients) == 1
+    await fetcher.close()
+
+
+async def test_image_cache(app: App):
+    from nonebot_bison.utils.image_cache import ImageCache
+
+    fetched = []
+
+    def _fetch(url: str, content: bytes):
+        async def _do_fetch():
+            fetched.append(url)
+            await asyncio.sleep(0.01)
+            return content
+
+        return _do_fetch
+
+    cache = ImageCache(memory_budget=8, disk_budget=1024)
+    # 同时请求同一 URL 只下载一次
+    res = await asyncio.gather(
+        *(
+            cache.get("http://a/1.jpg", _fetch("http://a/1.jpg", b"1234"))
+            for _ in range(3)
+        )
+    )
+    assert res == [b"1234"] * 3
+    assert fetched == ["http://a/1.jpg"]
+    # 内容相同的 URL 在内存中只保存一份
+    await cache.get("http://a/2.jpg", _fetch("http://a/2.jpg", b"1234"))
+    assert cache.stats()["memory_size"] == 4
+    await cache.get("http://a/3.jpg", _fetch("http://a/3.jpg", b"5678"))
+    await cache.get("http://a/4.jpg", _fetch("http://a/4.jpg", b"abcd"))
+    assert cache.stats()["memory_size"] == 8
+    # 1.jpg 已被挤出内存，从磁盘读取
+    assert await cache.get("http://a/1.jpg", _fetch("http://a/1.jpg", b"")) == b"1234"
+    assert await cache.get("http://a/4.jpg", _fetch("http://a/4.jpg", b"")) == b"abcd"
+    assert len(fetched) == 4
+    assert cache.stats() == {
+        "memory_hits": 1,
+        "disk_hits": 1,
+        "coalesced": 2,
+        "misses": 4,
+        "memory_size": 8,
+        "disk_size": 12,
+    }
+
+
+async def test_image_cache_cancel_first_fetcher(app: App):
+    from nonebot_bison.utils.image_cache import ImageCache
+
+    fetched = []
+    release = asyncio.Event()
+
+    async def _fetch():
+        fetched.append(1)
+        await release.wait()
+        return b"1234"
+
+    cache = ImageCache(memory_budget=8, disk_budget=0)
+    first = asyncio.create_task(cache.get("http://a/1.jpg", _fetch))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.get("http://a/1.jpg", _fetch))
+    await asyncio.sleep(0)
+    # 取消发起下载的请求，等待同一 URL 的请求仍能得到结果
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    assert await follower == b"1234"
+    assert not follower.cancelled()
+    assert first.cancelled()
+    assert fetched == [1]
+    # 下载完成后已写入缓存
+    assert await cache.get("http://a/1.jpg", _fetch) == b"1234"
+    assert fetched == [1]
+
+    # 所有请求都被取消时才取消下载，之后的请求重新下载
+    release.clear()
+    only = asyncio.create_task(cache.get("http://a/2.jpg", _fetch))
+    await asyncio.sleep(0)
+    only.cancel()
+    await asyncio.sleep(0)
+    assert only.cancelled()
+    assert not cache._inflight
+    release.set()
+    assert await cache.get("http://a/2.jpg", _fetch) == b"1234"
+    assert fetched == [1, 1, 1]
+
+
+async def test_image_cache_concurrent_disk_put(app: App):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from nonebot_bison.utils.image_cache import ImageCache
+
+    cache = ImageCache(memory_budget=0, disk_budget=32, dir_name="concurrent_cache")
+    contents = [bytes([i]) * 8 for i in range(6)]
+    # 同一 URL 与不同 URL 的写入在多个线程中同时进行
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(
+            executor.map(
+                lambda i: cache._put_disk(f"http://a/{i % 6}.jpg", contents[i % 6]),
+                range(48),
+            )
+        )
+    blob_dir = cache._disk_dir / "blobs"
+    blobs = list(blob_dir.iterdir())
+    assert not [blob for blob in blobs if blob.suffix == ".tmp"]
+    assert cache.stats()["disk_size"] == sum(blob.stat().st_size for blob in blobs)
+    assert cache.stats()["disk_size"] <= 32
+    for blob in blobs:
+        assert blob.read_bytes() in contents
@@ -1,9 +1,16 @@
+import asyncio
+import time
 import typing
+from io import BytesIO
 from sys import dont_write_bytecode
 
 import pytest
+import respx
 from flaky import flaky
+from httpx import Response
 from nonebug.app import App
+from PIL import Image
+from pytest_mock import MockerFixture
 
 if typing.TYPE_CHECKING:
     import sys
@@ -128,3 +135,180 @@ async def test_3_merge_only(app: App, downloaded_resource: list[bytes]):
     post = Post("", "", "", pics=list(downloaded_resource[0:3]))
     await post._pic_merge()
     assert len(post.pics) == 1
+
+
+def _make_image(width: int, height: int, color: str = "red") -> bytes:
+    image_io = BytesIO()
+    Image.new("RGB", (width, height), color).save(image_io, "JPEG")
+    return image_io.getvalue()
+
+
+async def test_merge_local_images(app: App):
+    from nonebot_bison.post import Post
+
+    pics = [_make_image(100, 100) for _ in range(8)] + [_make_image(100, 150)]
+    post = Post("", "", "", pics=pics + [b"tail"])
+    await post._pic_merge()
+    # 第三行有非正方形图片，只拼接前两行
+    assert len(post.pics) == 5
+    assert Image.open(BytesIO(post.pics[0])).size == (300, 200)
+    assert post.pics[1:] == pics[6:] + [b"tail"]
+
+
+@respx.mock
+async def test_merge_stop_at_non_square(app: App, mocker: MockerFixture):
+    from nonebot.log import logger
+
+    from nonebot_bison import post as post_module
+    from nonebot_bison.post import Post
+    from nonebot_bison.utils.image import ImageFetcher
+    from nonebot_bison.utils.image_cache import ImageCache
+
+    mocker.patch.object(
+        post_module.post, "image_fetcher", ImageFetcher(9, ImageCache(0, 0))
+    )
+    finished = []
+
+    async def _image(request):
+        index = int(request.url.path[1:-4])
+        # 后面的图片下载得更慢
+        await asyncio.sleep(0.2 * index)
+        finished.append(index)
+        return Response(200, content=_make_image(100, 150 if index == 1 else 100))
+
+    respx.get(host="img.example.com").mock(side_effect=_image)
+    pics = [f"https://img.example.com/{i}.jpg" for i in range(9)]
+    post = Post("", "", "", pics=list(pics))
+    await post._pic_merge()
+    assert post.pics == pics
+    # 第二张图片不是正方形，之后的下载被取消
+    assert finished == [0, 1]
+
+
+def _legacy_pic_merge(pics: list[bytes]) -> list[bytes]:
+    "拼接方式改为并发下载、线程中拼接之前的实现，仅用于对比"
+
+    def check_square(size: tuple[int, int]) -> bool:
+        return abs(size[0] - size[1]) / size[0] < 0.05
+
+    if len(pics) < 3:
+        return pics
+    first_image = Image.open(BytesIO(pics[0]))
+    if not check_square(first_image.size):
+        return pics
+    images = [first_image]
+    for i in range(1, 3):
+        cur_img = Image.open(BytesIO(pics[i]))
+        if not check_square(cur_img.size):
+            return pics
+        if cur_img.size[1] != images[0].size[1]:
+            return pics
+        images.append(cur_img)
+    x_coord = [0]
+    for i in range(3):
+        x_coord.append(x_coord[-1] + images[i].size[0])
+    y_coord = [0, first_image.size[1]]
+
+    def process_row(row: int) -> bool:
+        if len(pics) < (row + 1) * 3:
+            return False
+        row_first_img = Image.open(BytesIO(pics[row * 3]))
+        if not check_square(row_first_img.size):
+            return False
+        if row_first_img.size[0] != images[0].size[0]:
+            return False
+        image_row = [row_first_img]
+        for i in range(row * 3 + 1, row * 3 + 3):
+            cur_img = Image.open(BytesIO(pics[i]))
+            if not check_square(cur_img.size):
+                return False
+            if cur_img.size[1] != row_first_img.size[1]:
+                return False
+            if cur_img.size[0] != images[i % 3].size[0]:
+                return False
+            image_row.append(cur_img)
+        images.extend(image_row)
+        y_coord.append(y_coord[-1] + row_first_img.size[1])
+        return True
+
+    rows = 1
+    if process_row(1):
+        rows = 2
+        if process_row(2):
+            rows = 3
+    target = Image.new("RGB", (x_coord[-1], y_coord[-1]))
+    for y in range(rows):
+        for x in range(3):
+            target.paste(
+                images[y * 3 + x],
+                (x_coord[x], y_coord[y], x_coord[x + 1], y_coord[y + 1]),
+            )
+    target_io = BytesIO()
+    target.save(target_io, "JPEG")
+    return [target_io.getvalue()] + pics[rows * 3 :]
+
+
+async def _measure(merge) -> tuple[float, float]:
+    "返回拼接耗时与期间事件循环的最长阻塞时间"
+    stalls = []
+    stopped = False
+
+    async def ticker():
+        last = time.perf_counter()
+        while not stopped:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stalls.append(now - last)
+            last = now
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await merge()
+    cost = time.perf_counter() - start
+    stopped = True
+    await ticker_task
+    return cost, max(stalls)
+
+
+@pytest.mark.benchmark
+@pytest.mark.external
+@flaky
+async def test_merge_benchmark(
+    app: App, mocker: MockerFixture, downloaded_resource: list[bytes]
+):
+    from nonebot_bison import post as post_module
+    from nonebot_bison.post import Post
+    from nonebot_bison.utils.image import ImageFetcher
+    from nonebot_bison.utils.image_cache import ImageCache
+
+    legacy_res = []
+
+    async def legacy_merge():
+        legacy_res.extend(_legacy_pic_merge(list(downloaded_resource)))
+
+    post = Post("", "", "", pics=list(downloaded_resource))
+    legacy_cost, legacy_stall = await _measure(legacy_merge)
+    cost, stall = await _measure(post._pic_merge)
+    logger.info(
+        f"merge local pics: legacy {legacy_cost:.3f}s (loop blocked {legacy_stall:.3f}s)"
+        f", current {cost:.3f}s (loop blocked {stall:.3f}s)"
+    )
+    assert post.pics == legacy_res
+
+    # 从 URL 下载的情况，不使用缓存
+    mocker.patch.object(
+        post_module.post, "image_fetcher", ImageFetcher(4, ImageCache(0, 0))
+    )
+
+    async def legacy_download_merge():
+        _legacy_pic_merge(await download_imgs(merge_source_9))
+
+    post = Post("", "", "", pics=list(merge_source_9))
+    legacy_cost, legacy_stall = await _measure(legacy_download_merge)
+    cost, stall = await _measure(post._pic_merge)
+    logger.info(
+        f"merge pic urls: legacy {legacy_cost:.3f}s (loop blocked {legacy_stall:.3f}s)"
+        f", current {cost:.3f}s (loop blocked {stall:.3f}s)"
+    )
+    assert len(post.pics) == 5
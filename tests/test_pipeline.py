@@ -0,0 +1,169 @@
+import asyncio
+
+from nonebug import App
+from pytest_mock.plugin import MockerFixture
+
+
+async def test_pipeline_concurrency(app: App, mocker: MockerFixture):
+    from nonebot.adapters.onebot.v11.message import Message
+
+    from nonebot_bison import pipeline
+    from nonebot_bison.pipeline import PostPipeline
+    from nonebot_bison.types import User
+
+    rendering = 0
+    max_rendering = 0
+
+    class FakePost:
+        priority = None
+
+        def __init__(self, text: str):
+            self.text = text
+
+        async def generate_messages(self):
+            nonlocal rendering, max_rendering
+            rendering += 1
+            max_rendering = max(max_rendering, rendering)
+            await asyncio.sleep(0.01)
+            rendering -= 1
+            return [Message(self.text)]
+
+    sent = []
+
+    async def _send_msgs(bot, user, user_type, msgs, priority):
+        sent.append((user, str(msgs[0])))
+
+    mocker.patch.object(pipeline, "get_bot", return_value=mocker.Mock(self_id="1"))
+    mocker.patch.object(pipeline.send, "send_msgs", _send_msgs)
+
+    post_pipeline = PostPipeline(max_size=10, render_workers=2)
+    for i in range(4):
+        await post_pipeline.put(
+            User(i, "group"), [FakePost(f"{i}-1"), FakePost(f"{i}-2")]  # type: ignore
+        )
+    assert post_pipeline.queue_depths()["render_queue"] == 4
+    await post_pipeline.join()
+
+    assert max_rendering == 2
+    assert len(sent) == 8
+    for i in range(4):
+        assert [msg for user, msg in sent if user == i] == [f"{i}-1", f"{i}-2"]
+    assert post_pipeline.queue_depths() == {
+        "render_queue": 0,
+        "rendering": 0,
+        "send_queue": 0,
+    }
+
+
+async def test_pipeline_post_error(app: App, mocker: MockerFixture):
+    from nonebot_bison import pipeline
+    from nonebot_bison.pipeline import PostPipeline
+    from nonebot_bison.types import User
+
+    class BrokenPost:
+        async def generate_messages(self):
+            raise RuntimeError("render failed")
+
+    send_msgs = mocker.patch.object(pipeline.send, "send_msgs")
+    mocker.patch.object(pipeline, "get_bot", return_value=mocker.Mock(self_id="1"))
+
+    post_pipeline = PostPipeline(max_size=10, render_workers=1)
+    await post_pipeline.put(User(1, "group"), [BrokenPost()])  # type: ignore
+    await post_pipeline.join()
+    send_msgs.assert_not_called()
+    assert post_pipeline.queue_depths()["rendering"] == 0
+
+
+async def test_pipeline_user_order(app: App, mocker: MockerFixture):
+    from nonebot.adapters.onebot.v11.message import Message
+
+    from nonebot_bison import pipeline
+    from nonebot_bison.pipeline import PostPipeline
+    from nonebot_bison.types import User
+
+    class FakePost:
+        priority = None
+
+        def __init__(self, text: str, delay: float):
+            self.text = text
+            self.delay = delay
+
+        async def generate_messages(self):
+            await asyncio.sleep(self.delay)
+            return [Message(self.text)]
+
+    sent = []
+
+    async def _send_msgs(bot, user, user_type, msgs, priority):
+        sent.append((user, str(msgs[0])))
+
+    mocker.patch.object(pipeline, "get_bot", return_value=mocker.Mock(self_id="1"))
+    mocker.patch.object(pipeline.send, "send_msgs", _send_msgs)
+
+    post_pipeline = PostPipeline(max_size=10, render_workers=2)
+    # 先放入的任务渲染较慢，两个 worker 同时取出同一用户的任务
+    jobs = [
+        await post_pipeline.put(User(1, "group"), [FakePost("1-1", 0.05)]),  # type: ignore
+        await post_pipeline.put(User(1, "group"), [FakePost("1-2", 0)]),  # type: ignore
+        await post_pipeline.put(User(2, "group"), [FakePost("2-1", 0)]),  # type: ignore
+    ]
+    assert not any(job.done() for job in jobs)
+    await post_pipeline.join()
+    assert all(job.done() and not job.cancelled() for job in jobs)
+
+    assert [msg for user, msg in sent if user == 1] == ["1-1", "1-2"]
+    assert (2, "2-1") in sent
+    assert post_pipeline._lanes == {}
+
+
+async def test_pipeline_user_backlog(app: App, mocker: MockerFixture):
+    from nonebot.adapters.onebot.v11.message import Message
+
+    from nonebot_bison import pipeline
+    from nonebot_bison.pipeline import PostPipeline
+    from nonebot_bison.types import User
+
+    class FakePost:
+        priority = None
+
+        def __init__(self, text: str, delay: float):
+            self.text = text
+            self.delay = delay
+
+        async def generate_messages(self):
+            await asyncio.sleep(self.delay)
+            return [Message(self.text)]
+
+    sent = []
+
+    async def _send_msgs(bot, user, user_type, msgs, priority):
+        sent.append((user, str(msgs[0])))
+
+    mocker.patch.object(pipeline, "get_bot", return_value=mocker.Mock(self_id="1"))
+    mocker.patch.object(pipeline.send, "send_msgs", _send_msgs)
+
+    post_pipeline = PostPipeline(max_size=10, render_workers=2)
+    # 用户 1 积压了多个渲染缓慢的任务
+    for i in range(6):
+        await post_pipeline.put(User(1, "group"), [FakePost(f"1-{i}", 0.05)])  # type: ignore
+    await post_pipeline.put(User(2, "group"), [FakePost("2-0", 0.05)])  # type: ignore
+    await asyncio.sleep(0.02)
+    # 用户 1 的任务只占用一个 worker
+    assert post_pipeline.queue_depths()["rendering"] == 2
+    await post_pipeline.join()
+
+    assert [msg for user, msg in sent if user == 1] == [f"1-{i}" for i in range(6)]
+    # 用户 2 的任务不需要等待用户 1 的任务全部完成
+    assert sent.index((2, "2-0")) <= 1
+    assert post_pipeline._lanes == {}
+
+
+async def test_log_metrics(app: App, mocker: MockerFixture):
+    from nonebot_bison import pipeline
+
+    debug = mocker.spy(pipeline.logger, "debug")
+    await pipeline.log_metrics()
+    logged = " ".join(call.args[0] for call in debug.call_args_list)
+    assert "render_queue" in logged
+    assert "render latency" in logged
+    assert "send lane sizes" in logged
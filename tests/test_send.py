@@ -1,4 +1,6 @@
 import asyncio
+import json
+import time
 import typing
 
 import pytest
@@ -70,6 +72,209 @@ async def test_send_queue(app: App, mocker: MockerFixture):
         assert ctx.wait_list.empty()
 
 
+async def test_send_queue_per_bot(app: App, mocker: MockerFixture):
+    from nonebot.adapters.onebot.v11.bot import Bot
+
+    from nonebot_bison import send
+    from nonebot_bison.plugin_config import plugin_config
+    from nonebot_bison.send import send_msgs
+
+    mocker.patch.object(plugin_config, "bison_use_queue", True)
+    mocker.patch.object(plugin_config, "bison_use_pic_merge", 0)
+    mocker.patch.object(plugin_config, "bison_send_interval", {"1": 0.1, "2": 0.1})
+    sent = []
+
+    async def _do_send(bot, user, user_type, msg):
+        sent.append((bot.self_id, user, msg, time.monotonic()))
+
+    mocker.patch.object(send, "_do_send", _do_send)
+    async with app.test_api() as ctx:
+        bot1 = ctx.create_bot(base=Bot, self_id="1")
+        bot2 = ctx.create_bot(base=Bot, self_id="2")
+        start = time.monotonic()
+        await send_msgs(bot1, 1, "group", ["a", "b", "c"])  # type: ignore
+        await send_msgs(bot2, 2, "group", ["a", "b", "c"])  # type: ignore
+        assert send.queue_size() == 6
+        await asyncio.sleep(0.5)
+        assert send.queue_size() == 0
+        # 两个 Bot 同时发送，各自按间隔发送
+        for bot_id, group in (("1", 1), ("2", 2)):
+            records = [record for record in sent if record[0] == bot_id]
+            assert [record[1:3] for record in records] == [
+                (group, "a"),
+                (group, "b"),
+                (group, "c"),
+            ]
+            assert records[2][3] - start >= 0.2
+        assert max(record[3] for record in sent) - start < 0.3
+
+
+async def test_send_queue_group_interval(app: App, mocker: MockerFixture):
+    from nonebot.adapters.onebot.v11.bot import Bot
+
+    from nonebot_bison import send
+    from nonebot_bison.plugin_config import plugin_config
+    from nonebot_bison.send import send_msgs
+
+    mocker.patch.object(plugin_config, "bison_use_queue", True)
+    mocker.patch.object(plugin_config, "bison_use_pic_merge", 0)
+    mocker.patch.object(plugin_config, "bison_send_interval", {"1": 0})
+    mocker.patch.object(plugin_config, "bison_send_group_interval", {"1": 0.2})
+    sent = []
+
+    async def _do_send(bot, user, user_type, msg):
+        sent.append((user, msg))
+
+    mocker.patch.object(send, "_do_send", _do_send)
+    async with app.test_api() as ctx:
+        bot = ctx.create_bot(base=Bot, self_id="1")
+        await send_msgs(bot, 1, "group", ["a", "b"])  # type: ignore
+        await send_msgs(bot, 2, "group", ["c"])  # type: ignore
+        await send_msgs(bot, 1, "private", ["d"])  # type: ignore
+        await asyncio.sleep(0.1)
+        # 群 1 需要等待间隔，其他消息不受影响
+        assert sent == [(1, "a"), (2, "c"), (1, "d")]
+        await asyncio.sleep(0.2)
+        assert sent == [(1, "a"), (2, "c"), (1, "d"), (1, "b")]
+
+
+async def test_send_outbox_replay(app: App, mocker: MockerFixture):
+    from nonebot.adapters.onebot.v11.bot import Bot
+    from nonebot.adapters.onebot.v11.message import Message, MessageSegment
+
+    from nonebot_bison import send
+    from nonebot_bison.config.send_outbox import dump_message, load_message, send_outbox
+    from nonebot_bison.plugin_config import plugin_config
+    from nonebot_bison.send import send_msgs
+
+    forward_msg = Message(
+        MessageSegment.node_custom(1, "bot", Message(MessageSegment.image(b"pic")))
+    )
+    assert load_message(json.loads(json.dumps(dump_message(forward_msg)))) == (
+        forward_msg
+    )
+
+    mocker.patch.object(plugin_config, "bison_use_queue", True)
+    mocker.patch.object(plugin_config, "bison_use_pic_merge", 0)
+    mocker.patch.object(plugin_config, "bison_send_interval", {"1": 10})
+    sent = []
+
+    async def _do_send(bot, user, user_type, msg):
+        sent.append((bot.self_id, user, user_type, msg))
+
+    mocker.patch.object(send, "_do_send", _do_send)
+    async with app.test_api() as ctx:
+        bot = ctx.create_bot(base=Bot, self_id="1")
+        await send_msgs(bot, 1, "group", [Message("a"), Message("b")])
+        await send.get_send_queue(bot).wait(0.1)
+        assert len(sent) == 1
+        await send_msgs(bot, 3, "private", [Message("c")])
+        await send_outbox.flush()
+        # 已发送的消息不会写入数据库
+        assert len(await send_outbox.load()) == 2
+
+        # 模拟重启
+        send.QUEUES.clear()
+        mocker.patch.object(plugin_config, "bison_send_interval", {"1": 0})
+        # Bot 已连接时立即重新发送
+        await send.load_outbox()
+        assert send.queue_size() == 2
+        await asyncio.sleep(0.1)
+        assert sent[1:] == [
+            ("1", 1, "group", Message("b")),
+            ("1", 3, "private", Message("c")),
+        ]
+        await send_outbox.flush()
+        assert await send_outbox.load() == []
+
+
+async def test_send_outbox_call_after_flush(app: App):
+    from unittest.mock import patch
+
+    from nonebot_bison.config import send_outbox
+    from nonebot_bison.config.send_outbox import DBSendOutbox
+
+    outbox = DBSendOutbox()
+    outbox.add("1", 1, "group", "a", 0, 0)
+    called = []
+    outbox.call_after_flush(lambda: called.append(1))
+    assert called == []
+
+    # 写入失败时回调留到下一次写入成功后调用
+    with patch.object(send_outbox, "create_session", side_effect=RuntimeError):
+        await outbox.flush()
+    assert called == []
+    await outbox.flush()
+    assert called == [1]
+    assert [row.message for row in await outbox.load()] == ["a"]
+
+    # 没有需要写入的记录时，下一次写入直接调用回调
+    outbox.call_after_flush(lambda: called.append(2))
+    await outbox.flush()
+    assert called == [1, 2]
+
+
+async def test_send_queue_priority(app: App, mocker: MockerFixture):
+    from nonebot.adapters.onebot.v11.bot import Bot
+
+    from nonebot_bison import send
+    from nonebot_bison.plugin_config import plugin_config
+    from nonebot_bison.send import send_msgs
+    from nonebot_bison.types import SendPriority
+
+    mocker.patch.object(plugin_config, "bison_use_queue", True)
+    mocker.patch.object(plugin_config, "bison_use_pic_merge", 0)
+    mocker.patch.object(plugin_config, "bison_send_interval", {"1": 0.05})
+    sent = []
+
+    async def _do_send(bot, user, user_type, msg):
+        sent.append(msg)
+
+    mocker.patch.object(send, "_do_send", _do_send)
+    async with app.test_api() as ctx:
+        bot = ctx.create_bot(base=Bot, self_id="1")
+        await send_msgs(bot, 1, "group", ["a", "b"])  # type: ignore
+        await send_msgs(bot, 2, "group", ["c"], SendPriority.LOW)  # type: ignore
+        await send_msgs(bot, 3, "group", ["live"], SendPriority.HIGH)  # type: ignore
+        assert send.lane_sizes() == {"HIGH": 1, "NORMAL": 2, "LOW": 1}
+        for _ in range(50):
+            if len(sent) == 4:
+                break
+            await asyncio.sleep(0.05)
+        assert sent == ["live", "a", "b", "c"]
+        assert set(send.wait_time_percentiles()) == {"HIGH", "NORMAL", "LOW"}
+        assert (
+            send.wait_time_percentiles()["HIGH"]["p99"]
+            < send.wait_time_percentiles()["LOW"]["p50"]
+        )
+
+
+async def test_send_queue_priority_aging(app: App, mocker: MockerFixture):
+    import time
+
+    from nonebot.adapters.onebot.v11.bot import Bot
+
+    from nonebot_bison.plugin_config import plugin_config
+    from nonebot_bison.send import BotSendQueue, SendItem
+    from nonebot_bison.types import SendPriority
+
+    mocker.patch.object(plugin_config, "bison_send_interval", {"1": 0})
+    mocker.patch.object(plugin_config, "bison_send_priority_aging", 30)
+    async with app.test_api() as ctx:
+        bot = ctx.create_bot(base=Bot, self_id="1")
+        queue = BotSendQueue(bot)
+        now = time.monotonic()
+        queue.items.extend(
+            [
+                SendItem(1, "group", "low", 0, priority=SendPriority.LOW),
+                SendItem(2, "group", "old", 0, enqueued_at=now - 61),
+                SendItem(3, "group", "high", 0, priority=SendPriority.HIGH),
+            ]
+        )
+        # 等待超过 60 秒的普通消息提升为两级，优先于新的高优先级消息
+        assert [queue.pick()[0].msg for _ in range(3)] == ["old", "high", "low"]  # type: ignore
+
+
 def gen_node(id, name, content: "Message"):
     from nonebot.adapters.onebot.v11.message import MessageSegment
 
@@ -89,6 +294,7 @@ async def test_send_merge_no_queue(app: App):
 
     from nonebot_bison.plugin_config import plugin_config
     from nonebot_bison.send import send_msgs
+    from nonebot_bison.utils.get_bot import bot_member_info
 
     plugin_config.bison_use_pic_merge = 1
     plugin_config.bison_use_queue = False
@@ -148,6 +354,8 @@ async def test_send_merge_no_queue(app: App):
             {"group_id": 633, "message": Message(MessageSegment.text("test msg"))},
             None,
         )
+        # 群名片变更后重新获取
+        bot_member_info.invalidate("8888", 633)
         ctx.should_call_api(
             "get_group_member_info",
             {"group_id": 633, "user_id": 8888, "no_cache": True},
@@ -223,3 +431,74 @@ async def test_send_merge2_no_queue(app: App):
             None,
         )
         await send_msgs(bot, 633, "group", message)
+
+
+async def test_send_merge_member_info_cache(app: App):
+    from nonebot.adapters.onebot.v11.bot import Bot
+    from nonebot.adapters.onebot.v11.event import NoticeEvent
+    from nonebot.adapters.onebot.v11.message import Message, MessageSegment
+    from nonebot.message import handle_event
+
+    from nonebot_bison.plugin_config import plugin_config
+    from nonebot_bison.send import send_msgs
+
+    plugin_config.bison_use_pic_merge = 2
+    plugin_config.bison_use_queue = False
+
+    message = [
+        Message(MessageSegment.text("test msg")),
+        Message(MessageSegment.image("https://picsum.photos/200/300")),
+    ]
+    async with app.test_api() as ctx:
+        # 不触发连接事件，以免 Bot 连接时缓存失效
+        bot = ctx.create_bot(base=Bot, self_id="8888", auto_connect=False)
+        ctx.should_call_api(
+            "get_group_member_info",
+            {"group_id": 633, "user_id": 8888, "no_cache": True},
+            {"user_id": 8888, "card": "admin", "nickname": "adminuser"},
+        )
+        merged_message = _merge_messge(
+            [gen_node(8888, "admin", message[0]), gen_node(8888, "admin", message[1])]
+        )
+        for _ in range(2):
+            ctx.should_call_api(
+                "send_group_forward_msg",
+                {"group_id": 633, "messages": merged_message},
+                None,
+            )
+        # 第二次合并转发不再获取群成员信息
+        await send_msgs(bot, 633, "group", message)
+        await send_msgs(bot, 633, "group", message)
+        assert ctx.wait_list.empty()
+
+        # 群名片变更后重新获取
+        event = NoticeEvent(
+            time=1672995411,
+            self_id=8888,
+            post_type="notice",
+            notice_type="group_card",
+            group_id=633,
+            user_id=8888,
+            card_new="",
+            card_old="admin",
+        )
+        await handle_event(bot, event)
+        ctx.should_call_api(
+            "get_group_member_info",
+            {"group_id": 633, "user_id": 8888, "no_cache": True},
+            {"user_id": 8888, "card": "", "nickname": "adminuser"},
+        )
+        ctx.should_call_api(
+            "send_group_forward_msg",
+            {
+                "group_id": 633,
+                "messages": _merge_messge(
+                    [
+                        gen_node(8888, "adminuser", message[0]),
+                        gen_node(8888, "adminuser", message[1]),
+                    ]
+                ),
+            },
+            None,
+        )
+        await send_msgs(bot, 633, "group", message)